@@ -0,0 +1,62 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from config import (DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE,
+                    SQLITE_BUSY_TIMEOUT_MS, SQLITE_SYNCHRONOUS)
+
+
+# Драйверы по бэкендам: (синхронный, асинхронный)
+DRIVERS = {
+    "sqlite": ("pysqlite", "aiosqlite"),
+    "postgresql": ("psycopg", "asyncpg"),
+}
+
+
+def _urls(url: str) -> tuple:
+    """URL из конфига → URL синхронного и асинхронного движков"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in DRIVERS:
+        raise ValueError(f"Неподдерживаемая БД: {backend} (ожидается sqlite или postgresql)")
+    sync_driver, async_driver = DRIVERS[backend]
+    return parsed.set(drivername=f"{backend}+{sync_driver}"), parsed.set(drivername=f"{backend}+{async_driver}")
+
+
+def is_sqlite(url: str = DATABASE_URL) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL: читатели не ждут писателя; busy_timeout вместо мгновенного 'database is locked'"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _pool_options(url: str) -> dict:
+    # Для SQLite хватает пула SQLAlchemy по умолчанию; серверной БД — общий пул с проверкой соединений
+    if is_sqlite(url):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def make_engines(url: str = DATABASE_URL) -> tuple[Engine, AsyncEngine]:
+    """Синхронный движок (фоновые потоки) и асинхронный (хэндлеры) для одной БД"""
+    sync_url, async_url = _urls(url)
+    options = _pool_options(url)
+
+    engine = create_engine(sync_url, echo=False, future=True, **options)
+    async_engine = create_async_engine(async_url, echo=False, **options)
+    if is_sqlite(url):
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+        event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return engine, async_engine
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from typing import NamedTuple
+
+from sqlalchemy import select
+
+from app.db.model import AsyncSessionLocal, Bank, Product, Characteristic, Set
+
+
+class BankRecord(NamedTuple):
+    id: int
+    name: str
+    url: str | None
+
+
+class ProductRecord(NamedTuple):
+    id: int
+    name: str
+    url: str | None
+    set_id: int | None
+    bank: BankRecord | None
+
+
+class CharacteristicRecord(NamedTuple):
+    id: int
+    name: str
+    description: str | None
+
+
+class SetRecord(NamedTuple):
+    id: int
+    name: str
+    product_ids: tuple[int, ...]
+
+
+class CatalogSnapshot:
+    """Неизменяемый снимок каталога: наборы, продукты с банками, характеристики"""
+
+    def __init__(self, banks: list[BankRecord], products: list[ProductRecord],
+                 characteristics: list[CharacteristicRecord], sets: list[SetRecord]):
+        self.banks = {bank.id: bank for bank in banks}
+        self.products = {product.id: product for product in products}
+        self.characteristics = tuple(characteristics)
+        self.sets = {set_obj.id: set_obj for set_obj in sets}
+        self._characteristics_by_id = {char.id: char for char in characteristics}
+        self._sets_by_name = {set_obj.name: set_obj for set_obj in sets}
+
+    def set_by_name(self, name: str) -> SetRecord | None:
+        return self._sets_by_name.get(name)
+
+    def products_in_set(self, set_id: int | None) -> list[ProductRecord]:
+        set_obj = self.sets.get(set_id)
+        return [self.products[i] for i in set_obj.product_ids] if set_obj else []
+
+    def products_by_ids(self, ids) -> list[ProductRecord]:
+        """Продукты в порядке каталога; неизвестные id пропускаются"""
+        wanted = set(ids or [])
+        return [product for product in self.products.values() if product.id in wanted]
+
+    def characteristics_by_ids(self, ids) -> list[CharacteristicRecord]:
+        wanted = set(ids or [])
+        return [char for char in self.characteristics if char.id in wanted]
+
+    def bank_names(self, products: list[ProductRecord]) -> list[str]:
+        """Уникальные банки продуктов в порядке первого появления"""
+        names = [product.bank.name for product in products if product.bank]
+        return list(dict.fromkeys(names))
+
+
+async def _load_snapshot() -> CatalogSnapshot:
+    async with AsyncSessionLocal() as db:
+        bank_rows = (await db.scalars(select(Bank).order_by(Bank.id))).all()
+        product_rows = (await db.scalars(select(Product).order_by(Product.id))).all()
+        char_rows = (await db.scalars(select(Characteristic).order_by(Characteristic.id))).all()
+        set_rows = (await db.scalars(select(Set).order_by(Set.id))).all()
+
+    banks = [BankRecord(b.id, b.name, b.url) for b in bank_rows]
+    banks_by_id = {bank.id: bank for bank in banks}
+    products = [
+        ProductRecord(p.id, p.name, p.url, p.set_id, banks_by_id.get(p.bank_id))
+        for p in product_rows
+    ]
+    characteristics = [CharacteristicRecord(c.id, c.name, c.description) for c in char_rows]
+    sets = [
+        SetRecord(s.id, s.name, tuple(p.id for p in products if p.set_id == s.id))
+        for s in set_rows
+    ]
+    return CatalogSnapshot(banks, products, characteristics, sets)
+
+
+class CatalogCache:
+    """Read-through кэш каталога в памяти.
+
+    Снимок загружается одним проходом по четырём таблицам при первом
+    обращении (или на старте через `load()`) и дальше отдаётся без
+    запросов к БД. После миграций и правок каталога нужно вызвать
+    `invalidate()` — следующий `get()` перечитает таблицы.
+    """
+
+    def __init__(self):
+        self._snapshot: CatalogSnapshot | None = None
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        async with self._lock:
+            if self._snapshot is None:
+                self._snapshot = await _load_snapshot()
+                logging.info(f"[Catalog] loaded {len(self._snapshot.products)} product(s)")
+            return self._snapshot
+
+    async def load(self) -> CatalogSnapshot:
+        self.invalidate()
+        return await self.get()
+
+    def invalidate(self):
+        self._snapshot = None
+
+
+catalog = CatalogCache()
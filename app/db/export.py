@@ -0,0 +1,246 @@
+import base64
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime
+from typing import NamedTuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine, func, select
+from sqlalchemy import types as sa_types
+from sqlalchemy.engine import Connection
+
+from app.db.backend import is_sqlite
+from app.db.model import Base, SessionLocal, Export, engine
+from config import EXPORT_CHUNK_ROWS, EXPORT_TABLES, SQLITE_BUSY_TIMEOUT_MS
+
+FORMATS = ("csv", "parquet")
+# Таблицы, строки которых только добавляются: «с прошлой выгрузки» = id больше запомненного.
+# Остальные (jobs, logs, каталог, offers) меняются на месте — выгружаются целиком
+APPEND_ONLY = {"data", "observations", "llm_calls", "product_snapshots"}
+TIME_COLUMNS = ("created_at", "fetched_at", "updated_at")
+TELEGRAM_FILE_LIMIT = 50 * 1024 * 1024
+
+
+class ExportResult(NamedTuple):
+    path: str
+    rows: dict[str, int]
+    cursors: dict[str, int]
+
+
+# ---------- Согласованный снимок ----------
+def backup_sqlite(target_path: str, source_path: str | None = None):
+    """Копия SQLite через online backup API.
+
+    Копируем одним шагом: в WAL это одна читающая транзакция, писатели её
+    не ждут. При пошаговом копировании любая запись из другого соединения
+    перезапускала бы backup с начала.
+    """
+    source = sqlite3.connect(source_path or engine.url.database, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+@contextmanager
+def _snapshot(workdir: str):
+    """Соединение, в котором все таблицы видны на один момент времени"""
+    if is_sqlite():
+        path = os.path.join(workdir, "snapshot.db")
+        backup_sqlite(path)
+        snapshot_engine = create_engine(f"sqlite:///{path}")
+        try:
+            with snapshot_engine.connect() as conn:
+                yield conn
+        finally:
+            snapshot_engine.dispose()
+            os.remove(path)
+    else:
+        # PostgreSQL: один MVCC-снимок на всю выгрузку, писателей не блокирует
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="REPEATABLE READ", postgresql_readonly=True)
+            with conn.begin():
+                yield conn
+
+
+# ---------- Запись таблиц ----------
+def table_names() -> list[str]:
+    return sorted(Base.metadata.tables)
+
+
+def _table(name: str):
+    table = Base.metadata.tables.get(name)
+    if table is None:
+        raise ValueError(f"Нет таблицы {name}; есть: {', '.join(table_names())}")
+    return table
+
+
+def _select(table, date_from: datetime | None, date_to: datetime | None, after_id: int | None):
+    stmt = select(table)
+    time_column = next((table.c[name] for name in TIME_COLUMNS if name in table.c), None)
+    if time_column is not None and date_from:
+        stmt = stmt.where(time_column >= date_from)
+    if time_column is not None and date_to:
+        stmt = stmt.where(time_column < date_to)
+    if after_id:
+        stmt = stmt.where(table.c.id > after_id)
+    order = [table.c.id] if "id" in table.c else list(table.primary_key.columns)
+    return stmt.order_by(*order)
+
+
+def _chunks(conn: Connection, stmt):
+    # Порции по EXPORT_CHUNK_ROWS: в памяти не больше одной порции
+    return conn.execute(stmt.execution_options(yield_per=EXPORT_CHUNK_ROWS)).partitions()
+
+
+def _csv_cell(value, column):
+    if value is None:
+        return ""
+    if isinstance(column.type, sa_types.JSON):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    return value
+
+
+def _write_csv(conn: Connection, stmt, table, archive: zipfile.ZipFile, workdir: str) -> int:
+    columns = list(table.columns)
+    count = 0
+    with archive.open(f"{table.name}.csv", "w") as raw:
+        # utf-8-sig: Excel открывает кириллицу без перекодировки
+        with io.TextIOWrapper(raw, encoding="utf-8-sig", newline="") as text:
+            writer = csv.writer(text)
+            writer.writerow([column.name for column in columns])
+            for chunk in _chunks(conn, stmt):
+                writer.writerows([_csv_cell(value, column) for value, column in zip(row, columns)] for row in chunk)
+                count += len(chunk)
+    return count
+
+
+def _arrow_type(column) -> pa.DataType:
+    column_type = column.type
+    if isinstance(column_type, sa_types.Boolean):
+        return pa.bool_()
+    if isinstance(column_type, sa_types.Integer):
+        return pa.int64()
+    if isinstance(column_type, sa_types.Float):
+        return pa.float64()
+    if isinstance(column_type, sa_types.DateTime):
+        return pa.timestamp("us")
+    if isinstance(column_type, sa_types.LargeBinary):
+        return pa.binary()
+    return pa.string()
+
+
+def _write_parquet(conn: Connection, stmt, table, archive: zipfile.ZipFile, workdir: str) -> int:
+    columns = list(table.columns)
+    schema = pa.schema([(column.name, _arrow_type(column)) for column in columns])
+    json_columns = [isinstance(column.type, sa_types.JSON) for column in columns]
+    path = os.path.join(workdir, f"{table.name}.parquet")
+
+    count = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for chunk in _chunks(conn, stmt):
+            arrays = [
+                [json.dumps(value, ensure_ascii=False) if is_json and value is not None else value
+                 for value in values]
+                for values, is_json in zip(zip(*chunk), json_columns)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            count += len(chunk)
+
+    # Parquet уже сжат — в архив без повторного сжатия
+    archive.write(path, f"{table.name}.parquet", compress_type=zipfile.ZIP_STORED)
+    os.remove(path)
+    return count
+
+
+def export_tables(tables: list[str], fmt: str = "csv", date_from: datetime | None = None,
+                  date_to: datetime | None = None, since: dict[str, int] | None = None) -> ExportResult:
+    """Zip с таблицами на один момент времени; `since` — id, после которых выгружать (APPEND_ONLY).
+
+    Курсоры (до какого id выгружено) возвращаются только для выгрузки без периода:
+    с периодом пользователь получил не все строки до max(id).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Формат {fmt}: ожидается {' или '.join(FORMATS)}")
+    tables = [_table(name) for name in tables]
+    since = since or {}
+    writer = _write_csv if fmt == "csv" else _write_parquet
+
+    workdir = tempfile.mkdtemp(prefix="export_")
+    path = os.path.join(workdir, f"export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip")
+    rows, cursors = {}, {}
+    try:
+        with _snapshot(workdir) as conn, zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for table in tables:
+                after_id = since.get(table.name) if table.name in APPEND_ONLY else None
+                if table.name in APPEND_ONLY and not (date_from or date_to):
+                    cursors[table.name] = conn.scalar(select(func.max(table.c.id))) or after_id or 0
+                rows[table.name] = writer(conn, _select(table, date_from, date_to, after_id), table, archive, workdir)
+    except Exception:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+    return ExportResult(path, rows, cursors)
+
+
+def backup_file() -> str:
+    """Весь файл SQLite (согласованная копия), сжатый gzip"""
+    workdir = tempfile.mkdtemp(prefix="export_")
+    copy_path = os.path.join(workdir, "snapshot.db")
+    path = os.path.join(workdir, f"{os.path.basename(engine.url.database)}.gz")
+    try:
+        backup_sqlite(copy_path)
+        with open(copy_path, "rb") as source, gzip.open(path, "wb") as target:
+            shutil.copyfileobj(source, target)
+        os.remove(copy_path)
+    except Exception:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+    return path
+
+
+def remove_export(path: str):
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+# ---------- «С прошлой выгрузки» ----------
+def last_cursors(user_id: int) -> dict[str, int]:
+    """По каждой таблице — id, до которого она выгружалась этим пользователем в последний раз"""
+    db = SessionLocal()
+    try:
+        cursors = {}
+        for row in db.query(Export).filter_by(user_id=user_id).order_by(Export.id.desc()).all():
+            for name, last_id in (row.cursors or {}).items():
+                cursors.setdefault(name, last_id)
+        return cursors
+    finally:
+        db.close()
+
+
+def record_export(user_id: int, fmt: str, result: ExportResult):
+    db = SessionLocal()
+    try:
+        db.add(Export(user_id=user_id, format=fmt, tables=", ".join(result.rows), cursors=result.cursors))
+        db.commit()
+    finally:
+        db.close()
+
+
+def export_for_user(user_id: int, tables: list[str] | None = None, fmt: str = "csv",
+                    date_from: datetime | None = None, date_to: datetime | None = None,
+                    incremental: bool = False) -> ExportResult:
+    """Выгрузка для /db; запомнить её (record_export) — после успешной отправки"""
+    since = last_cursors(user_id) if incremental else None
+    return export_tables(tables or EXPORT_TABLES, fmt, date_from, date_to, since)
@@ -0,0 +1,137 @@
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, Mapping
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import case, delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.db.model import AsyncSessionLocal, FsmRecord, async_engine
+from config import FSM_STORAGE, FSM_TTL_HOURS
+
+
+# Списки выбранных id храним битовой маской в hex: 40 продуктов → ~10 символов
+COMPACT_KEYS = ("selected_products", "selected_characteristics")
+_MAX_PACKED_ID = 4096
+
+
+def _pack_ids(ids) -> str | None:
+    mask = 0
+    for item in ids:
+        if not isinstance(item, int) or isinstance(item, bool) or not 0 <= item <= _MAX_PACKED_ID:
+            return None
+        mask |= 1 << item
+    return format(mask, "x")
+
+
+def _unpack_ids(packed: str) -> list[int]:
+    mask = int(packed, 16)
+    ids = []
+    position = 0
+    while mask:
+        if mask & 1:
+            ids.append(position)
+        mask >>= 1
+        position += 1
+    return ids
+
+
+def encode_data(data: Mapping[str, Any]) -> str:
+    packed = dict(data)
+    for name in COMPACT_KEYS:
+        value = packed.get(name)
+        if isinstance(value, (list, tuple, set)):
+            mask = _pack_ids(value)
+            if mask is not None:
+                packed[name] = mask
+    return json.dumps(packed, ensure_ascii=False, separators=(",", ":"))
+
+
+def decode_data(raw: str | None) -> dict[str, Any]:
+    if not raw:
+        return {}
+    data = json.loads(raw)
+    for name in COMPACT_KEYS:
+        if isinstance(data.get(name), str):
+            data[name] = _unpack_ids(data[name])
+    return data
+
+
+class DbStorage(BaseStorage):
+    """FSM в таблице fsm_states общей БД (SQLite или PostgreSQL).
+
+    Состояние переживает рестарт и видно всем процессам бота. Запись —
+    один атомарный upsert. Не тронутые дольше `ttl_hours` состояния
+    считаются пустыми и раз в `purge_interval` секунд удаляются.
+    """
+
+    def __init__(self, ttl_hours: float = FSM_TTL_HOURS, purge_interval: float = 3600):
+        self.ttl = timedelta(hours=ttl_hours)
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        parts = [str(key.bot_id), str(key.chat_id), str(key.user_id)]
+        if key.thread_id:
+            parts.append(str(key.thread_id))
+        if key.business_connection_id:
+            parts.append(str(key.business_connection_id))
+        parts.append(key.destiny)
+        return ":".join(parts)
+
+    async def _load(self, key: StorageKey) -> FsmRecord | None:
+        cutoff = datetime.utcnow() - self.ttl
+        async with AsyncSessionLocal() as db:
+            return await db.scalar(
+                select(FsmRecord).where(FsmRecord.key == self._key(key), FsmRecord.updated_at >= cutoff)
+            )
+
+    async def _upsert(self, key: StorageKey, **fields):
+        now = datetime.utcnow()
+        cutoff = now - self.ttl
+        insert = sqlite_insert if async_engine.dialect.name == "sqlite" else pg_insert
+
+        # Протухшая запись не должна «воскресить» второе поле
+        updates = {"updated_at": now, **fields}
+        for column in ("state", "data"):
+            if column not in fields:
+                updates[column] = case((FsmRecord.updated_at < cutoff, None), else_=getattr(FsmRecord, column))
+
+        stmt = insert(FsmRecord).values(key=self._key(key), updated_at=now, **fields)
+        stmt = stmt.on_conflict_do_update(index_elements=[FsmRecord.key], set_=updates)
+        async with AsyncSessionLocal() as db:
+            await db.execute(stmt)
+            if time.monotonic() - self._last_purge > self.purge_interval:
+                self._last_purge = time.monotonic()
+                await db.execute(delete(FsmRecord).where(FsmRecord.updated_at < cutoff))
+            await db.commit()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._upsert(key, state=state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        record = await self._load(key)
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        await self._upsert(key, data=encode_data(data))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        record = await self._load(key)
+        return decode_data(record.data) if record else {}
+
+    async def close(self) -> None:
+        # Движок общий с остальным приложением и закрывается при остановке
+        pass
+
+
+def make_fsm_storage() -> BaseStorage:
+    return MemoryStorage() if FSM_STORAGE == "memory" else DbStorage()
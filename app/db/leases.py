@@ -0,0 +1,51 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from app.db.model import SessionLocal, Lease
+
+# Владелец аренды: уникален для процесса даже при одинаковом pid в контейнерах
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def acquire_lease(name: str, seconds: float, owner: str = WORKER_ID) -> bool:
+    """Берёт или продлевает аренду `name`; False — её держит другой живой процесс.
+
+    Условный UPDATE (свободна, истекла или уже наша), иначе INSERT: вторую
+    вставку того же имени отвергнет первичный ключ. Работает одинаково на
+    SQLite и PostgreSQL и не держит соединение на время работы.
+    """
+    now = datetime.utcnow()
+    values = {Lease.owner: owner, Lease.locked_until: now + timedelta(seconds=seconds)}
+    db = SessionLocal()
+    try:
+        updated = (
+            db.query(Lease)
+            .filter(Lease.name == name, or_(Lease.owner == owner, Lease.locked_until < now))
+            .update(values, synchronize_session=False)
+        )
+        if not updated:
+            if db.query(Lease.name).filter_by(name=name).first():
+                db.rollback()
+                return False
+            db.add(Lease(name=name, owner=owner, locked_until=values[Lease.locked_until]))
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+def release_lease(name: str, owner: str = WORKER_ID):
+    db = SessionLocal()
+    try:
+        db.query(Lease).filter_by(name=name, owner=owner).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
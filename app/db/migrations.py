@@ -0,0 +1,290 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.db.model import (Base, SchemaVersion, FIELD_NAMES, User, Data, Log, Bank, Product,
+                          Characteristic, Set, PageCache, PdfCache, LlmCache, LlmCall, Job, JobItem,
+                          ProductSnapshot, ProductFingerprint, FsmRecord, Observation, Offer, Export, Lease,
+                          engine, async_engine)
+from app.db.offers import rebuild_offers
+from app.db.results import backfill_observations, backfill_snapshot_observations, renormalize_observations
+
+
+# Произвольный ключ advisory-lock: несколько воркеров на PostgreSQL не мигрируют одновременно
+_PG_LOCK_KEY = 7301
+
+
+def _create_tables(*models):
+    def migration(conn: Connection):
+        Base.metadata.create_all(conn, tables=[model.__table__ for model in models])
+    return migration
+
+
+def _add_columns(model, *names):
+    def migration(conn: Connection):
+        existing = {column["name"] for column in inspect(conn).get_columns(model.__tablename__)}
+        for name in names:
+            if name in existing:
+                continue
+            column = model.__table__.c[name]
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {model.__tablename__} ADD COLUMN {name} {column_type}"))
+    return migration
+
+
+def _backfill_observations(conn: Connection):
+    db = Session(bind=conn)
+    try:
+        added = backfill_observations(db)
+        db.flush()
+        logging.info(f"[DB] observations backfilled: {added}")
+    finally:
+        db.close()
+
+
+def _backfill_snapshot_observations(conn: Connection):
+    db = Session(bind=conn)
+    try:
+        added = backfill_snapshot_observations(db)
+        db.flush()
+        logging.info(f"[DB] observations from crawl snapshots: {added}")
+    finally:
+        db.close()
+
+
+def _renormalize_observations(conn: Connection):
+    db = Session(bind=conn)
+    try:
+        updated = renormalize_observations(db)
+        db.flush()
+        logging.info(f"[DB] observations normalized: {updated}")
+    finally:
+        db.close()
+
+
+def _rebuild_offers(conn: Connection):
+    db = Session(bind=conn)
+    try:
+        filled = rebuild_offers(db)
+        db.flush()
+        logging.info(f"[DB] offers filled: {filled}")
+    finally:
+        db.close()
+
+
+def _create_indexes(model, *names):
+    def migration(conn: Connection):
+        for index in model.__table__.indexes:
+            if index.name in names:
+                index.create(conn, checkfirst=True)
+    return migration
+
+
+# ---------- Начальные данные (бывшая команда /actv) ----------
+def _init_banks(db):
+    banks_to_add = [
+        ("Сбер", "https://sberbank.by/"),
+        ("Альфа Банк", "https://alfabank.by/"),
+        ("Беларусбанк", "https://belarusbank.by/"),
+        ("МТБанк", "https://mtbank.by/"),
+        ("Приорбанк", "https://priorbank.by/"),
+        ("БНБ", "https://bnb.by/"),
+        ("ВТБ", "https://vtb.by/"),
+        ("Белгазпромбанк", "https://belgazprombank.by/"),
+        ("Белагропромбанк", "https://belapb.by/"),
+        ("БелВэб", "https://belveb.by/"),
+        ("Дабрабыт", "https://bankdabrabyt.by/"),
+    ]
+    added = 0
+    for name, url in banks_to_add:
+        if not db.query(Bank).filter_by(name=name).first():
+            bank = Bank(name=name, url=url, parser_type="selenium")
+            db.add(bank)
+            added += 1
+            print(f"✅ Добавлен банк: {name}")
+    db.commit()
+    print(f"Итого добавлено {added} банков")
+
+
+def _migrate_characteristics(db):
+    chars_to_add = [
+        ("name", "Наименование"),
+
+        ("rate", "% Ставка"),
+        ("rate_type", "Тип ставки"),
+
+        ("sum", "Сумма"),
+        ("term", "Срок"),
+
+        ("payment_type", "Тип платежа"),
+        ("commission", "Комиссии"),
+
+        ("early_repayment", "Досрочное погашение"),
+        ("insurance", "Страхование"),
+
+        ("currency", "Валюта"),
+
+        ("additional", "Дополнительно"),
+        ("files", "Файлы"),
+    ]
+    added = 0
+    for name, desc in chars_to_add:
+        if not db.query(Characteristic).filter_by(name=name).first():
+            char = Characteristic(name=name, description=desc)
+            db.add(char)
+            added += 1
+            print(f"✅ Добавлена характеристика: {FIELD_NAMES.get(name, name)}")
+    db.commit()
+    print(f"✅ Добавлено {added} характеристик (всего: {db.query(Characteristic).count()})")
+
+def _migrate_products(db):
+    
+    # Получаем банки по ID для правильных ссылок
+    banks_map = {b.name: b.id for b in db.query(Bank).all()}
+    
+    # Продукты для каждого набора
+    products_data = {
+        "Кредиты": [
+            ("Сбер", "«Просто в Online» (Сбер)", "https://www.sber-bank.by/credit-potreb/prosto-v-online/conditions"),
+            ("Альфа Банк", "Красная карта (Альфа)", "https://www.alfabank.by/credits/cards/installment-card/"),
+            ("Беларусбанк", "Потребительский (Беларус)", "https://belarusbank.by/fizicheskim_licam/kredit/consumer/kredit-1/"),
+            ("МТБанк", '"Проще простого" (МТБанк)', "https://www.mtbank.by/credits/proshche-prostogo/"),
+            ("Приорбанк", '"Проще.net" (Приор)', "https://www.priorbank.by/offers/credits/universal-credit/kredit-online"),
+            ("БНБ", '"Мэтч" (БНБ)', "https://bnb.by/o-lichnom/kreditovanie-i-lizing/match/"),
+            ("ВТБ", "«Старт» (ВТБ)", "https://www.vtb.by/chastnym-licam/kredity/kredit-start"),
+            ("Белгазпромбанк", "Cashalot (Белгаз)", "https://belgazprombank.by/personal_banking/krediti/kredit_na_potrebitel_skie_nuzhdi/credit_cashalot/"),
+            ("Белагропромбанк", "«На раз» (Белагро)", "https://www.belapb.by/chastnomu-klientu/kredity/kredit-na-raz/"),
+            ("БелВэб", "Потребительский (БелВэб)", "https://www.belveb.by/credits/potrebitelskiy-bel/"),
+            ("Дабрабыт", '"На ЛИЧНОЕ" (Дабрабыт)', "https://bankdabrabyt.by/personal/credit/potrebitelskiy-kredit-nalichnoe/"),
+        ],
+        "Депозиты": [
+            ("Сбер", "SberCard", "https://www.sber-bank.by/credit-potreb/prosto-v-online/conditions"),
+        ]
+    }
+    
+    added = 0
+    for set_name, prods in products_data.items():
+        set_obj = db.query(Set).filter_by(name=set_name).first()
+        if not set_obj:
+            print(f"❌ Набор '{set_name}' не найден в БД")
+            continue
+            
+        for bank_name, prod_name, prod_url in prods:
+            bank_id = banks_map.get(bank_name)
+            if not bank_id:
+                print(f"⚠️ Банк '{bank_name}' не найден в БД")
+                continue
+            
+            # Проверяем, нет ли уже такого продукта
+            existing = db.query(Product).filter_by(
+                set_id=set_obj.id, 
+                bank_id=bank_id, 
+                name=prod_name
+            ).first()
+            
+            if not existing:
+                product = Product(
+                    set_id=set_obj.id,
+                    bank_id=bank_id,
+                    name=prod_name,
+                    url=prod_url
+                )
+                db.add(product)
+                added += 1
+                print(f"✅ Добавлен продукт: {set_name} -> {bank_name}: {prod_name}")
+            else:
+                print(f"⏭️ Продукт уже существует: {set_name} -> {bank_name}: {prod_name}")
+    
+    db.commit()
+    print(f"\n✅ Всего добавлено {added} продуктов")
+
+
+def _migrate_banks(db):
+    # Получаем ВСЕ банки из таблицы banks
+    all_banks = [b.name for b in db.query(Bank).all()]
+    
+    sets_data = [
+        ("Кредиты", "Все банки", ",".join(all_banks)),
+        ("Депозиты", "Все банки", ",".join(all_banks)),
+    ]
+    
+    added = 0
+    for name, description, banks in sets_data:
+        if not db.query(Set).filter_by(name=name).first():
+            set_obj = Set(name=name, description=description, banks=banks)
+            db.add(set_obj)
+            added += 1
+    
+    db.commit()
+    print(f"✅ Добавлено {added} наборов (всего банков: {len(all_banks)})")
+
+
+def _seed_catalog(conn: Connection):
+    db = Session(bind=conn)
+    try:
+        _init_banks(db)
+        _migrate_banks(db)
+        _migrate_products(db)
+        _migrate_characteristics(db)
+    finally:
+        db.close()
+
+
+# Миграции применяются по порядку и только один раз; новые — только в конец списка
+MIGRATIONS = [
+    (1, "base tables", _create_tables(User, Data, Log, Bank, Product, Characteristic, Set)),
+    (2, "parser caches and llm usage", _create_tables(PageCache, PdfCache, LlmCache, LlmCall)),
+    (3, "jobs, snapshots, fingerprints", _create_tables(Job, JobItem, ProductSnapshot, ProductFingerprint)),
+    (4, "seed catalog", _seed_catalog),
+    (5, "fsm storage", _create_tables(FsmRecord)),
+    (6, "index data.created_at", _create_indexes(Data, "ix_data_created_at")),
+    (7, "data.payload_archive", _add_columns(Data, "payload_archive")),
+    (8, "observations", _create_tables(Observation)),
+    (9, "backfill observations", _backfill_observations),
+    (10, "observations.unit", _add_columns(Observation, "unit")),
+    (11, "normalize rate/sum/term", _renormalize_observations),
+    (12, "offers", _create_tables(Offer)),
+    (13, "fill offers", _rebuild_offers),
+    (14, "open-ended ranges", _renormalize_observations),
+    (15, "exports", _create_tables(Export)),
+    (16, "job leases", _add_columns(Job, "worker_id", "locked_until")),
+    (17, "leases", _create_tables(Lease)),
+    (18, "range start scale", _renormalize_observations),
+    (19, "refill offers", _rebuild_offers),
+    (20, "observations from crawl snapshots", _backfill_snapshot_observations),
+]
+
+
+def _upgrade(conn: Connection) -> list[int]:
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _PG_LOCK_KEY})
+
+    SchemaVersion.__table__.create(conn, checkfirst=True)
+    applied = {row.version for row in conn.execute(SchemaVersion.__table__.select())}
+
+    done = []
+    for version, name, migration in MIGRATIONS:
+        if version in applied:
+            continue
+        logging.info(f"[DB] migration {version}: {name}")
+        migration(conn)
+        conn.execute(SchemaVersion.__table__.insert().values(
+            version=version, name=name, applied_at=datetime.utcnow()
+        ))
+        done.append(version)
+    return done
+
+
+def upgrade() -> list[int]:
+    """Применяет недостающие миграции; возвращает номера применённых"""
+    with engine.begin() as conn:
+        return _upgrade(conn)
+
+
+async def upgrade_async() -> list[int]:
+    async with async_engine.begin() as conn:
+        return await conn.run_sync(_upgrade)
+
@@ -1,10 +1,13 @@
 from datetime import datetime
 from sqlalchemy import (
-    Column, Integer, String, DateTime, Text, JSON, create_engine,
-    ForeignKey  
+    Column, Integer, BigInteger, String, DateTime, Text, JSON,
+    ForeignKey, Boolean, Index, Float, LargeBinary
 )
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from app.db.backend import make_engines
+
 Base = declarative_base()
 
 FIELD_NAMES = {
@@ -31,22 +34,23 @@ FIELD_NAMES = {
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True)
-    tg_id = Column(Integer, unique=True, index=True)
+    tg_id = Column(BigInteger, unique=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class Data(Base):
     __tablename__ = "data"
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, index=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    user_id = Column(BigInteger, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)  # выборки истории по периоду
     characteristics = Column(Text)
     card_set = Column(String(255))
-    payload = Column(JSON)
+    payload = Column(JSON, nullable=True)
+    payload_archive = Column(LargeBinary, nullable=True)  # zlib(JSON), если DATA_ARCHIVE_PAYLOAD
 
 class Log(Base):
     __tablename__ = "logs"
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, index=True)
+    user_id = Column(BigInteger, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     action = Column(String(50))
     status = Column(String(50))
@@ -87,153 +91,186 @@ class Set(Base):
     banks = Column(String(500))  # "Сбер,Беларусбанк,МТБанк"
     created_at = Column(DateTime, default=datetime.utcnow)
 
-def init_banks():
-    db = SessionLocal()
-    banks_to_add = [
-        ("Сбер", "https://sberbank.by/"),
-        ("Альфа Банк", "https://alfabank.by/"),
-        ("Беларусбанк", "https://belarusbank.by/"),
-        ("МТБанк", "https://mtbank.by/"),
-        ("Приорбанк", "https://priorbank.by/"),
-        ("БНБ", "https://bnb.by/"),
-        ("ВТБ", "https://vtb.by/"),
-        ("Белгазпромбанк", "https://belgazprombank.by/"),
-        ("Белагропромбанк", "https://belapb.by/"),
-        ("БелВэб", "https://belveb.by/"),
-        ("Дабрабыт", "https://bankdabrabyt.by/"),
-    ]
-    added = 0
-    for name, url in banks_to_add:
-        if not db.query(Bank).filter_by(name=name).first():
-            bank = Bank(name=name, url=url, parser_type="selenium")
-            db.add(bank)
-            added += 1
-            print(f"✅ Добавлен банк: {name}")
-    db.commit()
-    db.close()
-    print(f"Итого добавлено {added} банков")
-
-
-def migrate_characteristics():
-    db = SessionLocal()
-    chars_to_add = [
-        ("name", "Наименование"),
-
-        ("rate", "% Ставка"),
-        ("rate_type", "Тип ставки"),
-
-        ("sum", "Сумма"),
-        ("term", "Срок"),
-
-        ("payment_type", "Тип платежа"),
-        ("commission", "Комиссии"),
-
-        ("early_repayment", "Досрочное погашение"),
-        ("insurance", "Страхование"),
-
-        ("currency", "Валюта"),
-
-        ("additional", "Дополнительно"),
-        ("files", "Файлы"),
-    ]
-    added = 0
-    for name, desc in chars_to_add:
-        if not db.query(Characteristic).filter_by(name=name).first():
-            char = Characteristic(name=name, description=desc)
-            db.add(char)
-            added += 1
-            print(f"✅ Добавлена характеристика: {FIELD_NAMES.get(name, name)}")
-    db.commit()
-    print(f"✅ Добавлено {added} характеристик (всего: {db.query(Characteristic).count()})")
-    db.close()
-
-def migrate_products():
-    db = SessionLocal()
-    
-    # Получаем банки по ID для правильных ссылок
-    banks_map = {b.name: b.id for b in db.query(Bank).all()}
-    
-    # Продукты для каждого набора
-    products_data = {
-        "Кредиты": [
-            ("Сбер", "«Просто в Online» (Сбер)", "https://www.sber-bank.by/credit-potreb/prosto-v-online/conditions"),
-            ("Альфа Банк", "Красная карта (Альфа)", "https://www.alfabank.by/credits/cards/installment-card/"),
-            ("Беларусбанк", "Потребительский (Беларус)", "https://belarusbank.by/fizicheskim_licam/kredit/consumer/kredit-1/"),
-            ("МТБанк", '"Проще простого" (МТБанк)', "https://www.mtbank.by/credits/proshche-prostogo/"),
-            ("Приорбанк", '"Проще.net" (Приор)', "https://www.priorbank.by/offers/credits/universal-credit/kredit-online"),
-            ("БНБ", '"Мэтч" (БНБ)', "https://bnb.by/o-lichnom/kreditovanie-i-lizing/match/"),
-            ("ВТБ", "«Старт» (ВТБ)", "https://www.vtb.by/chastnym-licam/kredity/kredit-start"),
-            ("Белгазпромбанк", "Cashalot (Белгаз)", "https://belgazprombank.by/personal_banking/krediti/kredit_na_potrebitel_skie_nuzhdi/credit_cashalot/"),
-            ("Белагропромбанк", "«На раз» (Белагро)", "https://www.belapb.by/chastnomu-klientu/kredity/kredit-na-raz/"),
-            ("БелВэб", "Потребительский (БелВэб)", "https://www.belveb.by/credits/potrebitelskiy-bel/"),
-            ("Дабрабыт", '"На ЛИЧНОЕ" (Дабрабыт)', "https://bankdabrabyt.by/personal/credit/potrebitelskiy-kredit-nalichnoe/"),
-        ],
-        "Депозиты": [
-            ("Сбер", "SberCard", "https://www.sber-bank.by/credit-potreb/prosto-v-online/conditions"),
-        ]
-    }
-    
-    added = 0
-    for set_name, prods in products_data.items():
-        set_obj = db.query(Set).filter_by(name=set_name).first()
-        if not set_obj:
-            print(f"❌ Набор '{set_name}' не найден в БД")
-            continue
-            
-        for bank_name, prod_name, prod_url in prods:
-            bank_id = banks_map.get(bank_name)
-            if not bank_id:
-                print(f"⚠️ Банк '{bank_name}' не найден в БД")
-                continue
-            
-            # Проверяем, нет ли уже такого продукта
-            existing = db.query(Product).filter_by(
-                set_id=set_obj.id, 
-                bank_id=bank_id, 
-                name=prod_name
-            ).first()
-            
-            if not existing:
-                product = Product(
-                    set_id=set_obj.id,
-                    bank_id=bank_id,
-                    name=prod_name,
-                    url=prod_url
-                )
-                db.add(product)
-                added += 1
-                print(f"✅ Добавлен продукт: {set_name} -> {bank_name}: {prod_name}")
-            else:
-                print(f"⏭️ Продукт уже существует: {set_name} -> {bank_name}: {prod_name}")
-    
-    db.commit()
-    print(f"\n✅ Всего добавлено {added} продуктов")
-    db.close()
+class PageCache(Base):
+    __tablename__ = "page_cache"
+    id = Column(Integer, primary_key=True)
+    url = Column(String(500), unique=True, index=True)
+    etag = Column(String(255), nullable=True)
+    last_modified = Column(String(100), nullable=True)
+    content_hash = Column(String(64))
+    body = Column(Text)
+    source = Column(String(20))  # "http" или "playwright"
+    fetched_at = Column(DateTime, default=datetime.utcnow)  # когда тело последний раз менялось
+    checked_at = Column(DateTime, default=datetime.utcnow)  # когда последний раз проверяли
 
-engine = create_engine("sqlite:///credits.db", echo=False, future=True)
-Base.metadata.create_all(bind=engine) 
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+class PdfCache(Base):
+    __tablename__ = "pdf_cache"
+    id = Column(Integer, primary_key=True)
+    url = Column(String(500), unique=True, index=True)
+    etag = Column(String(255), nullable=True)
+    last_modified = Column(String(100), nullable=True)
+    content_hash = Column(String(64), index=True)  # sha256 содержимого PDF
+    checked_at = Column(DateTime, default=datetime.utcnow)
+
+class LlmCache(Base):
+    __tablename__ = "llm_cache"
+    id = Column(Integer, primary_key=True)
+    key = Column(String(64), unique=True, index=True)  # sha256 нормализованного входа
+    model = Column(String(100))
+    result = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    used_at = Column(DateTime, default=datetime.utcnow, index=True)
 
-def init_db():
-    Base.metadata.create_all(bind=engine)
+class LlmCall(Base):
+    __tablename__ = "llm_calls"
+    id = Column(Integer, primary_key=True)
+    log_id = Column(Integer, ForeignKey("logs.id"), nullable=True, index=True)
+    user_id = Column(BigInteger, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    model = Column(String(100))
+    bank = Column(String(100))
+    product = Column(String(100))
+    prompt_chars = Column(Integer)
+    prompt_tokens = Column(Integer)
+    completion_tokens = Column(Integer)
+    total_tokens = Column(Integer)
+    latency_ms = Column(Integer)
+    fallback = Column(Boolean, default=False)
+    batch_size = Column(Integer, default=1)  # продуктов в одном запросе
+    status = Column(String(20))  # "ok" или "error"
 
-def migrate_banks():
-    db = SessionLocal()
-    # Получаем ВСЕ банки из таблицы banks
-    all_banks = [b.name for b in db.query(Bank).all()]
-    
-    sets_data = [
-        ("Кредиты", "Все банки", ",".join(all_banks)),
-        ("Депозиты", "Все банки", ",".join(all_banks)),
-    ]
-    
-    added = 0
-    for name, description, banks in sets_data:
-        if not db.query(Set).filter_by(name=name).first():
-            set_obj = Set(name=name, description=description, banks=banks)
-            db.add(set_obj)
-            added += 1
-    
-    db.commit()
-    print(f"✅ Добавлено {added} наборов (всего банков: {len(all_banks)})")
-    db.close()
+    __table_args__ = (
+        Index("ix_llm_calls_bank_created", "bank", "created_at"),
+    )
+
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, index=True)
+    chat_id = Column(BigInteger)  # id Telegram не помещаются в 32 бита
+    message_id = Column(Integer, nullable=True)  # сообщение с прогрессом
+    log_id = Column(Integer, ForeignKey("logs.id"), nullable=True)
+    data_id = Column(Integer, ForeignKey("data.id"), nullable=True)  # сохранённый результат
+    status = Column(String(20), default="queued", index=True)  # queued / running / done / error
+    product_ids = Column(JSON)
+    characteristics = Column(JSON)  # имена выбранных характеристик
+    attempts = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    worker_id = Column(String(100), nullable=True)  # кто выполняет задачу (host:pid:…)
+    locked_until = Column(DateTime, nullable=True)  # аренда; истекла — задачу может забрать другой воркер
+
+class JobItem(Base):
+    __tablename__ = "job_items"
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey("jobs.id"), index=True)
+    position = Column(Integer)  # порядок продукта в отчёте
+    product_id = Column(Integer)
+    status = Column(String(20), default="pending")  # pending / done
+    result = Column(JSON, nullable=True)
+    tokens = Column(Integer, default=0)
+    pdf_count = Column(Integer, default=0)
+    finished_at = Column(DateTime, nullable=True)
+
+class ProductSnapshot(Base):
+    __tablename__ = "product_snapshots"
+    id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"))
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+    status = Column(String(20))  # "ok" — есть данные, "empty" — ничего не извлечено
+    source = Column(String(20))  # "schedule" или "user"
+    result = Column(JSON)
+    pdf_count = Column(Integer, default=0)
+    tokens = Column(Integer, default=0)
+
+    __table_args__ = (
+        Index("ix_product_snapshots_product_fetched", "product_id", "fetched_at"),
+    )
+
+class ProductFingerprint(Base):
+    __tablename__ = "product_fingerprints"
+    id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), unique=True, index=True)
+    fingerprint = Column(String(64))  # sha256 значимых блоков страницы и текста PDF
+    result = Column(JSON)  # последний удачный результат извлечения
+    checked_at = Column(DateTime, default=datetime.utcnow)  # когда последний раз сверяли
+    changed_at = Column(DateTime, default=datetime.utcnow)  # когда отпечаток последний раз менялся
+
+class Observation(Base):
+    """Одно значение одного поля продукта в одном запуске (нормализованный Data.payload)"""
+    __tablename__ = "observations"
+    id = Column(Integer, primary_key=True)
+    data_id = Column(Integer, ForeignKey("data.id"), index=True)  # запуск; NULL — плановый обход
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=True)
+    bank_id = Column(Integer, ForeignKey("banks.id"), nullable=True)
+    field = Column(String(50))
+    raw_value = Column(Text, nullable=True)
+    value_min = Column(Float, nullable=True)
+    value_max = Column(Float, nullable=True)
+    unit = Column(String(10), nullable=True)  # %, мес, BYN/USD/EUR — см. app/parser/numbers.py
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_observations_product_field_fetched", "product_id", "field", "fetched_at"),
+        Index("ix_observations_bank_field_fetched", "bank_id", "field", "fetched_at"),
+    )
+
+class Offer(Base):
+    """Текущее предложение продукта в числах — для рейтингов без разбора истории"""
+    __tablename__ = "offers"
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    set_id = Column(Integer, ForeignKey("sets.id"), nullable=True)
+    bank_id = Column(Integer, ForeignKey("banks.id"), nullable=True)
+    rate_min = Column(Float, nullable=True)
+    rate_max = Column(Float, nullable=True)
+    sum_min = Column(Float, nullable=True)
+    sum_max = Column(Float, nullable=True)
+    sum_unit = Column(String(10), nullable=True)
+    term_min = Column(Float, nullable=True)
+    term_max = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_offers_set_rate", "set_id", "rate_min"),
+        Index("ix_offers_sum", "sum_unit", "sum_min", "sum_max"),
+        Index("ix_offers_term", "term_min", "term_max"),
+    )
+
+class FsmRecord(Base):
+    __tablename__ = "fsm_states"
+    key = Column(String(200), primary_key=True)  # bot:chat:user[:thread]:destiny
+    state = Column(String(100), nullable=True)
+    data = Column(Text, nullable=True)  # компактный JSON, см. app/db/fsm_storage.py
+    updated_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class Export(Base):
+    """Выгрузка /db: до каких id дошли по таблицам — для инкрементальной выгрузки"""
+    __tablename__ = "exports"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    format = Column(String(10))
+    tables = Column(Text)
+    cursors = Column(JSON)  # {"data": 120, "observations": 5400}
+
+class Lease(Base):
+    """Аренда разовой работы на все процессы (например, обход каталога), см. app/db/leases.py"""
+    __tablename__ = "leases"
+    name = Column(String(100), primary_key=True)
+    owner = Column(String(100))  # host:pid:… процесса-владельца
+    locked_until = Column(DateTime)
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+    version = Column(Integer, primary_key=True)
+    name = Column(String(100))
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+
+# Схема создаётся и обновляется миграциями (app/db/migrations.py), не при импорте.
+# engine — для фоновых задач в потоках (asyncio.to_thread), async_engine — для хэндлеров.
+engine, async_engine = make_engines()
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.db.model import SessionLocal, Bank, Product, Set, Offer, Observation, ProductSnapshot
+from app.parser.numbers import NUMERIC_FIELDS, normalize_results
+
+RANGE_COLUMNS = [f"{field}_{part}" for field in NUMERIC_FIELDS for part in ("min", "max")]
+
+
+# ---------- Обновление ----------
+def _offer_values(result: dict) -> dict:
+    return {**{column: result.get(column) for column in RANGE_COLUMNS}, "sum_unit": result.get("sum_unit")}
+
+
+def _upsert(db: Session, product: Product, values: dict, updated_at: datetime):
+    insert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+    values = {"set_id": product.set_id, "bank_id": product.bank_id, "updated_at": updated_at, **values}
+    stmt = insert(Offer).values(product_id=product.id, **values)
+    db.execute(stmt.on_conflict_do_update(index_elements=[Offer.product_id], set_=values))
+
+
+def upsert_offer(db: Session, product_id: int, result: dict, updated_at: datetime | None = None):
+    """Обновляет текущее предложение продукта по свежему результату (в текущей транзакции)"""
+    product = db.get(Product, product_id)
+    if product is None:
+        return
+    normalized = normalize_results([dict(result)])[0]
+    _upsert(db, product, _offer_values(normalized), updated_at or datetime.utcnow())
+
+
+def rebuild_offers(db: Session) -> int:
+    """Заполняет offers по последнему удачному снимку каждого продукта"""
+    latest = (
+        select(ProductSnapshot.product_id, func.max(ProductSnapshot.fetched_at).label("fetched_at"))
+        .where(ProductSnapshot.status == "ok")
+        .group_by(ProductSnapshot.product_id)
+        .subquery()
+    )
+    rows = db.execute(
+        select(Product, ProductSnapshot.result, ProductSnapshot.fetched_at)
+        .join(latest, latest.c.product_id == Product.id)
+        .join(ProductSnapshot, (ProductSnapshot.product_id == latest.c.product_id)
+              & (ProductSnapshot.fetched_at == latest.c.fetched_at))
+    ).all()
+
+    results = normalize_results([dict(result or {}) for _, result, _ in rows])
+    for (product, _, fetched_at), result in zip(rows, results):
+        _upsert(db, product, _offer_values(result), fetched_at)
+    return len(rows)
+
+
+# ---------- Рейтинги ----------
+def _offers_query(set_name: str | None):
+    stmt = (
+        select(Offer, Product.name.label("product"), Bank.name.label("bank"))
+        .join(Product, Product.id == Offer.product_id)
+        .outerjoin(Bank, Bank.id == Offer.bank_id)
+    )
+    if set_name:
+        stmt = stmt.join(Set, Set.id == Offer.set_id).where(Set.name == set_name)
+    return stmt
+
+
+def _offer_dict(offer: Offer, product: str, bank: str | None) -> dict:
+    return {"product": product, "bank": bank, "updated_at": offer.updated_at,
+            **{column: getattr(offer, column) for column in [*RANGE_COLUMNS, "sum_unit"]}}
+
+
+def _fetch(stmt) -> list[dict]:
+    db = SessionLocal()
+    try:
+        return [_offer_dict(*row) for row in db.execute(stmt).all()]
+    finally:
+        db.close()
+
+
+def _rate_key(highest: bool):
+    # «от 9,9%» — у кредита важна нижняя граница, у депозита — верхняя
+    if highest:
+        return func.coalesce(Offer.rate_max, Offer.rate_min).desc()
+    return func.coalesce(Offer.rate_min, Offer.rate_max).asc()
+
+
+def best_offers(amount: float | None = None, term_months: float | None = None, currency: str = "BYN",
+                set_name: str | None = None, highest: bool = False, limit: int = 5) -> list[dict]:
+    """Лучшие ставки для суммы `amount` на срок `term_months`.
+
+    По умолчанию — самые низкие (кредиты), с `highest=True` — самые высокие
+    (депозиты). Продукт проходит, если сумма и срок попадают в его диапазон;
+    неизвестная граница не отсекает.
+    """
+    stmt = _offers_query(set_name).where(or_(Offer.rate_min.isnot(None), Offer.rate_max.isnot(None)))
+    if amount is not None:
+        stmt = stmt.where(
+            or_(Offer.sum_unit == currency, Offer.sum_unit.is_(None)),
+            or_(Offer.sum_min.is_(None), Offer.sum_min <= amount),
+            or_(Offer.sum_max.is_(None), Offer.sum_max >= amount),
+        )
+    if term_months is not None:
+        stmt = stmt.where(
+            or_(Offer.term_min.is_(None), Offer.term_min <= term_months),
+            or_(Offer.term_max.is_(None), Offer.term_max >= term_months),
+        )
+    return _fetch(stmt.order_by(_rate_key(highest), Product.name).limit(limit))
+
+
+def top_offers(field: str = "rate", set_name: str | None = None, highest: bool = False,
+               limit: int = 10) -> list[dict]:
+    """Топ-N продуктов по полю rate, sum или term"""
+    stmt = _offers_query(set_name)
+    if field == "rate":
+        stmt = stmt.where(or_(Offer.rate_min.isnot(None), Offer.rate_max.isnot(None)))
+        order = _rate_key(highest)
+    else:
+        column = getattr(Offer, f"{field}_max" if highest else f"{field}_min")
+        stmt = stmt.where(column.isnot(None))
+        order = column.desc() if highest else column.asc()
+    return _fetch(stmt.order_by(order, Product.name).limit(limit))
+
+
+def biggest_movers(field: str = "rate", days: int = 7, set_name: str | None = None,
+                   limit: int = 10) -> list[dict]:
+    """Продукты, у которых поле сильнее всего изменилось за `days` дней (текущее против прошлого)"""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    rank = func.row_number().over(
+        partition_by=Observation.product_id, order_by=(Observation.fetched_at.desc(), Observation.id.desc())
+    )
+    before = (
+        select(Observation.product_id, Observation.value_min, Observation.value_max,
+               Observation.fetched_at, rank.label("rank"))
+        .where(Observation.field == field, Observation.fetched_at < cutoff, Observation.product_id.isnot(None))
+        .subquery()
+    )
+    now_value = func.coalesce(getattr(Offer, f"{field}_min"), getattr(Offer, f"{field}_max"))
+    was_value = func.coalesce(before.c.value_min, before.c.value_max)
+    delta = (now_value - was_value).label("delta")
+
+    stmt = (
+        _offers_query(set_name)
+        .add_columns(was_value.label("was"), now_value.label("now"), delta, before.c.fetched_at.label("was_at"))
+        .join(before, and_(before.c.product_id == Offer.product_id, before.c.rank == 1))
+        .where(now_value.isnot(None), was_value.isnot(None), now_value != was_value)
+        .order_by(func.abs(now_value - was_value).desc(), Product.name)
+        .limit(limit)
+    )
+    db = SessionLocal()
+    try:
+        return [
+            {**_offer_dict(offer, product, bank), "was": was, "now": now, "delta": round(delta, 2), "was_at": was_at}
+            for offer, product, bank, was, now, delta, was_at in db.execute(stmt).all()
+        ]
+    finally:
+        db.close()
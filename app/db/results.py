@@ -0,0 +1,243 @@
+import json
+import zlib
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.db.model import SessionLocal, FIELD_NAMES, Data, Observation, Product, Bank, ProductSnapshot
+from app.parser.numbers import NUMERIC_FIELDS, parse_range, normalize_column, normalize_results
+from config import DATA_ARCHIVE_PAYLOAD
+
+OBSERVED_FIELDS = list(FIELD_NAMES.keys())
+BACKFILL_CHUNK = 500
+
+
+# ---------- Data.payload: JSON или сжатый архив ----------
+def pack_payload(results: list[dict], archive: bool = DATA_ARCHIVE_PAYLOAD) -> dict:
+    """Колонки Data для результатов запуска"""
+    if not archive:
+        return {"payload": results, "payload_archive": None}
+    raw = json.dumps(results, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return {"payload": None, "payload_archive": zlib.compress(raw, 6)}
+
+
+def unpack_payload(payload, payload_archive: bytes | None) -> list[dict]:
+    if payload is not None:
+        return payload
+    if payload_archive:
+        return json.loads(zlib.decompress(payload_archive))
+    return []
+
+
+# ---------- Наблюдения ----------
+def _raw(value) -> str | None:
+    if value is None or value == "null":
+        return None
+    if isinstance(value, (list, tuple)):
+        return ", ".join(str(v) for v in value)
+    return str(value)
+
+
+def observation_rows(data_id: int | None, results: list[dict], product_ids: list[int | None],
+                     bank_ids: list[int | None], fetched_at: list[datetime]) -> list[dict]:
+    rows = []
+    for result, product_id, bank_id, observed_at in zip(results, product_ids, bank_ids, fetched_at):
+        for field in OBSERVED_FIELDS:
+            raw = _raw(result.get(field))
+            if raw is None:
+                continue
+            if field in NUMERIC_FIELDS:
+                value_min, value_max, unit = (result.get(f"{field}_{part}") for part in ("min", "max", "unit"))
+            else:
+                (value_min, value_max), unit = parse_range(raw), None
+            rows.append({
+                "data_id": data_id,
+                "product_id": product_id,
+                "bank_id": bank_id,
+                "field": field,
+                "raw_value": raw,
+                "value_min": value_min,
+                "value_max": value_max,
+                "unit": unit,
+                "fetched_at": observed_at,
+            })
+    return rows
+
+
+def add_observations(db: Session, data_id: int | None, results: list[dict], product_ids: list[int | None],
+                     fetched_at: list[datetime] | None = None) -> int:
+    """Раскладывает результаты запуска по строкам observations (в текущей транзакции).
+
+    Ставка, сумма и срок берутся уже нормализованными (normalize_results).
+    data_id = None — наблюдения планового обхода, без запуска пользователя."""
+    ids = {product_id for product_id in product_ids if product_id}
+    bank_ids = dict(db.execute(select(Product.id, Product.bank_id).where(Product.id.in_(ids))).all())
+    rows = observation_rows(data_id, results, product_ids, [bank_ids.get(i) for i in product_ids],
+                            fetched_at or [datetime.utcnow()] * len(results))
+    if rows:
+        db.execute(insert(Observation), rows)
+    return len(rows)
+
+
+def backfill_observations(db: Session) -> int:
+    """Наблюдения для старых запусков Data; продукты сопоставляются по имени"""
+    products = {name: (product_id, bank_id) for product_id, name, bank_id in
+                db.execute(select(Product.id, Product.name, Product.bank_id)).all()}
+    banks = dict(db.execute(select(Bank.name, Bank.id)).all())
+    # NULL (наблюдения обхода) в NOT IN отфильтровал бы все запуски
+    done = select(Observation.data_id).where(Observation.data_id.isnot(None)).distinct()
+
+    added = 0
+    last_id = 0
+    while True:
+        runs = db.execute(
+            select(Data.id, Data.created_at, Data.payload, Data.payload_archive)
+            .where(Data.id > last_id, Data.id.not_in(done))
+            .order_by(Data.id)
+            .limit(BACKFILL_CHUNK)
+        ).all()
+        if not runs:
+            return added
+
+        # Нормализуем сразу весь пакет запусков
+        payloads = [[item for item in unpack_payload(payload, archive) if isinstance(item, dict)]
+                    for _, _, payload, archive in runs]
+        normalize_results([item for results in payloads for item in results])
+
+        rows = []
+        for (data_id, created_at, _, _), results in zip(runs, payloads):
+            # Продукта уже нет в каталоге — банк всё равно находим по имени
+            matched = [products.get(item.get("product"), (None, banks.get(item.get("bank")))) for item in results]
+            rows += observation_rows(
+                data_id, results,
+                [product_id for product_id, _ in matched],
+                [bank_id for _, bank_id in matched],
+                [created_at] * len(results),
+            )
+        if rows:
+            db.execute(insert(Observation), rows)
+        added += len(rows)
+        last_id = runs[-1].id
+
+
+def renormalize_observations(db: Session) -> int:
+    """Пересчитывает min/max/unit ставки, суммы и срока у уже сохранённых наблюдений"""
+    updated = 0
+    last_id = 0
+    while True:
+        chunk = db.execute(
+            select(Observation.id, Observation.field, Observation.raw_value)
+            .where(Observation.id > last_id, Observation.field.in_(list(NUMERIC_FIELDS)))
+            .order_by(Observation.id)
+            .limit(BACKFILL_CHUNK * 10)
+        ).all()
+        if not chunk:
+            return updated
+
+        frame = pd.DataFrame(chunk, columns=["id", "field", "raw_value"])
+        rows = []
+        for field, group in frame.groupby("field"):
+            parsed = normalize_column(group["raw_value"], field)
+            parsed = parsed.astype(object).where(parsed.notna(), None)
+            rows += [
+                {"id": observation_id, "value_min": value_min, "value_max": value_max, "unit": unit}
+                for observation_id, (value_min, value_max, unit) in zip(group["id"], parsed.itertuples(index=False))
+            ]
+        db.execute(update(Observation), rows)
+        updated += len(rows)
+        last_id = chunk[-1].id
+
+
+def backfill_snapshot_observations(db: Session) -> int:
+    """Наблюдения из снимков планового обхода, сохранённых до того, как обход стал их писать"""
+    bank_ids = dict(db.execute(select(Product.id, Product.bank_id)).all())
+    added = 0
+    last_id = 0
+    while True:
+        snapshots = db.execute(
+            select(ProductSnapshot.id, ProductSnapshot.product_id, ProductSnapshot.fetched_at, ProductSnapshot.result)
+            .where(ProductSnapshot.id > last_id, ProductSnapshot.source == "schedule",
+                   ProductSnapshot.status == "ok")
+            .order_by(ProductSnapshot.id)
+            .limit(BACKFILL_CHUNK)
+        ).all()
+        if not snapshots:
+            return added
+
+        results = normalize_results([dict(result or {}) for _, _, _, result in snapshots])
+        rows = observation_rows(
+            None, results,
+            [product_id for _, product_id, _, _ in snapshots],
+            [bank_ids.get(product_id) for _, product_id, _, _ in snapshots],
+            [fetched_at for _, _, fetched_at, _ in snapshots],
+        )
+        if rows:
+            db.execute(insert(Observation), rows)
+        added += len(rows)
+        last_id = snapshots[-1].id
+
+
+# ---------- Запросы ----------
+def _bank_filter(stmt, bank_name: str | None):
+    if bank_name:
+        stmt = stmt.join(Bank, Bank.id == Observation.bank_id).where(Bank.name == bank_name)
+    return stmt
+
+
+def latest_values(field: str, bank_name: str | None = None) -> list[dict]:
+    """Последнее значение поля по каждому продукту (например, текущие ставки банка)"""
+    rank = func.row_number().over(
+        partition_by=Observation.product_id, order_by=(Observation.fetched_at.desc(), Observation.id.desc())
+    )
+    ranked = _bank_filter(
+        select(Observation.id, rank.label("rank"))
+        .where(Observation.field == field, Observation.product_id.isnot(None)),
+        bank_name,
+    ).subquery()
+
+    stmt = (
+        select(Observation, Product.name)
+        .join(ranked, (Observation.id == ranked.c.id) & (ranked.c.rank == 1))
+        .join(Product, Product.id == Observation.product_id)
+        .order_by(Product.name)
+    )
+    db = SessionLocal()
+    try:
+        return [
+            {"product": name, "raw": row.raw_value, "min": row.value_min, "max": row.value_max,
+             "unit": row.unit, "fetched_at": row.fetched_at}
+            for row, name in db.execute(stmt).all()
+        ]
+    finally:
+        db.close()
+
+
+def value_changes(field: str, bank_name: str | None = None) -> list[dict]:
+    """Запуски, в которых значение поля продукта отличалось от предыдущего"""
+    previous = func.lag(Observation.raw_value).over(
+        partition_by=(Observation.product_id, Observation.field), order_by=Observation.fetched_at
+    )
+    history = _bank_filter(
+        select(Observation.data_id, Observation.product_id, Observation.raw_value,
+               Observation.fetched_at, previous.label("previous"))
+        .where(Observation.field == field, Observation.product_id.isnot(None)),
+        bank_name,
+    ).subquery()
+
+    stmt = (
+        select(history, Product.name)
+        .join(Product, Product.id == history.c.product_id)
+        .where(history.c.previous.isnot(None), history.c.previous != history.c.raw_value)
+        .order_by(history.c.fetched_at)
+    )
+    db = SessionLocal()
+    try:
+        return [
+            {"data_id": row.data_id, "product": row.name, "was": row.previous, "now": row.raw_value,
+             "fetched_at": row.fetched_at}
+            for row in db.execute(stmt).all()
+        ]
+    finally:
+        db.close()
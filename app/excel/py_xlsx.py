@@ -1,22 +1,99 @@
-import pandas as pd
-from pathlib import Path
-from typing import Dict, Any, List, Optional
-from openpyxl.styles import Alignment, Font
+import io
+from itertools import islice
+from typing import Dict, Any, Iterable, List, NamedTuple, Optional, Tuple
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
 from openpyxl.utils import get_column_letter
 from datetime import datetime
-import shutil
-import os
 
+from app.parser.numbers import NUMERIC_FIELDS
 from config import FIELD_NAMES
 
 FIELD_ORDER = list(FIELD_NAMES.keys())
 
+MAX_WIDTH = 50
+# Ширина колонок считается по заголовку и первым строкам: в write-only режиме
+# её нужно задать до первой записанной строки, остальные строки идут потоком
+WIDTH_SAMPLE_ROWS = 200
+
+WRAP = Alignment(wrap_text=True, vertical='top')
+BOLD = Font(bold=True)
+CHANGED_FILL = PatternFill("solid", fgColor="FFF2CC")
+
+
+class Highlight(NamedTuple):
+    """Значение ячейки, выделенное заливкой (например, изменившееся)"""
+    value: Any
+
+# Лист: (название, заголовок, строки)
+Sheet = Tuple[str, List[Any], Iterable[List[Any]]]
+
+
+def _cell_value(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float, bool, datetime)):
+        return value
+    if isinstance(value, (list, tuple, set)):
+        return ", ".join(str(v) for v in value)
+    return str(value)
+
+
+def _write_sheet(workbook: Workbook, title: str, header: List[Any], rows: Iterable[List[Any]]):
+    worksheet = workbook.create_sheet(title[:31])
+    widths: List[int] = []
+
+    def prepare(row: List[Any], font: Optional[Font] = None) -> List[WriteOnlyCell]:
+        cells = []
+        for index, value in enumerate(row):
+            highlighted = isinstance(value, Highlight)
+            value = _cell_value(value.value if highlighted else value)
+            length = len(str(value)) if value is not None else 0
+            if index < len(widths):
+                widths[index] = max(widths[index], length)
+            else:
+                widths.append(length)
+
+            cell = WriteOnlyCell(worksheet, value=value)
+            cell.alignment = WRAP
+            if font:
+                cell.font = font
+            if highlighted:
+                cell.fill = CHANGED_FILL
+            cells.append(cell)
+        return cells
+
+    rows = iter(rows)
+    head = [prepare(header, BOLD)] + [prepare(row) for row in islice(rows, WIDTH_SAMPLE_ROWS)]
+
+    for index, width in enumerate(widths, start=1):
+        worksheet.column_dimensions[get_column_letter(index)].width = min(width + 2, MAX_WIDTH)
+
+    for cells in head:
+        worksheet.append(cells)
+    for row in rows:
+        worksheet.append(prepare(row))
+
+
+def write_workbook(sheets: Iterable[Sheet]) -> bytes:
+    """Пишет листы в xlsx в памяти (write-only, строки потоком); возвращает содержимое файла"""
+    workbook = Workbook(write_only=True)
+    for title, header, rows in sheets:
+        _write_sheet(workbook, title, header, rows)
+
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def report_filename(prefix: str = "ТГ_Бенчмаркинг") -> str:
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+
+
 def create_bank_excel_report(
-    results: List[Dict[str, Any]], 
-    output_dir: str = "./",
+    results: List[Dict[str, Any]],
     selected_characteristics: Optional[List[str]] = None,
-    pdf_path: Optional[str] = None  # Параметр для PDF-файла
-) -> str:
+) -> Tuple[str, bytes]:
+    """Сравнительная таблица банков; возвращает (имя файла, содержимое xlsx)"""
 
     # Если характеристики не указаны, используем все
     if not selected_characteristics:
@@ -27,79 +104,37 @@ def create_bank_excel_report(
 
     banks_order = ["Сбер"]
     bank_data = {}
-    
+
     for result in results:
         bank = result.get("bank", "Unknown")
         if bank not in bank_data:
             bank_data[bank] = result
             if bank != "Сбер":
                 banks_order.append(bank)
-    
+
 
     num_banks = len(banks_order)
     print(f"Создаем таблицу для {num_banks} банков: {banks_order}")
     print(f"Характеристики: {field_order}")
-    
-
-    data_rows = []
-    for field in field_order:
-        row = [FIELD_NAMES[field]]  
-        for bank in banks_order:
-            bank_info = bank_data.get(bank, {})
-            value = bank_info.get(field)
-            row.append(value)
-        data_rows.append(row)
-
-    df = pd.DataFrame(data_rows, columns=["Параметр"] + banks_order)
-    
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"ТГ_Бенчмаркинг_{timestamp}.xlsx"
-    filepath = Path(output_dir) / filename
-    filepath.parent.mkdir(parents=True, exist_ok=True)
-    
-    with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Карты банков', index=False)
-        
-        worksheet = writer.sheets['Карты банков']
-        
-        # Добавляем PDF-файл если он указан
-        if pdf_path and os.path.exists(pdf_path):
-            pdf_filename = os.path.basename(pdf_path)
-            
-            # Копируем PDF в папку рядом с Excel
-            output_pdf_path = filepath.parent / pdf_filename
-            shutil.copy(pdf_path, output_pdf_path)
-            
-            # Добавляем строку с ссылкой на PDF (после таблицы)
-            pdf_row = len(df) + 3
-            worksheet[f'A{pdf_row}'] = "📎 Документ:"
-            worksheet[f'B{pdf_row}'] = pdf_filename
-            
-            # Делаем гиперссылку на PDF
-            cell = worksheet[f'B{pdf_row}']
-            cell.hyperlink = pdf_filename
-            cell.font = Font(color="0563C1", underline="single")
-            
-            # Форматирование
-            worksheet[f'A{pdf_row}'].font = Font(bold=True)
-        
-        for row in worksheet.iter_rows():
-            for cell in row:
-                cell.alignment = Alignment(wrap_text=True, vertical='top')
-        for column in worksheet.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value or "")) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            worksheet.column_dimensions[column_letter].width = adjusted_width
-    
-    return str(filepath)
+
+
+    def data_rows():
+        for field in field_order:
+            yield [FIELD_NAMES[field]] + [bank_data.get(bank, {}).get(field) for bank in banks_order]
+            if field not in NUMERIC_FIELDS:
+                continue
+            # Под текстом — числа из normalize_results, чтобы банки можно было сортировать и сравнивать
+            unit = NUMERIC_FIELDS[field][1]
+            suffix = f" ({unit})" if unit else ""
+            parts = [("min", f", мин{suffix}"), ("max", f", макс{suffix}")] + ([] if unit else [("unit", ", валюта")])
+            for part, label in parts:
+                yield [FIELD_NAMES[field] + label] + [
+                    bank_data.get(bank, {}).get(f"{field}_{part}") for bank in banks_order
+                ]
+
+    content = write_workbook([('Карты банков', ["Параметр"] + banks_order, data_rows())])
+    return report_filename(), content
 
 
 def get_field_name(field: str) -> str:
-    return FIELD_NAMES.get(field, field)
\ No newline at end of file
+    return FIELD_NAMES.get(field, field)
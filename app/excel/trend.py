@@ -0,0 +1,174 @@
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import exists, or_, select
+
+from app.db.model import SessionLocal, Bank, Data, Observation, Product
+from app.db.results import _raw, unpack_payload
+from app.excel.py_xlsx import Highlight, write_workbook, report_filename
+from config import FIELD_NAMES, TREND_DAYS
+
+# Поля, изменения которых показываются первыми в сводке
+KEY_FIELDS = ["rate", "term", "sum"]
+ID_COLUMNS = ["run_at", "data_id", "bank", "product"]
+
+
+def _observed(product_names: List[str], date_from: datetime, date_to: Optional[datetime]) -> pd.DataFrame:
+    """Значения из observations: индекс (product_id, field, fetched_at), без разбора JSON"""
+    db = SessionLocal()
+    try:
+        stmt = (
+            select(Observation.fetched_at, Observation.data_id, Bank.name, Product.name,
+                   Observation.field, Observation.raw_value)
+            .join(Product, Product.id == Observation.product_id)
+            .outerjoin(Bank, Bank.id == Observation.bank_id)
+            .where(Observation.fetched_at >= date_from)
+        )
+        if date_to:
+            stmt = stmt.where(Observation.fetched_at < date_to)
+        if product_names:
+            product_ids = db.scalars(select(Product.id).where(Product.name.in_(product_names))).all()
+            stmt = stmt.where(Observation.product_id.in_(product_ids))
+        rows = db.execute(stmt).all()
+    finally:
+        db.close()
+    return pd.DataFrame(rows, columns=ID_COLUMNS + ["field", "value"])
+
+
+def _unobserved_runs(product_names: List[str], date_from: datetime, date_to: Optional[datetime]) -> pd.DataFrame:
+    """Запуски Data без наблюдений (не попали в backfill) — разбираем payload"""
+    stmt = (
+        select(Data.id, Data.created_at, Data.payload, Data.payload_archive)
+        .where(Data.created_at >= date_from, ~exists().where(Observation.data_id == Data.id))
+    )
+    if date_to:
+        stmt = stmt.where(Data.created_at < date_to)
+    if product_names:
+        # card_set — имена продуктов запуска через запятую; грубый фильтр до разбора JSON
+        stmt = stmt.where(or_(*[Data.card_set.contains(name, autoescape=True) for name in product_names]))
+
+    db = SessionLocal()
+    try:
+        runs = db.execute(stmt).all()
+    finally:
+        db.close()
+
+    records = [
+        {**item, "data_id": data_id, "run_at": created_at}
+        for data_id, created_at, payload, archive in runs
+        for item in unpack_payload(payload, archive)
+        if isinstance(item, dict)
+    ]
+    if not records:
+        return pd.DataFrame(columns=ID_COLUMNS + ["field", "value"])
+
+    wide = pd.DataFrame.from_records(records)
+    for column in ID_COLUMNS:
+        if column not in wide:
+            wide[column] = None
+    fields = [field for field in FIELD_NAMES if field in wide.columns]
+    history = wide.melt(id_vars=ID_COLUMNS, value_vars=fields, var_name="field", value_name="value")
+    history["value"] = history["value"].map(_raw)
+    return history
+
+
+def load_history(product_names: List[str], date_from: datetime,
+                 date_to: Optional[datetime] = None) -> pd.DataFrame:
+    """История значений в длинном формате: run_at, data_id, bank, product, field, value.
+
+    Основной источник — observations (запуски пользователей и плановый обход);
+    payload разбирается только у запусков, для которых наблюдений нет.
+    """
+    frames = [_observed(product_names, date_from, date_to), _unobserved_runs(product_names, date_from, date_to)]
+    history = pd.concat([frame for frame in frames if not frame.empty] or frames[:1], ignore_index=True)
+    history = history[history["field"] != "files"]
+    if product_names:
+        history = history[history["product"].isin(product_names)]
+    history["value"] = history["value"].astype("string").str.strip().replace({"": pd.NA, "null": pd.NA})
+    return history.sort_values(["product", "field", "run_at"], ignore_index=True)
+
+
+def mark_changes(history: pd.DataFrame) -> pd.DataFrame:
+    """Столбцы changed (значение отличается от предыдущего известного значения того же поля)
+    и previous (это предыдущее значение)"""
+    known = history.dropna(subset=["value"])
+    previous = known.groupby(["product", "field"], sort=False)["value"].shift()
+    changed = previous.notna() & (known["value"] != previous)
+    history = history.copy()
+    history["changed"] = changed.reindex(history.index, fill_value=False).astype(bool)
+    history["previous"] = previous.reindex(history.index)
+    return history
+
+
+def summarize(history: pd.DataFrame) -> pd.DataFrame:
+    """По каждому продукту и полю: значение до последнего изменения и текущее, число изменений, дата последнего"""
+    grouped = history.groupby(["product", "field"], sort=False)
+    summary = grouped.agg(
+        bank=("bank", "last"),
+        last=("value", "last"),
+        changes=("changed", "sum"),
+    )
+    # history упорядочена по run_at внутри продукта и поля: последняя строка группы — последнее изменение
+    last_changes = history[history["changed"]].groupby(["product", "field"]).tail(1).set_index(["product", "field"])
+    summary["was"] = last_changes["previous"]
+    summary["last_change"] = last_changes["run_at"]
+    summary = summary[summary["changes"] > 0].reset_index()
+
+    summary["key"] = ~summary["field"].isin(KEY_FIELDS)
+    return summary.sort_values(["key", "changes"], ascending=[True, False]).drop(columns="key")
+
+
+def _field_rows(history: pd.DataFrame, field: str, products: List[str]):
+    """Строки листа поля: запуск × продукт, изменившиеся значения выделены"""
+    subset = history[history["field"] == field]
+    values = subset.pivot_table(index="run_at", columns="product", values="value", aggfunc="last")
+    changed = subset.pivot_table(index="run_at", columns="product", values="changed", aggfunc="max")
+    values = values.reindex(columns=products)
+    changed = changed.reindex(index=values.index, columns=products).fillna(False).astype(bool)
+
+    for (run_at, row), (_, flags) in zip(values.iterrows(), changed.iterrows()):
+        yield [run_at.strftime("%Y-%m-%d %H:%M")] + [
+            None if pd.isna(value) else (Highlight(value) if flag else value)
+            for value, flag in zip(row.tolist(), flags.tolist())
+        ]
+
+
+def create_trend_report(
+    product_names: List[str],
+    selected_characteristics: Optional[List[str]] = None,
+    days: int = TREND_DAYS,
+) -> Optional[Tuple[str, bytes]]:
+    """Книга динамики по прошлым запускам; None — истории нет"""
+    history = load_history(product_names, datetime.utcnow() - timedelta(days=days))
+    if history.empty:
+        return None
+
+    history = mark_changes(history)
+    summary = summarize(history)
+    products = [name for name in product_names if name in set(history["product"])] or \
+        sorted(history["product"].dropna().unique())
+
+    fields = [field for field in FIELD_NAMES if field in set(history["field"])]
+    if selected_characteristics:
+        fields = [field for field in fields if field in selected_characteristics]
+
+    runs = history["run_at"].nunique()
+    print(f"Динамика: {runs} запусков, {len(products)} продуктов, изменений: {int(summary['changes'].sum())}")
+
+    summary_rows = [
+        [row.product, row.bank, FIELD_NAMES.get(row.field, row.field), row.was, Highlight(row.last),
+         int(row.changes), row.last_change.strftime("%Y-%m-%d %H:%M")]
+        for row in summary.itertuples(index=False)
+    ] or [["Изменений за период нет"]]
+
+    sheets = [(
+        "Изменения",
+        ["Продукт", "Банк", "Параметр", "Было", "Стало", "Изменений", "Последнее изменение"],
+        summary_rows,
+    )]
+    sheets += [
+        (FIELD_NAMES[field], ["Запуск"] + products, _field_rows(history, field, products))
+        for field in fields
+    ]
+    return report_filename("ТГ_Динамика"), write_workbook(sheets)
@@ -0,0 +1,172 @@
+import asyncio
+import html
+import logging
+import os
+from datetime import datetime, timedelta
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import FSInputFile, Message
+
+from app.db.backend import is_sqlite
+from app.db.catalog import catalog
+from app.db.export import (FORMATS, TELEGRAM_FILE_LIMIT, backup_file, export_for_user, record_export,
+                           remove_export)
+from app.jobs.scheduler import catalog_scheduler
+from app.llm.usage import usage_report
+from config import ADMIN_IDS, EXPORT_TABLES
+
+router = Router()
+
+
+def is_admin(user_id: int) -> bool:
+    # Пустой ADMIN_IDS — админов нет: /db выгружает всю базу, открывать её всем нельзя
+    return user_id in ADMIN_IDS
+
+
+def warn_if_no_admins():
+    if not ADMIN_IDS:
+        logging.warning("-! ADMIN_IDS is empty — admin commands (/llmstats, /crawl, /catalog, /db) are disabled")
+
+
+def parse_date_range(args: str | None, default_days: int = 7) -> tuple[datetime, datetime]:
+    """«ГГГГ-ММ-ДД [ГГГГ-ММ-ДД]» → [начало, конец); по умолчанию последние N дней"""
+    parts = (args or "").split()
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    date_from = datetime.strptime(parts[0], "%Y-%m-%d") if parts else today - timedelta(days=default_days - 1)
+    date_to = datetime.strptime(parts[1], "%Y-%m-%d") if len(parts) > 1 else today
+    return date_from, date_to + timedelta(days=1)
+
+
+@router.message(Command("llmstats"))
+async def llm_stats(message: Message, command: CommandObject):
+    """Расход токенов и задержки LLM по банкам за период"""
+    if not is_admin(message.from_user.id):
+        return
+
+    try:
+        date_from, date_to = parse_date_range(command.args)
+    except ValueError:
+        await message.answer("Формат: /llmstats ГГГГ-ММ-ДД [ГГГГ-ММ-ДД]")
+        return
+
+    report = await asyncio.to_thread(usage_report, date_from, date_to)
+    period = f"{date_from:%Y-%m-%d} — {(date_to - timedelta(days=1)):%Y-%m-%d}"
+    if not report:
+        await message.answer(f"Нет вызовов LLM за {period}")
+        return
+
+    lines = [f"{'Банк':<16}{'выз':>5}{'fb':>4}{'err':>4}{'токены':>9}{'руб':>8}{'p50':>7}{'p95':>7}"]
+    for row in report:
+        lines.append(
+            f"{row['bank'][:15]:<16}{row['calls']:>5}{row['fallbacks']:>4}{row['errors']:>4}"
+            f"{row['tokens']:>9}{row['cost']:>8.2f}{row['p50_ms'] / 1000:>6.1f}s{row['p95_ms'] / 1000:>6.1f}s"
+        )
+    total_cost = sum(row["cost"] for row in report)
+    total_tokens = sum(row["tokens"] for row in report)
+
+    await message.answer(
+        f"📈 LLM за {period}\n"
+        f"<pre>{html.escape(chr(10).join(lines))}</pre>\n"
+        f"Итого: {total_tokens} токенов, {total_cost:.2f} руб."
+    )
+
+
+@router.message(Command("crawl"))
+async def crawl_now(message: Message):
+    """Внеплановый обход каталога (только устаревшие продукты)"""
+    if not is_admin(message.from_user.id):
+        return
+
+    await message.answer("🔄 Обход каталога запущен")
+
+    async def run():
+        try:
+            count = await catalog_scheduler.run_once()
+            await message.answer(f"✅ Обход каталога завершён, обновлено продуктов: {count}")
+        except Exception as e:
+            await message.answer(f"❌ Ошибка обхода каталога: {e}")
+
+    asyncio.create_task(run())
+
+
+@router.message(Command("catalog"))
+async def reload_catalog(message: Message):
+    """Перечитать каталог из БД после ручных правок наборов/продуктов"""
+    if not is_admin(message.from_user.id):
+        return
+
+    snapshot = await catalog.load()
+    await message.answer(
+        f"🔄 Каталог перечитан: наборов {len(snapshot.sets)}, продуктов {len(snapshot.products)}, "
+        f"банков {len(snapshot.banks)}, характеристик {len(snapshot.characteristics)}"
+    )
+
+
+DB_USAGE = (
+    "Формат: /db [таблицы через запятую] [csv|parquet] [new] [ГГГГ-ММ-ДД [ГГГГ-ММ-ДД]]\n"
+    "new — только строки после прошлой выгрузки; /db file — весь файл SQLite\n"
+    f"Таблицы по умолчанию: {', '.join(EXPORT_TABLES)}"
+)
+
+
+def parse_export_args(args: str | None) -> dict:
+    """Аргументы /db → параметры export_for_user"""
+    options = {"tables": [], "fmt": "csv", "incremental": False, "date_from": None, "date_to": None}
+    dates = []
+    for word in (args or "").split():
+        lowered = word.lower()
+        if lowered in FORMATS:
+            options["fmt"] = lowered
+        elif lowered in ("new", "новое"):
+            options["incremental"] = True
+        elif lowered[:1].isdigit():
+            dates.append(word)
+        else:
+            options["tables"] += [name.strip() for name in lowered.split(",") if name.strip()]
+    if dates:
+        options["date_from"], options["date_to"] = parse_date_range(" ".join(dates))
+    return options
+
+
+@router.message(Command("db"))
+async def export_database(message: Message, command: CommandObject):
+    """Согласованная выгрузка таблиц в zip (CSV/Parquet), не блокируя запись в БД"""
+    if not is_admin(message.from_user.id):
+        return
+
+    if (command.args or "").strip().lower() in ("file", "файл"):
+        if not is_sqlite():
+            await message.answer("Выгрузка файла базы доступна только для SQLite")
+            return
+        await _send_export(message, await asyncio.to_thread(backup_file), "Копия базы данных")
+        return
+
+    try:
+        options = parse_export_args(command.args)
+        result = await asyncio.to_thread(export_for_user, message.from_user.id, **options)
+    except ValueError as e:
+        await message.answer(f"{html.escape(str(e))}\n\n{html.escape(DB_USAGE)}")
+        return
+    except Exception as e:
+        await message.answer(f"Ошибка выгрузки: {html.escape(str(e))}")
+        return
+
+    summary = ", ".join(f"{name}: {count}" for name, count in result.rows.items())
+    if await _send_export(message, result.path, f"Выгрузка ({options['fmt']}): {summary}"):
+        await asyncio.to_thread(record_export, message.from_user.id, options["fmt"], result)
+
+
+async def _send_export(message: Message, path: str, caption: str) -> bool:
+    try:
+        if os.path.getsize(path) > TELEGRAM_FILE_LIMIT:
+            await message.answer("Файл больше 50 МБ — сузьте период или список таблиц")
+            return False
+        await message.answer_document(FSInputFile(path), caption=caption[:1024])
+        return True
+    except Exception as e:
+        await message.answer(f"Ошибка при отправке файла: {html.escape(str(e))}")
+        return False
+    finally:
+        remove_export(path)
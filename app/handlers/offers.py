@@ -0,0 +1,151 @@
+import asyncio
+import html
+import math
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from app.db.catalog import catalog
+from app.db.offers import best_offers, top_offers, biggest_movers
+from app.parser.numbers import NUMERIC_FIELDS
+from config import FIELD_NAMES
+
+router = Router()
+
+CURRENCIES = NUMERIC_FIELDS["sum"][0]
+# Пределы аргументов: топ длиннее не помещается в одно сообщение Telegram (4096 символов)
+TOP_MAX = 25
+MOVERS_MAX_DAYS = 365
+
+
+def _num(value: float) -> str:
+    return f"{value:,.2f}".rstrip("0").rstrip(".").replace(",", " ")
+
+
+def _range(value_min: float | None, value_max: float | None, unit: str | None = "") -> str:
+    unit = f" {unit}" if unit and unit != "%" else (unit or "")
+    if value_min is None and value_max is None:
+        return "—"
+    if value_min is None:
+        return f"до {_num(value_max)}{unit}"
+    if value_max is None:
+        return f"от {_num(value_min)}{unit}"
+    if value_min == value_max:
+        return f"{_num(value_min)}{unit}"
+    return f"{_num(value_min)}–{_num(value_max)}{unit}"
+
+
+def _offer_line(position: int, offer: dict) -> str:
+    return (
+        f"{position}. <b>{html.escape(offer['bank'] or '')}</b> — {html.escape(offer['product'])}: "
+        f"{_range(offer['rate_min'], offer['rate_max'], '%')}"
+        f" · сумма {_range(offer['sum_min'], offer['sum_max'], offer['sum_unit'])}"
+        f" · срок {_range(offer['term_min'], offer['term_max'], 'мес')}"
+    )
+
+
+async def _parse_args(args: str | None) -> tuple[str | None, list[float], str | None, str | None]:
+    """Набор (по началу названия), числа, валюта, поле из аргументов команды"""
+    snapshot = await catalog.get()
+    set_name = currency = field = None
+    numbers = []
+    for word in (args or "").split():
+        lowered = word.lower()
+        matched = [item.name for item in snapshot.sets.values() if item.name.lower().startswith(lowered)]
+        if matched and not set_name:
+            set_name = matched[0]
+        elif word.upper() in CURRENCIES:
+            currency = word.upper()
+        elif lowered in NUMERIC_FIELDS:
+            field = lowered
+        else:
+            number = float(word.replace(",", "."))
+            if not math.isfinite(number):
+                raise ValueError(word)
+            numbers.append(number)
+    return set_name, numbers, currency, field
+
+
+def _clamp(value: float, low: int, high: int) -> int:
+    return int(min(max(value, low), high))
+
+
+def _is_deposit(set_name: str | None) -> bool:
+    # По депозитам лучшая ставка — самая высокая
+    return bool(set_name) and "депозит" in set_name.lower()
+
+
+@router.message(Command("best"))
+async def best_offers_handler(message: Message, command: CommandObject):
+    """Лучшие ставки для суммы и срока по последним данным"""
+    try:
+        set_name, numbers, currency, _ = await _parse_args(command.args)
+    except ValueError:
+        await message.answer("Формат: /best [набор] [сумма] [срок, мес] [BYN|USD|EUR]\nНапример: /best кредиты 5000 24")
+        return
+
+    amount = numbers[0] if numbers else None
+    term = numbers[1] if len(numbers) > 1 else None
+    currency = currency or "BYN"
+    offers = await asyncio.to_thread(
+        best_offers, amount, term, currency, set_name, _is_deposit(set_name)
+    )
+
+    conditions = [set_name or "все наборы"]
+    if amount is not None:
+        conditions.append(f"{_num(amount)} {currency}")
+    if term is not None:
+        conditions.append(f"{_num(term)} мес")
+    if not offers:
+        await message.answer(f"Нет подходящих предложений ({', '.join(conditions)})")
+        return
+
+    lines = [_offer_line(position, offer) for position, offer in enumerate(offers, start=1)]
+    await message.answer(f"🏆 Лучшие ставки ({', '.join(conditions)}):\n" + "\n".join(lines))
+
+
+@router.message(Command("top"))
+async def top_offers_handler(message: Message, command: CommandObject):
+    """Топ-N продуктов по ставке, сумме или сроку"""
+    try:
+        set_name, numbers, _, field = await _parse_args(command.args)
+    except ValueError:
+        await message.answer("Формат: /top [набор] [rate|sum|term] [N]\nНапример: /top депозиты rate 10")
+        return
+
+    field = field or "rate"
+    limit = _clamp(numbers[0], 1, TOP_MAX) if numbers else 10
+    highest = _is_deposit(set_name) if field == "rate" else True
+    offers = await asyncio.to_thread(top_offers, field, set_name, highest, limit)
+    if not offers:
+        await message.answer("Нет данных — сначала соберите информацию по продуктам")
+        return
+
+    lines = [_offer_line(position, offer) for position, offer in enumerate(offers, start=1)]
+    await message.answer(f"📋 Топ-{limit}: {FIELD_NAMES[field]} ({set_name or 'все наборы'}):\n" + "\n".join(lines))
+
+
+@router.message(Command("movers"))
+async def movers_handler(message: Message, command: CommandObject):
+    """Кто сильнее всего изменил условия за N дней (по умолчанию неделя)"""
+    try:
+        set_name, numbers, _, field = await _parse_args(command.args)
+    except ValueError:
+        await message.answer("Формат: /movers [набор] [rate|sum|term] [дней]\nНапример: /movers кредиты 7")
+        return
+
+    field = field or "rate"
+    days = _clamp(numbers[0], 1, MOVERS_MAX_DAYS) if numbers else 7
+    movers = await asyncio.to_thread(biggest_movers, field, days, set_name)
+    if not movers:
+        await message.answer(f"За {days} дн. изменений ({FIELD_NAMES[field]}) нет")
+        return
+
+    unit = NUMERIC_FIELDS[field][1] or ""
+    lines = [
+        f"{position}. <b>{html.escape(row['bank'] or '')}</b> — {html.escape(row['product'])}: "
+        f"{_num(row['was'])} → {_num(row['now'])} {unit} ({'+' if row['delta'] > 0 else ''}{_num(row['delta'])})"
+        for position, row in enumerate(movers, start=1)
+    ]
+    await message.answer(f"📉 Изменения за {days} дн.: {FIELD_NAMES[field]}\n" + "\n".join(lines))
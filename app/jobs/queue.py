@@ -0,0 +1,430 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from aiogram import Bot
+from aiogram.types import BufferedInputFile
+from sqlalchemy import and_, or_
+
+from app.db.leases import WORKER_ID
+from app.db.model import SessionLocal, Log, Data, Bank, Product, Job, JobItem
+from app.db.results import pack_payload, add_observations
+from app.excel.py_xlsx import create_bank_excel_report
+from app.parser.numbers import normalize_results
+from app.jobs.snapshots import fresh_snapshots, save_snapshot
+from app.llm.cache import extraction_cache
+from app.parser.extract import _empty_schema
+from app.parser.product import ProductTask, build_product_pipeline, changed_products
+from app.telegram.sender import sender
+from config import (JOB_WORKERS, JOB_POLL_INTERVAL, JOB_MAX_ATTEMPTS, JOB_LEASE_SECONDS,
+                    SNAPSHOT_MAX_AGE_HOURS)
+
+
+# ---------- Работа с БД (вызывается через asyncio.to_thread) ----------
+def enqueue_report(user_id: int, chat_id: int, message_id: int | None,
+                   product_ids: list[int], characteristics: list[str]) -> int:
+    """Создаёт задачу отчёта и её продукты; возвращает id задачи"""
+    db = SessionLocal()
+    try:
+        log = Log(user_id=user_id, action='parse', status='new', created_at=datetime.utcnow())
+        db.add(log)
+        db.flush()
+
+        products = db.query(Product).filter(Product.id.in_(product_ids)).all()
+        job = Job(
+            user_id=user_id,
+            chat_id=chat_id,
+            message_id=message_id,
+            log_id=log.id,
+            product_ids=[p.id for p in products],
+            characteristics=characteristics,
+        )
+        db.add(job)
+        db.flush()
+
+        for position, product in enumerate(products):
+            db.add(JobItem(job_id=job.id, position=position, product_id=product.id))
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+
+def _lease_expired(now: datetime):
+    # NULL — задачи, начатые до появления аренды: владельца нет
+    return or_(Job.locked_until.is_(None), Job.locked_until < now)
+
+
+def _claim_jobs(limit: int, worker_id: str = WORKER_ID) -> list[int]:
+    """Забирает до `limit` задач: из очереди или брошенные (аренда истекла).
+
+    Условный UPDATE защищает от гонок: задачу получает один воркер.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        claimable = or_(Job.status == "queued", and_(Job.status == "running", _lease_expired(now)))
+        candidates = [
+            row.id for row in
+            db.query(Job.id).filter(claimable).order_by(Job.id).limit(limit).all()
+        ]
+        claimed = []
+        for job_id in candidates:
+            updated = (
+                db.query(Job)
+                .filter(Job.id == job_id, claimable)
+                .update({
+                    Job.status: "running",
+                    Job.started_at: now,
+                    Job.attempts: Job.attempts + 1,
+                    Job.worker_id: worker_id,
+                    Job.locked_until: now + timedelta(seconds=JOB_LEASE_SECONDS),
+                }, synchronize_session=False)
+            )
+            if updated:
+                claimed.append(job_id)
+        db.commit()
+        return claimed
+    finally:
+        db.close()
+
+
+def _renew_leases(job_ids: list[int], worker_id: str = WORKER_ID) -> set[int]:
+    """Продлевает аренду своих задач; возвращает те, что всё ещё наши"""
+    if not job_ids:
+        return set()
+    db = SessionLocal()
+    try:
+        query = db.query(Job).filter(
+            Job.id.in_(job_ids), Job.status == "running", Job.worker_id == worker_id
+        )
+        owned = {row.id for row in query.with_entities(Job.id).all()}
+        query.update({Job.locked_until: datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS)},
+                     synchronize_session=False)
+        db.commit()
+        return owned
+    finally:
+        db.close()
+
+
+def _release_jobs(job_ids: list[int], worker_id: str = WORKER_ID) -> int:
+    """Остановка приложения: свои незавершённые задачи — обратно в очередь"""
+    if not job_ids:
+        return 0
+    db = SessionLocal()
+    try:
+        count = (
+            db.query(Job)
+            .filter(Job.id.in_(job_ids), Job.status == "running", Job.worker_id == worker_id)
+            .update({Job.status: "queued", Job.worker_id: None, Job.locked_until: None},
+                    synchronize_session=False)
+        )
+        db.commit()
+        return count
+    finally:
+        db.close()
+
+
+def _load_job(job_id: int) -> dict:
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        items = db.query(JobItem).filter_by(job_id=job_id).order_by(JobItem.position).all()
+        products = {p.id: p for p in db.query(Product).filter(Product.id.in_(job.product_ids or [])).all()}
+        banks = {b.id: b for b in db.query(Bank).filter(Bank.id.in_({p.bank_id for p in products.values()})).all()}
+
+        pending = []
+        for item in items:
+            if item.status == "done":
+                continue
+            product = products.get(item.product_id)
+            bank = banks.get(product.bank_id) if product else None
+            pending.append({
+                "item_id": item.id,
+                "product_id": item.product_id,
+                "product_name": product.name if product else str(item.product_id),
+                "url": product.url if product else None,
+                "bank_name": bank.name if bank else 'Unknown',
+                "bank_url": bank.url if bank else None,
+            })
+
+        return {
+            "id": job.id,
+            "user_id": job.user_id,
+            "chat_id": job.chat_id,
+            "message_id": job.message_id,
+            "log_id": job.log_id,
+            "attempts": job.attempts,
+            "characteristics": job.characteristics or [],
+            "product_names": [products[i].name for i in job.product_ids or [] if i in products],
+            "bank_names": sorted({b.name for b in banks.values()}),
+            "total": len(items),
+            "pending": pending,
+        }
+    finally:
+        db.close()
+
+
+def _set_log_status(log_id: int | None, status: str, message: str | None = None, token: int | None = None):
+    if not log_id:
+        return
+    db = SessionLocal()
+    try:
+        log = db.get(Log, log_id)
+        if log:
+            log.status = status
+            if message is not None:
+                log.message = message
+            if token is not None:
+                log.token = token
+            db.commit()
+    finally:
+        db.close()
+
+
+def _save_checkpoint(item_id: int, result: dict, tokens: int, pdf_count: int):
+    db = SessionLocal()
+    try:
+        item = db.get(JobItem, item_id)
+        item.status = "done"
+        item.result = result
+        item.tokens = tokens
+        item.pdf_count = pdf_count
+        item.finished_at = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+def _finish_job(job_id: int, user_id: int, characteristics: list[str],
+                product_names: list[str]) -> tuple[list[dict], int, int]:
+    """Собирает результаты по чекпоинтам и сохраняет их в Data"""
+    db = SessionLocal()
+    try:
+        items = db.query(JobItem).filter_by(job_id=job_id).order_by(JobItem.position).all()
+        results = [item.result or _empty_schema('Unknown', str(item.product_id)) for item in items]
+        normalize_results(results)
+        tokens = sum(item.tokens or 0 for item in items)
+        pdf_used = sum(item.pdf_count or 0 for item in items)
+
+        # Повторный запуск после сбоя на отправке не должен дублировать Data
+        job = db.get(Job, job_id)
+        if not job.data_id:
+            datarow = Data(
+                user_id=user_id,
+                characteristics=', '.join(characteristics),
+                card_set=', '.join(product_names),
+                **pack_payload(results),
+            )
+            db.add(datarow)
+            db.flush()
+            add_observations(db, datarow.id, results, [item.product_id for item in items],
+                             [item.finished_at or datetime.utcnow() for item in items])
+            job.data_id = datarow.id
+            db.commit()
+        return results, tokens, pdf_used
+    finally:
+        db.close()
+
+
+def _set_job_status(job_id: int, status: str, error: str | None = None):
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        job.status = status
+        job.error = error
+        if status in ("done", "error"):
+            job.finished_at = datetime.utcnow()
+            job.locked_until = None
+        db.commit()
+    finally:
+        db.close()
+
+
+# ---------- Воркер ----------
+class JobWorker:
+    """Фоновая обработка отчётов из таблицы jobs.
+
+    Задачи забираются опросом (или сразу после `notify()`), не больше
+    `concurrency` одновременно. Взятая задача арендуется на
+    JOB_LEASE_SECONDS и продлевается, пока процесс жив; задачу упавшего
+    процесса забирает другой воркер, когда аренда истечёт. Каждый готовый
+    продукт сохраняется в job_items, поэтому задача продолжается с места
+    остановки. Продукты со снимком моложе SNAPSHOT_MAX_AGE_HOURS не
+    парсятся заново. Готовый отчёт отправляется в чат пользователя.
+    """
+
+    def __init__(self, concurrency: int = JOB_WORKERS, poll_interval: float = JOB_POLL_INTERVAL,
+                 max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.bot: Bot | None = None
+        self._wakeup = asyncio.Event()
+        self._loop_task: asyncio.Task | None = None
+        self._running: dict[int, asyncio.Task] = {}
+        self._renewed_at = 0.0
+
+    async def start(self, bot: Bot):
+        self.bot = bot
+        self._loop_task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._loop_task:
+            self._loop_task.cancel()
+        running = dict(self._running)
+        for task in running.values():
+            task.cancel()
+        await asyncio.gather(*([self._loop_task] if self._loop_task else []), *running.values(),
+                             return_exceptions=True)
+        self._loop_task = None
+        self._running.clear()
+        # не ждать истечения аренды: после рестарта задачи сразу продолжатся
+        released = await asyncio.to_thread(_release_jobs, list(running))
+        if released:
+            logging.info(f"[JobWorker] released {released} unfinished job(s)")
+
+    def notify(self):
+        self._wakeup.set()
+
+    async def _loop(self):
+        while True:
+            try:
+                await self._heartbeat()
+            except Exception as e:
+                logging.error(f"[JobWorker] lease renewal error: {e}")
+
+            free = self.concurrency - len(self._running)
+            if free > 0:
+                try:
+                    for job_id in await asyncio.to_thread(_claim_jobs, free):
+                        task = asyncio.create_task(self._run(job_id))
+                        self._running[job_id] = task
+                        task.add_done_callback(lambda _, job_id=job_id: self._on_job_done(job_id))
+                except Exception as e:
+                    logging.error(f"[JobWorker] claim error: {e}")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _heartbeat(self):
+        """Продлевает аренду раз в треть срока; потерянные задачи (забрал другой воркер) отменяет"""
+        now = asyncio.get_running_loop().time()
+        if not self._running or now - self._renewed_at < JOB_LEASE_SECONDS / 3:
+            return
+        owned = await asyncio.to_thread(_renew_leases, list(self._running))
+        self._renewed_at = now
+        for job_id, task in list(self._running.items()):
+            if job_id not in owned:
+                logging.warning(f"[JobWorker] lease lost for job {job_id}, cancelling")
+                task.cancel()
+
+    def _on_job_done(self, job_id: int):
+        self._running.pop(job_id, None)
+        self._wakeup.set()
+
+    async def _edit(self, job: dict, text: str):
+        if not job["message_id"]:
+            return
+        await sender.edit(self.bot, job["chat_id"], job["message_id"], text)
+
+    async def _run(self, job_id: int):
+        job = await asyncio.to_thread(_load_job, job_id)
+        if job["attempts"] > self.max_attempts:
+            await asyncio.to_thread(_set_job_status, job_id, "error", "too many attempts")
+            await asyncio.to_thread(_set_log_status, job["log_id"], "error", "too many attempts")
+            await self._edit(job, "❌ Ошибка парсинга: задача прервана слишком много раз")
+            return
+
+        try:
+            await self._process(job)
+        except asyncio.CancelledError:
+            # остановка приложения или потеря аренды: задача продолжится в очереди
+            raise
+        except Exception as e:
+            print(f"КРИТИЧЕСКАЯ ОШИБКА: {str(e)}")
+            await asyncio.to_thread(_set_job_status, job_id, "error", str(e))
+            await asyncio.to_thread(_set_log_status, job["log_id"], "error", str(e))
+            await self._edit(job, f"❌ Ошибка парсинга: {str(e)}")
+
+    async def _process(self, job: dict):
+        await asyncio.to_thread(_set_log_status, job["log_id"], "process")
+
+        # Продукты со свежим снимком берём из каталога без живого парсинга
+        fresh = await asyncio.to_thread(
+            fresh_snapshots, [item["product_id"] for item in job["pending"]], SNAPSHOT_MAX_AGE_HOURS
+        )
+
+        tasks = []
+        item_ids = {}
+        from_snapshots = 0
+        for item in job["pending"]:
+            snapshot = fresh.get(item["product_id"])
+            if snapshot:
+                await asyncio.to_thread(
+                    _save_checkpoint, item["item_id"], snapshot["result"], 0, snapshot["pdf_count"]
+                )
+                from_snapshots += 1
+                continue
+
+            task = ProductTask(item["product_id"], item["product_name"], item["url"],
+                               item["bank_name"], item["bank_url"],
+                               user_id=job["user_id"], log_id=job["log_id"])
+            if not item["url"] or item["bank_name"] == 'Unknown':
+                print(f"-! Нет банка для {item['product_name']}")
+                task.finish()
+            item_ids[id(task)] = item["item_id"]
+            tasks.append(task)
+
+        total = job["total"]
+        already_done = total - len(tasks)
+
+        async def on_product_done(done: int, _: int, task: ProductTask):
+            tokens = task.tokens_in + task.tokens_out
+            await asyncio.to_thread(
+                _save_checkpoint, item_ids[id(task)], task.result, tokens, len(task.pdf_files),
+            )
+            await asyncio.to_thread(
+                save_snapshot, task.product_id, task.result, len(task.pdf_files), tokens, "user",
+            )
+            progress = int((already_done + done) / total * 10)
+            bar = '█' * progress + '░' * (10 - progress)
+            await self._edit(job, f"🔄 {task.bank_name} | {task.product_name} ({already_done + done}/{total})\n{bar}")
+
+        if tasks:
+            await build_product_pipeline(on_done=on_product_done).run(tasks)
+        changed = [f"{task.bank_name} {task.product_name}" for task in changed_products(tasks)]
+        unchanged = sum(1 for task in tasks if task.change == "same")
+        print(f"Снимков использовано: {from_snapshots}, обновлено: {len(tasks)}, "
+              f"без изменений: {unchanged}, изменились: {changed}; LLM кэш: {extraction_cache.stats()}")
+
+        results, tokens, pdf_used = await asyncio.to_thread(
+            _finish_job, job["id"], job["user_id"], job["characteristics"], job["product_names"]
+        )
+
+        # Создание Excel отчёта в памяти
+        filename, content = await asyncio.to_thread(
+            create_bank_excel_report,
+            results,
+            job["characteristics"] or None,
+        )
+        await self.bot.send_document(
+            job["chat_id"],
+            BufferedInputFile(content, filename=filename),
+            caption=f"✅ Парсинг завершён!\n"
+                    f"Продукты: {', '.join(job['product_names'])}\n"
+                    f"Банки: {', '.join(job['bank_names'])}\n"
+                    f"PDF использовано: {pdf_used} шт.\n"
+                    f"Из снимков: {from_snapshots}, обновлено сейчас: {len(tasks)}\n"
+                    f"Изменились: {', '.join(changed) if changed else 'нет'}\n"
+        )
+
+        await self._edit(job, "✅ Excel отчёт отправлен!")
+        await asyncio.to_thread(_set_job_status, job["id"], "done")
+        await asyncio.to_thread(_set_log_status, job["log_id"], "ok", token=tokens)
+
+
+job_worker = JobWorker()
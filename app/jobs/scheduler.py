@@ -0,0 +1,179 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from app.db.catalog import catalog, CatalogSnapshot
+from app.db.leases import acquire_lease, release_lease
+from app.db.model import SessionLocal, Log
+from app.jobs.snapshots import save_snapshot, stale_product_ids
+from app.parser.product import ProductTask, build_product_pipeline, changed_products
+from config import CRAWL_HOUR, CRAWL_MIN_AGE_HOURS, CRAWL_LEASE_SECONDS
+
+LEASE_NAME = "catalog_crawl"
+
+
+def _catalog_products(snapshot: CatalogSnapshot) -> list[dict]:
+    """Все продукты всех наборов вместе с банками"""
+    return [
+        {
+            "product_id": product.id,
+            "product_name": product.name,
+            "url": product.url,
+            "bank_name": product.bank.name,
+            "bank_url": product.bank.url,
+        }
+        for product in snapshot.products.values()
+        if product.set_id is not None and product.bank and product.url
+    ]
+
+
+def _create_log(action: str) -> int:
+    db = SessionLocal()
+    try:
+        log = Log(user_id=None, action=action, status='process', created_at=datetime.utcnow())
+        db.add(log)
+        db.commit()
+        return log.id
+    finally:
+        db.close()
+
+
+def _close_log(log_id: int, status: str, message: str | None = None, token: int = 0):
+    db = SessionLocal()
+    try:
+        log = db.get(Log, log_id)
+        log.status = status
+        log.message = message
+        log.token = token
+        db.commit()
+    finally:
+        db.close()
+
+
+def _seconds_until(hour: int) -> float:
+    now = datetime.now()
+    target = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+class CatalogScheduler:
+    """Ежедневный обход всего каталога в час `hour` (время сервера).
+
+    Каждый обработанный продукт сохраняется снимком в product_snapshots,
+    откуда JobWorker собирает отчёты без живого парсинга. Продукты,
+    у которых уже есть снимок моложе `min_age_hours`, пропускаются.
+    Планировщик запущен в каждом процессе бота, а обходит один: тот, кто
+    взял аренду LEASE_NAME в БД; пока обход идёт, аренда продлевается,
+    а если её перехватил другой процесс — свой обход останавливается.
+    """
+
+    def __init__(self, hour: int = CRAWL_HOUR, min_age_hours: float = CRAWL_MIN_AGE_HOURS,
+                 lease_seconds: float = CRAWL_LEASE_SECONDS):
+        self.hour = hour
+        self.min_age_hours = min_age_hours
+        self.lease_seconds = lease_seconds
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+        logging.info(f"[Scheduler] catalog crawl daily at {self.hour:02d}:00")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(_seconds_until(self.hour))
+            try:
+                await self.run_once()
+            except Exception as e:
+                logging.error(f"[Scheduler] crawl error: {e}")
+
+    async def run_once(self) -> int:
+        """Обходит устаревшие продукты; возвращает число обработанных"""
+        if self._lock.locked():
+            logging.info("[Scheduler] crawl already running")
+            return 0
+
+        async with self._lock:
+            if not await asyncio.to_thread(acquire_lease, LEASE_NAME, self.lease_seconds):
+                logging.info("[Scheduler] crawl is running in another process")
+                return 0
+            crawl = asyncio.create_task(self._crawl())
+            lost = asyncio.Event()
+            heartbeat = asyncio.create_task(self._renew_lease(crawl, lost))
+            try:
+                return await crawl
+            except asyncio.CancelledError:
+                if not lost.is_set():
+                    raise
+                return 0
+            finally:
+                heartbeat.cancel()
+                await asyncio.gather(heartbeat, return_exceptions=True)
+                await asyncio.to_thread(release_lease, LEASE_NAME)
+
+    async def _renew_lease(self, crawl: asyncio.Task, lost: asyncio.Event):
+        """Продлевает аренду; если её забрал другой процесс — останавливает свой обход"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = await asyncio.to_thread(acquire_lease, LEASE_NAME, self.lease_seconds)
+            except Exception as e:
+                logging.error(f"[Scheduler] lease renewal error: {e}")
+                continue
+            if not renewed:
+                logging.warning("[Scheduler] crawl lease taken over by another process, stopping crawl")
+                lost.set()
+                crawl.cancel()
+                return
+
+    async def _crawl(self) -> int:
+        products = _catalog_products(await catalog.get())
+        stale = set(await asyncio.to_thread(
+            stale_product_ids, [p["product_id"] for p in products], self.min_age_hours
+        ))
+        products = [p for p in products if p["product_id"] in stale]
+        if not products:
+            logging.info("[Scheduler] all snapshots are fresh")
+            return 0
+
+        log_id = await asyncio.to_thread(_create_log, 'crawl')
+        logging.info(f"[Scheduler] crawling {len(products)} product(s)")
+
+        tasks = [
+            ProductTask(p["product_id"], p["product_name"], p["url"], p["bank_name"], p["bank_url"],
+                        log_id=log_id)
+            for p in products
+        ]
+
+        async def on_product_done(done: int, total: int, task: ProductTask):
+            await asyncio.to_thread(
+                save_snapshot, task.product_id, task.result, len(task.pdf_files),
+                task.tokens_in + task.tokens_out, "schedule", True,
+            )
+
+        try:
+            await build_product_pipeline(on_done=on_product_done).run(tasks)
+        except asyncio.CancelledError:
+            await asyncio.to_thread(_close_log, log_id, 'error', "обход прерван")
+            raise
+        except Exception as e:
+            await asyncio.to_thread(_close_log, log_id, 'error', str(e))
+            raise
+
+        tokens = sum(task.tokens_in + task.tokens_out for task in tasks)
+        changed = [f"{task.bank_name} {task.product_name}" for task in changed_products(tasks)]
+        summary = f"изменились: {', '.join(changed)}" if changed else "изменений нет"
+        await asyncio.to_thread(_close_log, log_id, 'ok', summary, tokens)
+        logging.info(f"[Scheduler] crawl finished: {len(tasks)} product(s), {tokens} tokens, {summary}")
+        return len(tasks)
+
+
+catalog_scheduler = CatalogScheduler()
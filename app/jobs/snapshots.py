@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from app.db.model import SessionLocal, ProductSnapshot
+from app.db.offers import upsert_offer
+from app.db.results import add_observations
+from app.parser.numbers import normalize_results
+from app.parser.extract import SCHEMA_FIELDS
+
+
+def has_data(result: dict | None) -> bool:
+    return bool(result) and any(result.get(field) for field in SCHEMA_FIELDS)
+
+
+def save_snapshot(product_id: int, result: dict | None, pdf_count: int = 0,
+                  tokens: int = 0, source: str = "user", observe: bool = False):
+    """Снимок продукта и его предложение; `observe` — ещё и строки observations.
+
+    Отчёт пользователя пишет наблюдения сам на весь запуск (_finish_job), плановый
+    обход — через `observe`: иначе /movers не видел бы данных обхода, а /best видел.
+    """
+    fetched_at = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        db.add(ProductSnapshot(
+            product_id=product_id,
+            fetched_at=fetched_at,
+            status="ok" if has_data(result) else "empty",
+            source=source,
+            result=result,
+            pdf_count=pdf_count,
+            tokens=tokens,
+        ))
+        if has_data(result):
+            upsert_offer(db, product_id, result, fetched_at)
+            if observe:
+                add_observations(db, None, normalize_results([dict(result)]), [product_id], [fetched_at])
+        db.commit()
+    finally:
+        db.close()
+
+
+def _latest_ok(db, product_ids: list[int], since: datetime):
+    """Подзапрос: время последнего удачного снимка по каждому продукту"""
+    return (
+        db.query(ProductSnapshot.product_id, func.max(ProductSnapshot.fetched_at).label("fetched_at"))
+        .filter(
+            ProductSnapshot.product_id.in_(product_ids),
+            ProductSnapshot.status == "ok",
+            ProductSnapshot.fetched_at >= since,
+        )
+        .group_by(ProductSnapshot.product_id)
+        .subquery()
+    )
+
+
+def fresh_snapshots(product_ids: list[int], max_age_hours: float) -> dict[int, dict]:
+    """Последние удачные снимки моложе `max_age_hours`: product_id → данные снимка"""
+    if not product_ids:
+        return {}
+    since = datetime.utcnow() - timedelta(hours=max_age_hours)
+
+    db = SessionLocal()
+    try:
+        latest = _latest_ok(db, product_ids, since)
+        rows = (
+            db.query(ProductSnapshot)
+            .join(latest, (ProductSnapshot.product_id == latest.c.product_id)
+                  & (ProductSnapshot.fetched_at == latest.c.fetched_at))
+            .all()
+        )
+        return {
+            row.product_id: {
+                "result": row.result,
+                "pdf_count": row.pdf_count or 0,
+                "fetched_at": row.fetched_at,
+            }
+            for row in rows
+        }
+    finally:
+        db.close()
+
+
+def stale_product_ids(product_ids: list[int], max_age_hours: float) -> list[int]:
+    """Продукты без удачного снимка моложе `max_age_hours`"""
+    fresh = fresh_snapshots(product_ids, max_age_hours)
+    return [product_id for product_id in product_ids if product_id not in fresh]
@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+import re
+from datetime import datetime, timedelta
+
+from app.db.model import SessionLocal, LlmCache
+from app.parser.extract import SCHEMA_FIELDS, has_extracted_data
+from config import GIGACHAT_MODEL, LLM_CACHE_TTL_HOURS, LLM_CACHE_MAX_ENTRIES
+
+
+_WS_RE = re.compile(r"\s+")
+
+
+def _normalize(text: str | None) -> str:
+    return _WS_RE.sub(" ", text or "").strip()
+
+
+class ExtractionCache:
+    """Кэш распарсенных ответов LLM в таблице llm_cache.
+
+    Ключ — sha256 от модели, схемы полей, банка и нормализованных
+    (без лишних пробелов) текста страницы и PDF. Пустые ответы (все поля
+    null) не кэшируются — их переспрашиваем. Записи старше TTL не
+    отдаются, при превышении `max_entries` удаляются давно не
+    использованные. `hits`/`misses` считаются с момента запуска.
+    """
+
+    def __init__(self, ttl_hours: int = LLM_CACHE_TTL_HOURS, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.ttl = timedelta(hours=ttl_hours)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(bank_name: str, page_text: str, pdf_content: str,
+                 model: str = GIGACHAT_MODEL, schema: list[str] = SCHEMA_FIELDS) -> str:
+        digest = hashlib.sha256()
+        for part in (model, ",".join(schema), bank_name, _normalize(page_text), _normalize(pdf_content)):
+            digest.update(part.encode("utf-8", errors="replace"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    async def get(self, key: str) -> dict | None:
+        result = await asyncio.to_thread(self._get, key)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    async def put(self, key: str, result: dict, model: str = GIGACHAT_MODEL):
+        if not has_extracted_data(result):
+            return
+        await asyncio.to_thread(self._put, key, dict(result), model)
+
+    def _get(self, key: str) -> dict | None:
+        db = SessionLocal()
+        try:
+            row = db.query(LlmCache).filter_by(key=key).first()
+            if not row:
+                return None
+            now = datetime.utcnow()
+            # Пустые ответы могли попасть в кэш раньше — считаем промахом
+            if (row.created_at and now - row.created_at > self.ttl) or not has_extracted_data(row.result):
+                db.delete(row)
+                db.commit()
+                return None
+            row.used_at = now
+            db.commit()
+            return dict(row.result)
+        finally:
+            db.close()
+
+    def _put(self, key: str, result: dict, model: str):
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            row = db.query(LlmCache).filter_by(key=key).first()
+            if not row:
+                row = LlmCache(key=key)
+                db.add(row)
+            row.model = model
+            row.result = result
+            row.created_at = now
+            row.used_at = now
+            db.commit()
+            self._evict(db, now)
+        finally:
+            db.close()
+
+    def _evict(self, db, now: datetime):
+        db.query(LlmCache).filter(LlmCache.created_at < now - self.ttl).delete(synchronize_session=False)
+
+        overflow = db.query(LlmCache).count() - self.max_entries
+        if overflow > 0:
+            stale_ids = [
+                row.id for row in
+                db.query(LlmCache.id).order_by(LlmCache.used_at.asc()).limit(overflow).all()
+            ]
+            db.query(LlmCache).filter(LlmCache.id.in_(stale_ids)).delete(synchronize_session=False)
+        db.commit()
+
+
+extraction_cache = ExtractionCache()
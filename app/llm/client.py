@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import random
+import time
+
+from gigachat import GigaChat
+
+from config import (GIGACHAT_TOKEN, GIGACHAT_MODEL, LLM_RATE_PER_MIN, LLM_MAX_IN_FLIGHT,
+                    LLM_RETRIES, LLM_TIMEOUT)
+
+
+class TokenBucket:
+    """Ограничение частоты: `rate` запросов в секунду, всплеск до `capacity`"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class LlmClient:
+    """Один асинхронный клиент GigaChat на приложение.
+
+    Токен авторизации и HTTP-соединения переиспользуются между вызовами.
+    Общие для всех пользователей лимиты: token bucket по частоте и
+    семафор на число одновременных запросов. Каждый вызов ограничен
+    таймаутом и повторяется с экспоненциальной задержкой и джиттером.
+    """
+
+    def __init__(self, rate_per_min: int = LLM_RATE_PER_MIN, max_in_flight: int = LLM_MAX_IN_FLIGHT,
+                 retries: int = LLM_RETRIES, timeout: float = LLM_TIMEOUT, model: str = GIGACHAT_MODEL):
+        self.model = model
+        self.retries = max(0, retries)
+        self.timeout = timeout
+        self._bucket = TokenBucket(rate_per_min / 60, capacity=max_in_flight)
+        self._in_flight = asyncio.Semaphore(max(1, max_in_flight))
+        self._giga: GigaChat | None = None
+
+    def _get_giga(self) -> GigaChat:
+        if self._giga is None:
+            self._giga = GigaChat(
+                credentials=GIGACHAT_TOKEN,
+                scope="GIGACHAT_API_B2B",
+                verify_ssl_certs=False,
+                model=self.model,
+                timeout=self.timeout,
+            )
+        return self._giga
+
+    async def close(self):
+        if self._giga is not None:
+            try:
+                await self._giga.aclose()
+            except Exception:
+                pass
+            self._giga = None
+
+    async def chat(self, prompt: str, timeout: float | None = None):
+        timeout = timeout or self.timeout
+        giga = self._get_giga()
+
+        for attempt in range(self.retries + 1):
+            await self._bucket.acquire()
+            try:
+                async with self._in_flight:
+                    return await asyncio.wait_for(giga.achat(prompt), timeout)
+            except Exception as e:
+                if attempt >= self.retries:
+                    raise
+                delay = min(30.0, 1.0 * 2 ** attempt) * random.uniform(0.5, 1.5)
+                logging.warning(
+                    f"[LlmClient] {type(e).__name__}: {e}; retry {attempt + 1}/{self.retries} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+
+llm_client = LlmClient()
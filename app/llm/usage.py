@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime
+
+from app.db.model import SessionLocal, LlmCall
+from config import LLM_PRICE_PER_1K
+
+
+class CallUsage:
+    """Фактический расход одного вызова LLM"""
+
+    def __init__(self, prompt_tokens: int, completion_tokens: int, total_tokens: int):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.total_tokens = total_tokens
+
+    @classmethod
+    def from_response(cls, response, prompt: str, answer: str) -> "CallUsage":
+        """Берёт usage из ответа API, при его отсутствии — оценка по длине"""
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        if prompt_tokens is None or completion_tokens is None:
+            prompt_tokens = len(prompt) // 4
+            completion_tokens = len(answer) // 4
+        total_tokens = getattr(usage, "total_tokens", None) or prompt_tokens + completion_tokens
+        return cls(prompt_tokens, completion_tokens, total_tokens)
+
+    def split(self, weights: list[int]) -> list["CallUsage"]:
+        """Делит расход пакетного запроса между продуктами пропорционально весам"""
+        total_weight = sum(weights)
+        parts = []
+        for weight in weights:
+            share = weight / total_weight if total_weight else 1 / len(weights)
+            parts.append(CallUsage(
+                round(self.prompt_tokens * share),
+                round(self.completion_tokens * share),
+                round(self.total_tokens * share),
+            ))
+        return parts
+
+
+def _record(row: LlmCall):
+    db = SessionLocal()
+    try:
+        db.add(row)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def record_call(
+    *,
+    model: str,
+    bank: str,
+    product: str,
+    prompt_chars: int,
+    latency_ms: int,
+    usage: CallUsage | None = None,
+    fallback: bool = False,
+    batch_size: int = 1,
+    status: str = "ok",
+    user_id: int | None = None,
+    log_id: int | None = None,
+):
+    row = LlmCall(
+        log_id=log_id,
+        user_id=user_id,
+        created_at=datetime.utcnow(),
+        model=model,
+        bank=bank,
+        product=product,
+        prompt_chars=prompt_chars,
+        prompt_tokens=usage.prompt_tokens if usage else None,
+        completion_tokens=usage.completion_tokens if usage else None,
+        total_tokens=usage.total_tokens if usage else None,
+        latency_ms=latency_ms,
+        fallback=fallback,
+        batch_size=batch_size,
+        status=status,
+    )
+    try:
+        await asyncio.to_thread(_record, row)
+    except Exception as e:
+        print(f"-! Не удалось записать вызов LLM: {e}")
+
+
+def _percentile(values: list[int], q: float) -> int:
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def usage_report(date_from: datetime, date_to: datetime) -> list[dict]:
+    """Сводка по банкам: вызовы, токены, стоимость, p50/p95 задержки"""
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(LlmCall.bank, LlmCall.total_tokens, LlmCall.latency_ms,
+                     LlmCall.fallback, LlmCall.status)
+            .filter(LlmCall.created_at >= date_from, LlmCall.created_at < date_to)
+            .all()
+        )
+    finally:
+        db.close()
+
+    by_bank: dict[str, dict] = {}
+    for bank, tokens, latency, fallback, status in rows:
+        item = by_bank.setdefault(bank or "Unknown", {
+            "bank": bank or "Unknown", "calls": 0, "errors": 0, "fallbacks": 0,
+            "tokens": 0, "latencies": [],
+        })
+        item["calls"] += 1
+        item["tokens"] += tokens or 0
+        item["fallbacks"] += 1 if fallback else 0
+        item["errors"] += 1 if status != "ok" else 0
+        if latency is not None:
+            item["latencies"].append(latency)
+
+    report = []
+    for item in by_bank.values():
+        latencies = item.pop("latencies")
+        item["cost"] = round(item["tokens"] / 1000 * LLM_PRICE_PER_1K, 2)
+        item["p50_ms"] = _percentile(latencies, 0.5)
+        item["p95_ms"] = _percentile(latencies, 0.95)
+        report.append(item)
+
+    report.sort(key=lambda r: r["cost"], reverse=True)
+    return report
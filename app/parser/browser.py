@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright, Browser, Page
+
+from config import BROWSER_MAX_PAGES, BROWSER_RECYCLE_PAGES
+
+
+LAUNCH_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--start-maximized',
+]
+
+CONTEXT_OPTIONS = {
+    'viewport': {'width': 1920, 'height': 1080},
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+}
+
+
+class BrowserPool:
+    """Один прогретый Chromium на всё приложение.
+
+    Страницы выдаются в изолированных контекстах, число открытых страниц
+    ограничено. Браузер пересоздаётся после `recycle_after` страниц
+    или если он упал; старый закрывается, когда его страницы освободятся.
+    """
+
+    def __init__(self, max_pages: int = BROWSER_MAX_PAGES, recycle_after: int = BROWSER_RECYCLE_PAGES):
+        self.max_pages = max(1, max_pages)
+        self.recycle_after = max(1, recycle_after)
+
+        self._playwright = None
+        self._browser: Browser | None = None
+        self._served = 0
+        self._active: dict[int, int] = {}
+        self._retired: dict[int, Browser] = {}
+        self._lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(self.max_pages)
+
+    async def start(self):
+        async with self._lock:
+            await self._ensure_browser()
+        logging.info(f"[BrowserPool] Chromium started (max pages: {self.max_pages})")
+
+    async def close(self):
+        async with self._lock:
+            browsers = list(self._retired.values())
+            if self._browser:
+                browsers.append(self._browser)
+            self._browser = None
+            self._retired.clear()
+            self._active.clear()
+
+            for browser in browsers:
+                try:
+                    await browser.close()
+                except Exception:
+                    pass
+
+            if self._playwright:
+                try:
+                    await self._playwright.stop()
+                except Exception:
+                    pass
+                self._playwright = None
+        logging.info("[BrowserPool] closed")
+
+    async def _ensure_browser(self):
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+
+        if self._browser is not None and not self._browser.is_connected():
+            logging.warning("[BrowserPool] Chromium crashed, relaunching")
+            await self._retire(self._browser)
+            self._browser = None
+
+        if self._browser is None:
+            self._browser = await self._playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+            self._served = 0
+
+    async def _retire(self, browser: Browser):
+        """Вызывается под self._lock: без открытых страниц закрываем сразу, иначе — при освобождении"""
+        key = id(browser)
+        if self._active.get(key):
+            self._retired[key] = browser
+        else:
+            self._active.pop(key, None)
+            await self._close_quietly(browser)
+
+    @staticmethod
+    async def _close_quietly(browser: Browser):
+        try:
+            await browser.close()
+        except Exception as e:
+            logging.warning(f"[BrowserPool] closing retired Chromium failed: {e}")
+
+    async def _lease(self) -> Browser:
+        async with self._lock:
+            if self._browser is not None and self._served >= self.recycle_after:
+                logging.info(f"[BrowserPool] recycling Chromium after {self._served} pages")
+                await self._retire(self._browser)
+                self._browser = None
+
+            await self._ensure_browser()
+            self._served += 1
+            key = id(self._browser)
+            self._active[key] = self._active.get(key, 0) + 1
+            return self._browser
+
+    async def _release(self, browser: Browser):
+        async with self._lock:
+            key = id(browser)
+            left = self._active.get(key, 1) - 1
+            if left > 0:
+                self._active[key] = left
+                return
+
+            self._active.pop(key, None)
+            retired = self._retired.pop(key, None)
+            if retired is not None:
+                await self._close_quietly(retired)
+
+    @asynccontextmanager
+    async def page(self):
+        """Выдаёт страницу в отдельном контексте браузера"""
+        async with self._slots:
+            browser = await self._lease()
+            context = None
+            try:
+                context = await browser.new_context(**CONTEXT_OPTIONS)
+                page: Page = await context.new_page()
+                yield page
+            finally:
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+                await self._release(browser)
+
+
+browser_pool = BrowserPool()
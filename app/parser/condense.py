@@ -0,0 +1,110 @@
+import re
+
+from bs4 import BeautifulSoup, Tag
+
+from config import CONDENSE_TOKEN_BUDGET
+
+
+CHARS_PER_TOKEN = 3  # кириллица в GigaChat — примерно 3 символа на токен
+
+BLOCK_TAGS = ['table', 'dl', 'li', 'p']
+DROP_TAGS = ['script', 'style', 'iframe', 'noscript', 'svg', 'form', 'button']
+
+KEYWORDS = {
+    'rate': ['%', 'ставк', 'процент', 'годовых'],
+    'sum': ['byn', 'руб', 'бел', 'usd', 'eur', 'сумм', 'лимит'],
+    'term': ['срок', 'мес', 'лет', 'год', 'дн'],
+    'other': ['комисси', 'досрочн', 'страхов', 'погашен', 'платеж', 'валют'],
+}
+
+_WS_RE = re.compile(r'\s+')
+_DIGIT_RE = re.compile(r'\d')
+
+
+def _text(node: Tag) -> str:
+    return _WS_RE.sub(' ', node.get_text(separator=' ')).strip()
+
+
+def score_block(text: str, tag: str) -> float:
+    """Оценка блока: ключевые слова ставки/суммы/срока и доля цифр"""
+    if not text:
+        return 0.0
+    lower = text.lower()
+    groups = sum(1 for words in KEYWORDS.values() if any(w in lower for w in words))
+    hits = sum(lower.count(w) for words in KEYWORDS.values() for w in words)
+    density = len(_DIGIT_RE.findall(text)) / len(text)
+
+    score = groups * 2 + min(hits, 10) * 0.5 + min(density * 20, 3)
+    if tag in ('table', 'dl'):
+        score += 2
+    if len(text) < 15:
+        score *= 0.3
+    return score if groups else 0.0
+
+
+def _serialize(node: Tag) -> str:
+    """Компактная запись блока без атрибутов: таблица — TSV, dl — «термин: значение»"""
+    if node.name == 'table':
+        rows = []
+        for tr in node.find_all('tr'):
+            cells = [_text(cell) for cell in tr.find_all(['th', 'td'])]
+            if any(cells):
+                rows.append('\t'.join(cells))
+        return '\n'.join(rows)
+
+    if node.name == 'dl':
+        lines = []
+        for dt in node.find_all('dt'):
+            dd = dt.find_next_sibling('dd')
+            lines.append(f"{_text(dt)}: {_text(dd) if dd else ''}")
+        return '\n'.join(lines)
+
+    if node.name == 'li':
+        return f"- {_text(node)}"
+
+    return _text(node)
+
+
+def condense_html(page_content: str, token_budget: int = CONDENSE_TOKEN_BUDGET) -> tuple[str, str]:
+    """Сжатие страницы до значимых блоков.
+
+    Возвращает текст для промпта (лучшие по оценке блоки в порядке
+    документа, в пределах бюджета токенов) и плоский текст страницы
+    для fallback-промпта.
+    """
+    soup = BeautifulSoup(page_content, 'html.parser')
+    for tag in soup(DROP_TAGS):
+        tag.decompose()
+
+    budget = token_budget * CHARS_PER_TOKEN
+    header = []
+    for tag in soup.find_all(['title', 'h1'], limit=2):
+        text = _text(tag)
+        if text and text not in header:
+            header.append(text)
+
+    candidates = []
+    seen = set()
+    for position, node in enumerate(soup.find_all(BLOCK_TAGS)):
+        # вложенные блоки уже попадают в текст родителя
+        if node.find_parent(BLOCK_TAGS):
+            continue
+        serialized = _serialize(node)
+        if not serialized or serialized in seen:
+            continue
+        seen.add(serialized)
+        score = score_block(serialized, node.name)
+        if score > 0:
+            candidates.append((score, position, serialized))
+
+    chosen = []
+    used = sum(len(h) + 1 for h in header)
+    for score, position, serialized in sorted(candidates, key=lambda c: (-c[0], c[1])):
+        if used + len(serialized) + 2 > budget:
+            continue
+        chosen.append((position, serialized))
+        used += len(serialized) + 2
+
+    blocks = header + [serialized for _, serialized in sorted(chosen)]
+    text_content = soup.get_text(separator=' ', strip=True)[:70000]
+    return '\n\n'.join(blocks), text_content
@@ -0,0 +1,188 @@
+import json
+import re
+
+
+# Поля, которые модель должна вернуть; входят в ключ кэша LLM
+SCHEMA_FIELDS = [
+    "name", "rate", "rate_type", "sum", "term", "payment_type",
+    "commission", "early_repayment", "insurance", "currency", "additional",
+]
+
+
+def build_prompt(bank_name: str, page_text: str, pdf_content: str) -> str:
+    return f"""
+        Ты ИНФОРМАЦИОННЫЙ ПАРСЕР банковских продуктов.
+        Ты НЕ рассуждаешь и НЕ объясняешь.
+
+        Верни ТОЛЬКО JSON:
+        {{
+        "name": null,
+        "rate": null,
+        "rate_type": null,
+        "sum": null,
+        "term": null,
+        "payment_type": null,
+        "commission": null,
+        "early_repayment": null,
+        "insurance": null,
+        "currency": null,
+        "additional": null
+        }}
+
+        ПРАВИЛА:
+        - Если поле не найдено — null
+        - Не добавляй новые поля
+        - Не пиши текст вне JSON
+
+        Условия со страницы продукта ({bank_name}), таблицы в формате TSV:
+        {page_text}
+
+        ТЕКСТ ИЗ PDF:
+        ВАЖНО: если условия (ставка, сумма, срок, комиссии) отсутствуют или неполные на странице,
+        ОБЯЗАТЕЛЬНО используй PDF.
+
+        PDF:
+        {pdf_content}
+
+        JSON:
+        """
+
+
+def build_fallback_prompt(text_content: str) -> str:
+    return f"""
+                        Извлеки значения и верни JSON:
+
+                        {{
+                        "name": null,
+                        "rate": null,
+                        "rate_type": null,
+                        "sum": null,
+                        "term": null,
+                        "payment_type": null,
+                        "commission": null,
+                        "early_repayment": null,
+                        "insurance": null,
+                        "currency": null,
+                        "additional": null
+                        }}
+
+                        Текст:
+                        {text_content}
+                        """
+
+
+def build_batch_prompt(items: list[tuple[int, str, str, str]]) -> str:
+    """Один промпт на несколько продуктов: (id, банк, текст страницы, PDF)"""
+    blocks = []
+    for product_id, bank_name, page_text, pdf_content in items:
+        blocks.append(
+            f"=== ПРОДУКТ {product_id} ({bank_name}) ===\n"
+            f"Условия со страницы, таблицы в формате TSV:\n{page_text}\n\n"
+            f"PDF:\n{pdf_content}"
+        )
+    ids = ", ".join(f'"{product_id}"' for product_id, *_ in items)
+    schema = ",\n        ".join(f'"{field}": null' for field in SCHEMA_FIELDS)
+
+    return f"""
+        Ты ИНФОРМАЦИОННЫЙ ПАРСЕР банковских продуктов.
+        Ты НЕ рассуждаешь и НЕ объясняешь.
+
+        Ниже несколько продуктов, каждый начинается со строки "=== ПРОДУКТ <id> ===".
+        Для КАЖДОГО продукта заполни объект:
+        {{
+        {schema}
+        }}
+
+        Верни ТОЛЬКО один JSON-объект, где ключ — id продукта строкой ({ids}),
+        а значение — объект продукта.
+
+        ПРАВИЛА:
+        - Если поле не найдено — null
+        - Не добавляй новые поля
+        - Не смешивай данные разных продуктов
+        - Если условия на странице неполные, ОБЯЗАТЕЛЬНО используй PDF этого продукта
+        - Не пиши текст вне JSON
+
+        {chr(10).join(blocks)}
+
+        JSON:
+        """
+
+
+def parse_batch_response(raw_response: str, product_ids: list[int]) -> dict[int, dict]:
+    """Разбирает ответ пакетного промпта; отсутствующие продукты не попадают в результат"""
+    parsed = _parse_json_safely(raw_response)
+    if not isinstance(parsed, dict):
+        return {}
+
+    results = {}
+    for product_id in product_ids:
+        item = parsed.get(str(product_id))
+        if not isinstance(item, dict):
+            continue
+        if 'summ' in item:
+            item['sum'] = item.pop('summ')
+        results[product_id] = normalize_ranges(item)
+    return results
+
+
+def _parse_json_safely(raw_response: str) -> dict | None:
+    if not raw_response:
+        return None
+
+    json_str = re.sub(r'```json\n?|```', '', raw_response).strip()
+
+    strategies = [
+        lambda s: s,  # Как есть
+        lambda s: s[:s.rfind('}')+1] if '}' in s else s,
+        lambda s: re.sub(r',\s*$', '', s),
+    ]
+
+    for strategy in strategies:
+        try:
+            cleaned = strategy(json_str)
+            parsed = json.loads(cleaned)
+            if 'summ' in parsed:
+                parsed['sum'] = parsed.pop('summ')
+            return parsed
+        except:
+            continue
+
+    return None
+
+def has_extracted_data(parsed: dict | None) -> bool:
+    """В ответе LLM есть хотя бы одно непустое поле"""
+    return bool(parsed) and any(v for v in parsed.values() if v and v != 'null')
+
+
+def normalize_ranges(data: dict) -> dict:
+    for key, value in data.items():
+        if isinstance(value, dict) and 'min' in value and 'max' in value:
+            min_v = value.get('min')
+            max_v = value.get('max')
+
+            if min_v and max_v:
+                data[key] = f"{min_v} – {max_v}"
+            else:
+                data[key] = min_v or max_v
+
+    return data
+
+
+def _empty_schema(bank_name: str, product_name: str) -> dict:
+    return {
+        "name": None,
+        "rate": None,
+        "rate_type": None,
+        "sum": None,
+        "term": None,
+        "payment_type": None,
+        "commission": None,
+        "early_repayment": None,
+        "insurance": None,
+        "currency": None,
+        "additional": None,
+        "files": None,
+        "bank": bank_name,
+        "product": product_name,
+    }
@@ -0,0 +1,87 @@
+import asyncio
+import hashlib
+import re
+from datetime import datetime
+
+from app.db.model import SessionLocal, ProductFingerprint
+from app.parser.extract import SCHEMA_FIELDS
+from config import GIGACHAT_MODEL
+
+
+_WS_RE = re.compile(r"\s+")
+
+
+def _blocks(text: str) -> list[str]:
+    """Нормализованные непустые строки без повторов, в стабильном порядке"""
+    lines = {_WS_RE.sub(" ", line).strip().lower() for line in (text or "").splitlines()}
+    return sorted(line for line in lines if line)
+
+
+def structural_fingerprint(condensed: str, pdf_content: str,
+                           model: str = GIGACHAT_MODEL, schema: list[str] = SCHEMA_FIELDS) -> str:
+    """Отпечаток того, что реально уходит в LLM.
+
+    Считается по значимым блокам страницы (после condense_html) и тексту
+    PDF: регистр, пробелы, порядок и дубли блоков не влияют. Смена модели
+    или схемы полей тоже меняет отпечаток.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{model}\0{','.join(schema)}\0".encode("utf-8"))
+    for section in (condensed, pdf_content):
+        for block in _blocks(section):
+            digest.update(block.encode("utf-8", errors="replace"))
+            digest.update(b"\n")
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _load(product_id: int) -> tuple[str, dict | None] | None:
+    db = SessionLocal()
+    try:
+        row = db.query(ProductFingerprint).filter_by(product_id=product_id).first()
+        if not row:
+            return None
+        return row.fingerprint, (dict(row.result) if row.result else None)
+    finally:
+        db.close()
+
+
+def _save(product_id: int, fingerprint: str, result: dict):
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        row = db.query(ProductFingerprint).filter_by(product_id=product_id).first()
+        if not row:
+            row = ProductFingerprint(product_id=product_id)
+            db.add(row)
+        if row.fingerprint != fingerprint:
+            row.changed_at = now
+        row.fingerprint = fingerprint
+        row.result = result
+        row.checked_at = now
+        db.commit()
+    finally:
+        db.close()
+
+
+def _touch(product_id: int):
+    db = SessionLocal()
+    try:
+        row = db.query(ProductFingerprint).filter_by(product_id=product_id).first()
+        if row:
+            row.checked_at = datetime.utcnow()
+            db.commit()
+    finally:
+        db.close()
+
+
+async def load_fingerprint(product_id: int) -> tuple[str, dict | None] | None:
+    return await asyncio.to_thread(_load, product_id)
+
+
+async def save_fingerprint(product_id: int, fingerprint: str, result: dict):
+    await asyncio.to_thread(_save, product_id, fingerprint, result)
+
+
+async def touch_fingerprint(product_id: int):
+    await asyncio.to_thread(_touch, product_id)
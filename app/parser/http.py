@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from typing import Mapping
+
+import aiohttp
+
+from config import HTTP_LIMIT, HTTP_LIMIT_PER_HOST, HTTP_KEEPALIVE
+
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "Accept-Encoding": "gzip, deflate",
+}
+
+
+class HttpResponse:
+    """Полностью прочитанный ответ: статус, заголовки и тело"""
+
+    def __init__(self, url: str, status: int, headers: Mapping[str, str], body: bytes, encoding: str | None):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.encoding = encoding or "utf-8"
+
+    @property
+    def text(self) -> str:
+        try:
+            return self.body.decode(self.encoding, errors="replace")
+        except LookupError:
+            return self.body.decode("utf-8", errors="replace")
+
+
+class HttpClient:
+    """Общая aiohttp-сессия приложения.
+
+    Пул соединений с лимитом на хост, keep-alive и сжатие ответов.
+    Сессия создаётся при первом запросе или в `start()`.
+    """
+
+    def __init__(self, limit: int = HTTP_LIMIT, limit_per_host: int = HTTP_LIMIT_PER_HOST,
+                 keepalive: float = HTTP_KEEPALIVE):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive = keepalive
+        self._session: aiohttp.ClientSession | None = None
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        await self._get_session()
+        logging.info(f"[HttpClient] started (limit: {self.limit}, per host: {self.limit_per_host})")
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is not None and not self._session.closed:
+            return self._session
+
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    keepalive_timeout=self.keepalive,
+                    ttl_dns_cache=300,
+                    ssl=False,
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    headers=DEFAULT_HEADERS,
+                    auto_decompress=True,
+                )
+        return self._session
+
+    async def get(self, url: str, headers: dict | None = None, timeout: float = 10) -> HttpResponse:
+        session = await self._get_session()
+        async with session.get(
+            url,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=timeout),
+            allow_redirects=True,
+        ) as resp:
+            body = await resp.read()
+            try:
+                encoding = resp.get_encoding()
+            except Exception:
+                encoding = None
+            return HttpResponse(str(resp.url), resp.status, resp.headers.copy(), body, encoding)
+
+
+http_client = HttpClient()
@@ -0,0 +1,180 @@
+import re
+
+import pandas as pd
+
+# Число с пробелами-разделителями тысяч («50 000») и дробной частью через точку или запятую
+_NUMBER_RE = re.compile(r"\d{1,3}(?:[ \u00a0]\d{3})+(?:[.,]\d+)?|\d+(?:[.,]\d+)?")
+
+
+def parse_numbers(raw) -> list[float]:
+    if raw is None:
+        return []
+    if isinstance(raw, (int, float)) and not isinstance(raw, bool):
+        return [float(raw)]
+    return [
+        float(match.replace(" ", "").replace("\u00a0", "").replace(",", "."))
+        for match in _NUMBER_RE.findall(str(raw))
+    ]
+
+
+def parse_range(raw) -> tuple[float | None, float | None]:
+    """Минимум и максимум чисел в значении: «от 500 до 50 000» → (500.0, 50000.0)"""
+    numbers = parse_numbers(raw)
+    if not numbers:
+        return None, None
+    return min(numbers), max(numbers)
+
+
+# ---------- Нормализация ставки, суммы и срока ----------
+# Поле → допустимые единицы и единица по умолчанию (None — берётся из поля currency)
+NUMERIC_FIELDS = {
+    "rate": ({"%"}, "%"),
+    "sum": ({"BYN", "USD", "EUR"}, None),
+    "term": ({"мес"}, "мес"),
+}
+
+# Строковые операции pandas при установленном pyarrow идут через RE2: в шаблонах
+# нельзя \u-экранирований и ретроспективных проверок — символы пишем как есть
+_NUM = "\\d{1,3}(?:[ \u00a0]\\d{3})+(?:[.,]\\d+)?|\\d+(?:[.,]\\d+)?"
+_SCALE = "тыс|млн"
+_UNIT = "%|мес|год|лет|г\\.|дн|дня|дней|сут|byn|бел|руб|р\\.|usd|\\$|долл|eur|€|евро"
+_BOUND = "до|не более|не больше|максимум|от|не менее|не меньше|свыше|минимум"
+# Число с множителем и единицей («50 тыс. BYN», «5 лет», «9,9%»), необязательно —
+# граница перед ним («до 5 лет») или начало диапазона («от 6 до 60 мес.», «10–12%»)
+_TOKEN_RE = (
+    f"(?:(?:^|[^а-яёa-z])(?P<bound>{_BOUND})\\s+)?"
+    f"(?:(?P<low>{_NUM})\\s*(?P<low_scale>{_SCALE})?\\.?\\s*(?P<low_unit>{_UNIT})?\\s*(?:-|–|—|до)\\s*)?"
+    f"(?P<number>{_NUM})\\s*(?P<scale>{_SCALE})?\\.?\\s*(?P<unit>{_UNIT})?"
+)
+# Даты не числа условий: «до 31.12.2025», «с 1 марта 2025 г.»
+_DATE_RE = (
+    "(?i)\\d{1,2}[./]\\d{1,2}[./]\\d{2,4}"
+    "|\\d{1,2}\\s+(?:января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)"
+    "(?:\\s+(?:19|20)\\d{2})?(?:\\s*(?:г\\.|года?|году))?"
+    "|(?:19|20)\\d{2}\\s*(?:г\\.|года?|году)"
+)
+_UPPER_BOUNDS = {"до", "не более", "не больше", "максимум"}
+_LOWER_BOUNDS = {"от", "не менее", "не меньше", "свыше", "минимум"}
+_SCALES = {"тыс": 1e3, "млн": 1e6}
+# (начало единицы, нормализованная единица, множитель)
+_UNITS = [
+    (r"%", "%", 1.0),
+    (r"мес", "мес", 1.0),
+    (r"год|лет|г\.", "мес", 12.0),
+    (r"дн|дня|дней|сут", "мес", 1 / 30),
+    (r"byn|бел|руб|р\.", "BYN", 1.0),
+    (r"usd|\$|долл", "USD", 1.0),
+    (r"eur|€|евро", "EUR", 1.0),
+]
+_CURRENCIES = [(pattern, unit) for pattern, unit, _ in _UNITS if unit in NUMERIC_FIELDS["sum"][0]]
+
+
+def _as_text(value) -> str | None:
+    if value is None or value == "null":
+        return None
+    if isinstance(value, (list, tuple)):
+        return ", ".join(str(v) for v in value)
+    return str(value)
+
+
+def currency_of(values: pd.Series) -> pd.Series:
+    """Валюта из текста (поле currency или сумма); несколько разных — NA"""
+    text = values.map(_as_text).astype("string").str.lower()
+    found = pd.DataFrame({unit: text.str.contains(pattern, regex=True, na=False) for pattern, unit in _CURRENCIES})
+    currency = pd.Series(pd.NA, index=values.index, dtype="string")
+    single = found.sum(axis=1) == 1
+    currency[single] = found[single].idxmax(axis=1)
+    return currency
+
+
+def _numbers(numbers: pd.Series, scales: pd.Series) -> pd.Series:
+    value = numbers.str.replace("[ \u00a0]", "", regex=True).str.replace(",", ".", regex=False).astype(float)
+    return value * scales.str.lower().map(_SCALES).fillna(1.0).astype(float)
+
+
+def _units(raw_units: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """Нормализованная единица и множитель к ней; без единицы — NA"""
+    raw_units = raw_units.str.lower()
+    unit = pd.Series(pd.NA, index=raw_units.index, dtype="string")
+    factor = pd.Series(float("nan"), index=raw_units.index)
+    for pattern, name, multiplier in _UNITS:
+        matched = raw_units.str.match(pattern, na=False)
+        unit[matched] = name
+        factor[matched] = multiplier
+    return unit, factor
+
+
+def normalize_column(values: pd.Series, field: str, currency: pd.Series | None = None) -> pd.DataFrame:
+    """Диапазоны значений поля сразу по всей колонке: DataFrame min, max, unit с тем же индексом.
+
+    Срок приводится к месяцам, суммы — с учётом «тыс.»/«млн». Даты выбрасываются.
+    Единица переходит на число без единицы только внутри диапазона («от 6 до 60 мес.»).
+    Числа с чужой единицей отбрасываются; числа без единицы — тоже, если в ячейке есть
+    числа с единицей поля, иначе получают единицу поля. «До N» даёт только max, «от N» — только min.
+    """
+    accepted, default_unit = NUMERIC_FIELDS[field]
+    result = pd.DataFrame({"min": pd.NA, "max": pd.NA, "unit": pd.NA}, index=values.index)
+    text = values.map(_as_text).astype("string").str.replace(_DATE_RE, " ", regex=True)
+    tokens = text.str.extractall(_TOKEN_RE, flags=re.IGNORECASE)
+    if tokens.empty:
+        return result
+
+    high = _numbers(tokens["number"], tokens["scale"])
+    unit, factor = _units(tokens["unit"])
+    low_unit, low_factor = _units(tokens["low_unit"])
+    # Начало диапазона без своих множителя и единицы берёт множитель у конца («от 5 до 50 тыс. BYN»),
+    # если не становится больше конца: «от 500 до 50 тыс. BYN» — это 500, а не 500 тыс.
+    low = _numbers(tokens["low"], tokens["low_scale"])
+    low_scaled = _numbers(tokens["low"], tokens["scale"])
+    borrow = tokens["low_scale"].isna() & tokens["low_unit"].isna() & (low_scaled <= high)
+    low = low_scaled.where(borrow, low)
+    low_factor = low_factor.fillna(factor).fillna(1.0)
+    factor = factor.fillna(1.0)
+
+    cell = tokens.index.get_level_values(0)
+    explicit = unit.isin(accepted).groupby(cell).transform("any")
+    if default_unit:
+        unit = unit.fillna(default_unit)
+    elif currency is not None:
+        unit = unit.fillna(pd.Series(currency.reindex(cell).to_numpy(), index=tokens.index, dtype="string"))
+    keep = (unit.isin(accepted) | unit.isna()) & (tokens["unit"].notna() | ~explicit | tokens["low"].notna())
+    # Единица начала диапазона, если указана, должна совпадать: «6 мес. – 5 лет» ок, «5% – 60 мес.» нет
+    keep &= low_unit.isna() | (low_unit == unit).fillna(False)
+
+    bound = tokens["bound"].str.lower()
+    value_max = (high * factor).round(2)
+    value_min = (low * low_factor).round(2).fillna(value_max)
+    value_min = value_min.mask(tokens["low"].isna() & bound.isin(_UPPER_BOUNDS))
+    value_max = value_max.mask(tokens["low"].isna() & bound.isin(_LOWER_BOUNDS))
+
+    parsed = pd.DataFrame({"min": value_min, "max": value_max, "unit": unit})[keep]
+    if parsed.empty:
+        return result
+
+    grouped = parsed.groupby(level=0)
+    found = pd.DataFrame({
+        "min": grouped["min"].min(),
+        "max": grouped["max"].max(),
+        "unit": grouped["unit"].first(),
+    })
+    result.loc[found.index, ["min", "max", "unit"]] = found.to_numpy()
+    return result
+
+
+def normalize_results(results: list[dict]) -> list[dict]:
+    """Добавляет к результатам <поле>_min, <поле>_max, <поле>_unit для ставки, суммы и срока"""
+    if not results:
+        return results
+    frame = pd.DataFrame.from_records(
+        [{name: result.get(name) for name in [*NUMERIC_FIELDS, "currency"]} for result in results]
+    )
+    currency = currency_of(frame["currency"])
+
+    for field in NUMERIC_FIELDS:
+        parsed = normalize_column(frame[field], field, currency if field == "sum" else None)
+        parsed = parsed.astype(object).where(parsed.notna(), None)
+        for result, (value_min, value_max, unit) in zip(results, parsed.itertuples(index=False)):
+            result[f"{field}_min"] = value_min
+            result[f"{field}_max"] = value_max
+            result[f"{field}_unit"] = unit
+    return results
@@ -0,0 +1,93 @@
+import asyncio
+import hashlib
+from datetime import datetime
+
+from app.db.model import SessionLocal, PageCache
+
+
+class CachedPage:
+    """Снимок записи кэша, не привязанный к сессии"""
+
+    def __init__(self, url: str, etag: str | None, last_modified: str | None,
+                 content_hash: str, body: str, source: str):
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+        self.body = body
+        self.source = source
+
+    def conditional_headers(self) -> dict:
+        # Валидаторы описывают сырой HTML; тело из Playwright (отрисованный DOM) ими не проверить
+        headers = {}
+        if self.source != "http":
+            return headers
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def content_hash(body: str) -> str:
+    return hashlib.sha256(body.encode("utf-8", errors="replace")).hexdigest()
+
+
+def _load(url: str) -> CachedPage | None:
+    db = SessionLocal()
+    try:
+        row = db.query(PageCache).filter_by(url=url).first()
+        if not row:
+            return None
+        return CachedPage(row.url, row.etag, row.last_modified, row.content_hash, row.body, row.source)
+    finally:
+        db.close()
+
+
+def _save(url: str, body: str, source: str, etag: str | None, last_modified: str | None):
+    """Сохраняет тело страницы; одинаковое тело не перезаписывается"""
+    now = datetime.utcnow()
+    digest = content_hash(body)
+
+    db = SessionLocal()
+    try:
+        row = db.query(PageCache).filter_by(url=url).first()
+        if not row:
+            row = PageCache(url=url)
+            db.add(row)
+
+        if row.content_hash != digest:
+            row.body = body
+            row.content_hash = digest
+            row.fetched_at = now
+        row.source = source
+        row.etag = etag
+        row.last_modified = last_modified
+        row.checked_at = now
+        db.commit()
+    finally:
+        db.close()
+
+
+def _touch(url: str):
+    db = SessionLocal()
+    try:
+        row = db.query(PageCache).filter_by(url=url).first()
+        if row:
+            row.checked_at = datetime.utcnow()
+            db.commit()
+    finally:
+        db.close()
+
+
+async def load_page(url: str) -> CachedPage | None:
+    return await asyncio.to_thread(_load, url)
+
+
+async def save_page(url: str, body: str, source: str,
+                    etag: str | None = None, last_modified: str | None = None):
+    await asyncio.to_thread(_save, url, body, source, etag, last_modified)
+
+
+async def touch_page(url: str):
+    await asyncio.to_thread(_touch, url)
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+
+from config import PDF_WORKERS, PDF_SPLIT_PAGES, PDF_TEXT_BUDGET
+
+
+# --- Выполняется в дочерних процессах ---
+def _page_count(data: bytes) -> int:
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        return doc.page_count
+
+
+def _extract_range(data: bytes, start: int, stop: int | None, budget: int) -> str:
+    """Текст страниц [start, stop), чтение прекращается после `budget` символов"""
+    parts = []
+    size = 0
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        for number in range(start, stop):
+            text = doc.load_page(number).get_text()
+            parts.append(text)
+            size += len(text)
+            if size >= budget:
+                break
+    return "".join(parts)
+
+
+class PdfTextExtractor:
+    """Извлечение текста PyMuPDF в пуле процессов.
+
+    Небольшие документы разбираются одной задачей. Большие (больше
+    `split_pages` страниц) режутся на диапазоны страниц, которые
+    отправляются волнами по числу воркеров; как только набран бюджет
+    символов, следующие волны не запускаются.
+    """
+
+    def __init__(self, workers: int = PDF_WORKERS, split_pages: int = PDF_SPLIT_PAGES,
+                 budget: int = PDF_TEXT_BUDGET):
+        self.workers = max(1, workers)
+        self.split_pages = max(1, split_pages)
+        self.budget = budget
+        self._pool: ProcessPoolExecutor | None = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            logging.info("[PdfTextExtractor] pool closed")
+
+    async def extract(self, data: bytes) -> str:
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+
+        pages = await loop.run_in_executor(pool, _page_count, data)
+        if pages <= self.split_pages:
+            text = await loop.run_in_executor(pool, _extract_range, data, 0, None, self.budget)
+            return text.strip()[:self.budget]
+
+        ranges = [(start, start + self.split_pages) for start in range(0, pages, self.split_pages)]
+        parts = []
+        size = 0
+        for wave_start in range(0, len(ranges), self.workers):
+            wave = ranges[wave_start:wave_start + self.workers]
+            texts = await asyncio.gather(*[
+                loop.run_in_executor(pool, _extract_range, data, start, stop, self.budget)
+                for start, stop in wave
+            ])
+            for text in texts:
+                parts.append(text)
+                size += len(text)
+            if size >= self.budget:
+                break
+
+        return "".join(parts).strip()[:self.budget]
+
+
+pdf_extractor = PdfTextExtractor()
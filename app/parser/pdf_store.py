@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import os
+from datetime import datetime
+
+from app.db.model import SessionLocal, PdfCache
+from app.parser.http import http_client
+from app.parser.scraper import extract_pdf_text
+from config import PDF_STORE_DIR, PDF_STORE_MAX_MB
+
+
+class PdfDocument:
+    """Текст PDF из хранилища"""
+
+    def __init__(self, url: str, content_hash: str, text: str):
+        self.url = url
+        self.content_hash = content_hash
+        self.text = text
+
+    @property
+    def filename(self) -> str:
+        return os.path.basename(self.url.split('?')[0])
+
+
+class PdfStore:
+    """Хранилище извлечённого текста PDF, адресуемое по sha256 содержимого.
+
+    URL → хэш и валидаторы (ETag/Last-Modified) лежат в таблице pdf_cache,
+    текст — в файлах `<хэш>.txt`. Повторная загрузка идёт условным GET,
+    одинаковые PDF по разным ссылкам разбираются один раз. Файлы
+    вытесняются по давности использования (mtime), когда общий размер
+    превышает `max_bytes`. Параллельные запросы одного URL склеиваются.
+    Пустой результат разбора (ошибка, скан без текста) не сохраняется:
+    в следующий раз PDF будет скачан и разобран заново.
+    """
+
+    def __init__(self, root: str = PDF_STORE_DIR, max_bytes: int = PDF_STORE_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def get(self, url: str) -> PdfDocument | None:
+        future = self._inflight.get(url)
+        if future is None:
+            future = asyncio.ensure_future(self._get(url))
+            self._inflight[url] = future
+            future.add_done_callback(lambda _: self._inflight.pop(url, None))
+        return await asyncio.shield(future)
+
+    async def _get(self, url: str) -> PdfDocument | None:
+        entry = await asyncio.to_thread(_load_entry, url)
+
+        headers = {"User-Agent": "Mozilla/5.0"}
+        if entry and await asyncio.to_thread(os.path.exists, self._path(entry.content_hash)):
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+
+        try:
+            r = await http_client.get(url, headers=headers, timeout=15)
+
+            if r.status == 304 and entry:
+                text = await asyncio.to_thread(self._read_text, entry.content_hash)
+                if text:
+                    print(f"PDF не изменился (304): {url}")
+                    await asyncio.to_thread(_save_entry, url, entry.etag, entry.last_modified, entry.content_hash)
+                    return PdfDocument(url, entry.content_hash, text)
+                r = await http_client.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=15)
+
+            if r.status != 200:
+                return None
+        except Exception as e:
+            print(f"PDF download error: {e}")
+            return None
+
+        digest = hashlib.sha256(r.body).hexdigest()
+        text = await asyncio.to_thread(self._read_text, digest)
+        if text:
+            print(f"PDF уже разобран ранее: {url}")
+        else:
+            text = await extract_pdf_text(r.body)
+            if not text:
+                # не запоминаем: иначе условный GET вечно отдавал бы пустой текст
+                return PdfDocument(url, digest, text)
+            await asyncio.to_thread(self._write_text, digest, text)
+            await asyncio.to_thread(self._evict)
+
+        await asyncio.to_thread(
+            _save_entry, url, r.headers.get("ETag"), r.headers.get("Last-Modified"), digest
+        )
+        return PdfDocument(url, digest, text)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, f"{digest}.txt")
+
+    def _read_text(self, digest: str) -> str | None:
+        path = self._path(digest)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            os.utime(path)  # отметка для LRU
+            return text
+        except FileNotFoundError:
+            return None
+
+    def _write_text(self, digest: str, text: str):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self._path(digest) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, self._path(digest))
+
+    def _evict(self):
+        try:
+            entries = [e for e in os.scandir(self.root) if e.name.endswith(".txt")]
+        except FileNotFoundError:
+            return
+
+        files = sorted(((e.stat().st_mtime, e.stat().st_size, e.path) for e in entries))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+def _load_entry(url: str) -> PdfCache | None:
+    db = SessionLocal()
+    try:
+        row = db.query(PdfCache).filter_by(url=url).first()
+        if row:
+            db.expunge(row)
+        return row
+    finally:
+        db.close()
+
+
+def _save_entry(url: str, etag: str | None, last_modified: str | None, digest: str):
+    db = SessionLocal()
+    try:
+        row = db.query(PdfCache).filter_by(url=url).first()
+        if not row:
+            row = PdfCache(url=url)
+            db.add(row)
+        row.etag = etag
+        row.last_modified = last_modified
+        row.content_hash = digest
+        row.checked_at = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+pdf_store = PdfStore()
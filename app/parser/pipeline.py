@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+
+StageFunc = Callable[[Any], Awaitable[None]]
+DoneCallback = Callable[[int, int, Any], Awaitable[None]]
+ErrorCallback = Callable[[Any, str, Exception], None]
+
+
+class Stage:
+    """Этап конвейера: асинхронная функция и размер пула воркеров.
+
+    Если задан `batch_size`, функция получает список до `batch_size`
+    элементов: воркер берёт первый и ждёт остальные не дольше `linger` секунд.
+    """
+
+    def __init__(self, name: str, func: StageFunc, workers: int = 1,
+                 batch_size: int | None = None, linger: float = 0.0):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.batched = batch_size is not None
+        self.batch_size = max(1, int(batch_size or 1))
+        self.linger = max(0.0, linger)
+
+
+class Pipeline:
+    """Конвейер с отдельным пулом воркеров на каждом этапе.
+
+    Элементы проходят этапы по порядку. Если после этапа у элемента
+    выставлен атрибут `done`, оставшиеся этапы пропускаются.
+    Исключение этапа передаётся в `on_error` и тоже завершает элемент.
+    `concurrency` ограничивает число элементов внутри конвейера,
+    результат возвращается в порядке входного списка.
+    """
+
+    def __init__(
+        self,
+        stages: list[Stage],
+        concurrency: int = 4,
+        on_done: DoneCallback | None = None,
+        on_error: ErrorCallback | None = None,
+    ):
+        if not stages:
+            raise ValueError("Pipeline requires at least one stage")
+        self.stages = stages
+        self.concurrency = max(1, int(concurrency))
+        self.on_done = on_done
+        self.on_error = on_error
+
+    async def run(self, items: list) -> list:
+        total = len(items)
+        if not total:
+            return []
+
+        queues = [asyncio.Queue() for _ in self.stages]
+        results: list = [None] * total
+        limit = asyncio.Semaphore(self.concurrency)
+        finished = asyncio.Event()
+        completed = 0
+
+        async def complete(idx: int, item: Any):
+            nonlocal completed
+            results[idx] = item
+            completed += 1
+            limit.release()
+            if self.on_done:
+                try:
+                    await self.on_done(completed, total, item)
+                except Exception as e:
+                    logging.warning(f"[Pipeline] on_done error: {e}")
+            if completed == total:
+                finished.set()
+
+        async def take_batch(pos: int, stage: Stage) -> list[tuple[int, Any]]:
+            batch = [await queues[pos].get()]
+            if stage.batch_size == 1:
+                return batch
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + stage.linger
+            while len(batch) < stage.batch_size:
+                if not queues[pos].empty():
+                    batch.append(queues[pos].get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                # опрос вместо wait_for(get()): отмена get по таймауту может потерять элемент
+                await asyncio.sleep(min(0.05, timeout))
+            return batch
+
+        async def worker(pos: int, stage: Stage):
+            while True:
+                batch = await take_batch(pos, stage)
+                items = [item for _, item in batch]
+                try:
+                    if stage.batched:
+                        await stage.func(items)
+                    else:
+                        await stage.func(items[0])
+                except Exception as e:
+                    for item in items:
+                        if getattr(item, "done", False):
+                            continue
+                        if self.on_error:
+                            self.on_error(item, stage.name, e)
+                        else:
+                            logging.error(f"[Pipeline] {stage.name}: {e}")
+                        item.done = True
+
+                for idx, item in batch:
+                    if getattr(item, "done", False) or pos == len(self.stages) - 1:
+                        await complete(idx, item)
+                    else:
+                        await queues[pos + 1].put((idx, item))
+
+        async def feeder():
+            for idx, item in enumerate(items):
+                await limit.acquire()
+                if getattr(item, "done", False):
+                    await complete(idx, item)
+                else:
+                    await queues[0].put((idx, item))
+
+        workers = [
+            asyncio.create_task(worker(pos, stage))
+            for pos, stage in enumerate(self.stages)
+            for _ in range(stage.workers)
+        ]
+        feeder_task = asyncio.create_task(feeder())
+
+        try:
+            await finished.wait()
+        finally:
+            feeder_task.cancel()
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(feeder_task, *workers, return_exceptions=True)
+
+        return results
@@ -0,0 +1,314 @@
+import asyncio
+import time
+
+from app.llm.cache import extraction_cache
+from app.llm.client import LlmClient, llm_client
+from app.llm.usage import CallUsage, record_call
+from app.parser.condense import condense_html, CHARS_PER_TOKEN
+from app.parser.extract import (build_prompt, build_fallback_prompt, build_batch_prompt,
+                                parse_batch_response, _parse_json_safely, normalize_ranges,
+                                has_extracted_data, _empty_schema)
+from app.parser.pipeline import Pipeline, Stage, DoneCallback
+from app.parser.fingerprint import structural_fingerprint, load_fingerprint, save_fingerprint, touch_fingerprint
+from app.parser.pdf_store import pdf_store, PdfDocument
+from app.parser.scraper import fetch_page, extract_pdf_links, extract_pdf_links_belarusbank
+from config import (PARSE_CONCURRENCY, PIPELINE_WORKERS, CONDENSE_TOKEN_BUDGET, LLM_BATCH_ENABLED,
+                    LLM_BATCH_MAX_ITEMS, LLM_BATCH_TOKENS, LLM_BATCH_ITEM_TOKENS, LLM_BATCH_LINGER)
+
+
+class ProductTask:
+    """Состояние обработки одного продукта в конвейере"""
+
+    def __init__(self, product_id: int, product_name: str, url: str,
+                 bank_name: str, bank_url: str | None = None,
+                 user_id: int | None = None, log_id: int | None = None):
+        self.product_id = product_id
+        self.product_name = product_name
+        self.url = url
+        self.bank_name = bank_name
+        self.bank_url = bank_url
+        self.user_id = user_id
+        self.log_id = log_id
+
+        self.page_content: str | None = None
+        self.pdf_links: list[str] = []
+        self.pdf_files: list[str] = []
+        self.pdf_docs: list[PdfDocument] = []
+        self.pdf_content = ''
+        self.condensed = ''
+        self.text_content = ''
+
+        self.result: dict | None = None
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.from_cache = False
+        self.cache_key: str | None = None
+        self.fingerprint: str | None = None
+        self.change: str | None = None  # "new" / "changed" / "same"; None — до сверки не дошли
+        self.extracted = False
+        self.done = False
+
+    def finish(self, result: dict | None = None):
+        self.result = result or _empty_schema(self.bank_name, self.product_name)
+        self.done = True
+
+
+async def fetch_stage(task: ProductTask):
+    """Загрузка страницы продукта и поиск ссылок на PDF"""
+    page_content = await fetch_page(task.url)
+    if not page_content or len(page_content) < 500:
+        print(f"-! Ничего не найдено: {task.bank_name} {task.product_name}")
+        task.finish()
+        return
+
+    task.page_content = page_content
+    if task.bank_name.lower() == "беларусбанк":
+        task.pdf_links = extract_pdf_links_belarusbank(page_content)
+    else:
+        task.pdf_links = extract_pdf_links(page_content, task.bank_url or task.url)
+        print(f"Найдено PDF ссылок: {task.pdf_links}")
+
+
+async def pdf_stage(task: ProductTask):
+    """Текст PDF из хранилища: каждый документ качается и разбирается один раз"""
+    pdf_texts = []
+
+    for pdf_url in task.pdf_links[:3]:
+        doc = await pdf_store.get(pdf_url)
+        if not doc:
+            continue
+
+        task.pdf_files.append(pdf_url)
+        task.pdf_docs.append(doc)
+
+        if doc.text:
+            pdf_texts.append(
+                f"PDF ({doc.filename}):\n{doc.text}"
+            )
+
+    task.pdf_content = "\n\n---\n\n".join(pdf_texts)
+
+
+async def clean_stage(task: ProductTask):
+    """Сжатие страницы до значимых блоков вне event loop"""
+    print(f"+ {task.bank_name} {task.product_name} HTML: {len(task.page_content)}")
+    task.condensed, task.text_content = await asyncio.to_thread(condense_html, task.page_content)
+    task.page_content = None
+
+    # Если блоков с условиями не нашлось, отдаём модели плоский текст страницы
+    if len(task.condensed) < 100:
+        task.condensed = task.text_content[:CONDENSE_TOKEN_BUDGET * CHARS_PER_TOKEN]
+
+    print(f"+ {task.bank_name} {task.product_name} сжато до: {len(task.condensed)}")
+    if len(task.condensed) < 300:
+        print(f"-! Текст страницы слишком короткий")
+        task.finish()
+
+
+async def diff_stage(task: ProductTask):
+    """Сверка отпечатка: если значимое содержимое не менялось, берём прошлый результат"""
+    task.fingerprint = await asyncio.to_thread(structural_fingerprint, task.condensed, task.pdf_content)
+    previous = await load_fingerprint(task.product_id)
+    if not previous:
+        task.change = "new"
+        return
+
+    fingerprint, result = previous
+    if fingerprint != task.fingerprint or not result:
+        task.change = "changed"
+        return
+
+    task.change = "same"
+    await touch_fingerprint(task.product_id)
+    result['bank'] = task.bank_name
+    result['product'] = task.product_name
+    result['files'] = ", ".join(task.pdf_files) if task.pdf_files else None
+    print(f"{task.bank_name} {task.product_name}: без изменений, LLM не вызывается")
+    task.finish(result)
+
+
+def changed_products(tasks: list[ProductTask]) -> list[ProductTask]:
+    """Продукты, у которых содержимое изменилось с прошлой сверки"""
+    return [task for task in tasks if task.change == "changed"]
+
+
+def _estimate_tokens(task: ProductTask) -> int:
+    return (len(task.condensed) + len(task.pdf_content)) // CHARS_PER_TOKEN
+
+
+def pack_tasks(tasks: list[ProductTask], budget: int = LLM_BATCH_TOKENS,
+               item_limit: int = LLM_BATCH_ITEM_TOKENS) -> tuple[list[list[ProductTask]], list[ProductTask]]:
+    """Делит продукты на пакеты в пределах бюджета токенов и одиночные запросы"""
+    groups, singles = [], []
+    current, used = [], 0
+    for task in tasks:
+        cost = _estimate_tokens(task)
+        if cost > item_limit:
+            singles.append(task)
+            continue
+        if current and used + cost > budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(task)
+        used += cost
+    if current:
+        groups.append(current)
+
+    singles += [group[0] for group in groups if len(group) == 1]
+    return [group for group in groups if len(group) > 1], singles
+
+
+def make_extract_stage(llm: LlmClient):
+    """Этап извлечения полей через GigaChat: кэш, пакетные и одиночные запросы"""
+
+    async def call_llm(tasks: list[ProductTask], prompt: str, fallback: bool = False) -> str:
+        started = time.monotonic()
+        weights = [_estimate_tokens(task) for task in tasks]
+        total_weight = sum(weights) or 1
+
+        def record(task: ProductTask, weight: int) -> dict:
+            return dict(
+                model=llm.model, bank=task.bank_name, product=task.product_name,
+                prompt_chars=len(prompt) * weight // total_weight if len(tasks) > 1 else len(prompt),
+                fallback=fallback, batch_size=len(tasks),
+                user_id=task.user_id, log_id=task.log_id,
+            )
+
+        try:
+            response = await llm.chat(prompt)
+        except Exception:
+            latency_ms = int((time.monotonic() - started) * 1000)
+            for task, weight in zip(tasks, weights):
+                await record_call(latency_ms=latency_ms, status="error", **record(task, weight))
+            raise
+
+        latency_ms = int((time.monotonic() - started) * 1000)
+        answer = response.choices[0].message.content
+        usage = CallUsage.from_response(response, prompt, answer)
+        for task, weight, part in zip(tasks, weights, usage.split(weights)):
+            task.tokens_in += part.prompt_tokens
+            task.tokens_out += part.completion_tokens
+            await record_call(latency_ms=latency_ms, usage=part, **record(task, weight))
+        return answer
+
+    async def ask_llm(task: ProductTask) -> dict | None:
+        prompt = build_prompt(task.bank_name, task.condensed, task.pdf_content)
+        raw_response = await call_llm([task], prompt)
+
+        print(f"{task.bank_name} RAW: {repr(raw_response[:150])}")
+
+        parsed_data = _parse_json_safely(raw_response)
+        if parsed_data:
+            parsed_data = normalize_ranges(parsed_data)
+
+        if not parsed_data:
+            print(f"!!! {task.bank_name} Не удалось распарсить JSON")
+
+            # Fallback промпт только по тексту
+            prompt_fallback = build_fallback_prompt(task.text_content)
+            try:
+                raw_response_fallback = await call_llm([task], prompt_fallback, fallback=True)
+                parsed_data = _parse_json_safely(raw_response_fallback)
+                if parsed_data and any(v for v in parsed_data.values() if v and v != 'null'):
+                    print(f"✓ Fallback сработал для {task.bank_name}")
+            except Exception as e:
+                print(f"Fallback ошибка {task.bank_name}: {e}")
+
+        return parsed_data
+
+    def finalize(task: ProductTask, parsed_data: dict):
+        # Проверяем наличие данных
+        if not has_extracted_data(parsed_data):
+            print(f"!!!!! {task.bank_name} Все поля null")
+            task.finish()
+            return
+
+        # Добавляем метаданные
+        parsed_data['bank'] = task.bank_name
+        parsed_data['product'] = task.product_name
+        parsed_data['files'] = ", ".join(task.pdf_files) if task.pdf_files else None
+        print(f"{task.bank_name} ✓: {parsed_data.get('name', 'N/A')}")
+        task.extracted = True
+        task.finish(parsed_data)
+
+    async def extract_single(task: ProductTask):
+        parsed_data = await ask_llm(task)
+        if not parsed_data:
+            task.finish()
+            return
+        await extraction_cache.put(task.cache_key, parsed_data)
+        finalize(task, parsed_data)
+
+    async def extract_packed(tasks: list[ProductTask]) -> list[ProductTask]:
+        """Пакетный запрос; возвращает продукты, которые не удалось разобрать"""
+        prompt = build_batch_prompt([
+            (task.product_id, task.bank_name, task.condensed, task.pdf_content) for task in tasks
+        ])
+        try:
+            raw_response = await call_llm(tasks, prompt)
+        except Exception as e:
+            print(f"-! Пакетный запрос не удался ({len(tasks)} шт.): {e}")
+            return tasks
+
+        parsed = parse_batch_response(raw_response, [task.product_id for task in tasks])
+        leftover = []
+        for task in tasks:
+            parsed_data = parsed.get(task.product_id)
+            if not parsed_data:
+                leftover.append(task)
+                continue
+            await extraction_cache.put(task.cache_key, parsed_data)
+            finalize(task, parsed_data)
+
+        print(f"Пакет из {len(tasks)}: разобрано {len(tasks) - len(leftover)}")
+        return leftover
+
+    async def extract_stage(tasks: list[ProductTask]):
+        pending = []
+        for task in tasks:
+            task.cache_key = extraction_cache.make_key(task.bank_name, task.condensed, task.pdf_content)
+            parsed_data = await extraction_cache.get(task.cache_key)
+            if parsed_data:
+                print(f"{task.bank_name}: результат LLM из кэша")
+                task.from_cache = True
+                finalize(task, parsed_data)
+            else:
+                pending.append(task)
+
+        groups, singles = pack_tasks(pending)
+        for leftover in await asyncio.gather(*[extract_packed(group) for group in groups]):
+            singles += leftover
+
+        outcomes = await asyncio.gather(*[extract_single(task) for task in singles], return_exceptions=True)
+        for task, outcome in zip(singles, outcomes):
+            if isinstance(outcome, Exception):
+                _on_stage_error(task, "extract", outcome)
+
+        # Запоминаем отпечаток только для удачных извлечений, пустые переспросим
+        for task in tasks:
+            if task.extracted and task.fingerprint:
+                await save_fingerprint(task.product_id, task.fingerprint, dict(task.result))
+
+    return extract_stage
+
+
+def _on_stage_error(task: ProductTask, stage: str, e: Exception):
+    print(f"{task.bank_name} ERROR ({stage}): {str(e)}")
+    task.finish()
+
+
+def build_product_pipeline(llm: LlmClient = llm_client, on_done: DoneCallback | None = None) -> Pipeline:
+    return Pipeline(
+        [
+            Stage("fetch", fetch_stage, PIPELINE_WORKERS["fetch"]),
+            Stage("pdf", pdf_stage, PIPELINE_WORKERS["pdf"]),
+            Stage("clean", clean_stage, PIPELINE_WORKERS["clean"]),
+            Stage("diff", diff_stage, PIPELINE_WORKERS["clean"]),
+            Stage("extract", make_extract_stage(llm), PIPELINE_WORKERS["extract"],
+                  batch_size=LLM_BATCH_MAX_ITEMS if LLM_BATCH_ENABLED else 1,
+                  linger=LLM_BATCH_LINGER),
+        ],
+        concurrency=PARSE_CONCURRENCY,
+        on_done=on_done,
+        on_error=_on_stage_error,
+    )
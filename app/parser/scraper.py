@@ -0,0 +1,133 @@
+import asyncio
+
+from bs4 import BeautifulSoup
+
+from app.parser.browser import browser_pool
+from app.parser.http import http_client
+from app.parser.pdf_extract import pdf_extractor
+from app.parser.page_cache import load_page, save_page, touch_page
+
+
+#---------------------Использование playwright для работы на сервере--------------------
+async def get_page_content_playwright(url: str, timeout: int = 30000) -> str | None:
+    try:
+        async with browser_pool.page() as page:
+            try:
+                await page.goto(url, wait_until='networkidle', timeout=timeout)
+                return await page.content()
+            except Exception as e:
+                print(f"Playwright ошибка для {url}: {e}")
+                return None
+    except Exception as e:
+        print(f"Критическая ошибка Playwright: {e}")
+        return None
+
+
+async def _cache_save(url: str, body: str, source: str, etag: str | None = None, last_modified: str | None = None):
+    try:
+        await save_page(url, body, source, etag, last_modified)
+    except Exception as e:
+        print(f"-! Кэш страниц недоступен для {url}: {e}")
+
+
+async def fetch_page(url: str) -> str | None:
+    """Загрузка с условным GET: при 304 отдаём HTML из кэша без передачи тела.
+
+    Изменилось ли содержимое, решает отпечаток на этапе diff (страница и PDF вместе):
+    304 по странице ничего не говорит о её PDF.
+    """
+    try:
+        cached = await load_page(url)
+    except Exception as e:
+        print(f"-! Кэш страниц недоступен для {url}: {e}")
+        cached = None
+
+    try:
+        headers = cached.conditional_headers() if cached else None
+        response = await http_client.get(url, headers=headers, timeout=10)
+
+        if response.status == 304 and cached:
+            print(f"{url}: не изменилась (304), берём из кэша")
+            try:
+                await touch_page(url)
+            except Exception:
+                pass
+            return cached.body
+
+        text = response.text
+        if response.status == 200 and len(text) > 500:
+            print(f"{url}: загружено через aiohttp")
+            await _cache_save(url, text, "http", response.headers.get("ETag"), response.headers.get("Last-Modified"))
+            return text
+    except Exception as e:
+        print(f"-! aiohttp не сработал для {url}: {type(e).__name__}")
+
+
+    print(f"- Пробуем Playwright для {url}...")
+    content = await get_page_content_playwright(url)
+
+    if content and len(content) > 500:
+        print(f"{url}: загружено через Playwright")
+        # без валидаторов: они от ответа aiohttp, а не от отрисованной страницы
+        await _cache_save(url, content, "playwright")
+        return content
+
+    print(f"-!!! Не удалось загрузить {url}")
+    return None
+
+
+def extract_pdf_links(html: str, base_url: str) -> list[str]:
+    soup = BeautifulSoup(html, 'html.parser')
+    links = set()
+
+    for a in soup.find_all('a', href=True):
+        href = a['href'].strip()
+
+        if any(x in href.lower() for x in ['.pdf', 'pdf/', 'documents']):
+            if href.startswith('/'):
+                href = base_url.rstrip('/') + href
+            elif not href.startswith('http'):
+                continue
+
+            links.add(href.split('#')[0])
+
+    return list(links)
+
+
+def extract_pdf_links_belarusbank(html: str) -> list[str]:
+    soup = BeautifulSoup(html, 'html.parser')
+    links = set()
+
+    # === 1. Обычные <a> ссылки ===
+    for a in soup.find_all('a', href=True):
+        href = a['href'].strip()
+        if '.pdf' in href.lower():
+            if href.startswith('/'):
+                href = 'https://belarusbank.by/fizicheskim_licam/kredit/consumer/kredit-1/' + href
+            links.add(href)
+
+    # === 2. Баннеры и картинки ===
+    for img in soup.find_all(['img', 'source']):
+        for attr in ['src', 'data-src', 'srcset', 'data-srcset']:
+            val = img.get(attr)
+            if val and '.pdf' in val.lower():
+                links.add(val.split(' ')[0])
+
+    return list(links)
+
+
+async def extract_pdf_text(pdf_path: str | bytes) -> str:
+    try:
+        if isinstance(pdf_path, bytes):
+            data = pdf_path
+        else:
+            data = await asyncio.to_thread(_read_file, pdf_path)
+        return await pdf_extractor.extract(data)
+    except Exception as e:
+        print(f"Ошибка PDF {pdf_path if isinstance(pdf_path, str) else '<bytes>'}: {e}")
+        return ''
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
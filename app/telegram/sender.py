@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup, Message
+
+from app.llm.client import TokenBucket
+from config import TG_CHAT_EDIT_INTERVAL, TG_GLOBAL_RATE
+
+
+class _Edit:
+    """Последнее содержимое, которое нужно показать в сообщении"""
+
+    def __init__(self, bot: Bot, text: str, kwargs: dict, digest: str):
+        self.bot = bot
+        self.text = text
+        self.kwargs = kwargs
+        self.digest = digest
+        self.waiters: list[asyncio.Future] = []
+
+    def resolve(self, sent: bool):
+        for waiter in self.waiters:
+            if not waiter.done():
+                waiter.set_result(sent)
+
+
+def _digest(text: str, kwargs: dict) -> str:
+    markup = kwargs.get("reply_markup")
+    markup = markup.model_dump_json(exclude_none=True) if markup else ""
+    raw = f"{text}\0{markup}\0{kwargs.get('parse_mode') or ''}"
+    return hashlib.sha1(raw.encode("utf-8", errors="replace")).hexdigest()
+
+
+class EditSender:
+    """Исходящие правки сообщений с учётом flood control Telegram.
+
+    На каждое сообщение — одна очередь из одного элемента: новые правки
+    вытесняют ещё не отправленные, уходит только последняя. Правка,
+    совпадающая с последней отправленной в это сообщение, не тратит лимиты
+    и не отправляется; ответ Telegram «message is not modified» тоже
+    считается такой правкой. Между правками одного чата не
+    меньше `chat_interval` сек, на весь бот — не больше `global_rate` в
+    секунду. На TelegramRetryAfter чат ждёт указанное время, после чего
+    отправляется самое свежее содержимое.
+    """
+
+    def __init__(self, chat_interval: float = TG_CHAT_EDIT_INTERVAL, global_rate: float = TG_GLOBAL_RATE,
+                 remember: int = 10000):
+        self.chat_interval = chat_interval
+        self.remember = remember
+        self._bucket = TokenBucket(global_rate, capacity=max(1, int(global_rate)))
+        self._pending: dict[tuple[int, int], _Edit] = {}
+        self._workers: dict[tuple[int, int], asyncio.Task] = {}
+        self._chat_locks: dict[int, asyncio.Lock] = {}
+        self._chat_next: dict[int, float] = {}
+        # (chat_id, message_id) → отпечаток последней отправленной правки
+        self._sent: OrderedDict[tuple[int, int], str] = OrderedDict()
+
+    async def edit(self, bot: Bot, chat_id: int, message_id: int, text: str,
+                   reply_markup: InlineKeyboardMarkup | None = None, parse_mode: str | None = None,
+                   wait: bool = False) -> bool:
+        """Ставит правку в очередь; с `wait=True` ждёт отправки. False — правка не понадобилась"""
+        key = (chat_id, message_id)
+        kwargs = {"reply_markup": reply_markup}
+        if parse_mode is not None:
+            kwargs["parse_mode"] = parse_mode
+        digest = _digest(text, kwargs)
+
+        previous = self._pending.pop(key, None)
+        if previous is None and self._sent.get(key) == digest:
+            return False
+
+        request = _Edit(bot, text, kwargs, digest)
+        if previous is not None:
+            request.waiters = previous.waiters
+        waiter = asyncio.get_running_loop().create_future()
+        request.waiters.append(waiter)
+        self._pending[key] = request
+
+        if key not in self._workers:
+            self._workers[key] = asyncio.create_task(self._drain(key))
+        return await waiter if wait else True
+
+    async def edit_message(self, message: Message, text: str, **kwargs) -> bool:
+        return await self.edit(message.bot, message.chat.id, message.message_id, text, **kwargs)
+
+    async def _slot(self, chat_id: int):
+        """Ждёт очереди чата и общего лимита бота"""
+        lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        async with lock:
+            delay = self._chat_next.get(chat_id, 0.0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._bucket.acquire()
+            self._chat_next[chat_id] = time.monotonic() + self.chat_interval
+
+    async def _drain(self, key: tuple[int, int]):
+        chat_id, message_id = key
+        try:
+            while key in self._pending:
+                await self._slot(chat_id)
+                request = self._pending.pop(key, None)
+                if request is None:
+                    break
+                if self._sent.get(key) == request.digest:
+                    request.resolve(False)
+                    continue
+
+                try:
+                    await request.bot.edit_message_text(
+                        request.text, chat_id=chat_id, message_id=message_id, **request.kwargs
+                    )
+                except TelegramRetryAfter as e:
+                    logging.warning(f"[Sender] flood control in chat {chat_id}: retry after {e.retry_after}s")
+                    self._chat_next[chat_id] = time.monotonic() + e.retry_after
+                    # Вернуть в очередь, если за это время не пришло содержимое новее
+                    newer = self._pending.get(key)
+                    if newer is None:
+                        self._pending[key] = request
+                    else:
+                        newer.waiters = request.waiters + newer.waiters
+                    continue
+                except TelegramBadRequest as e:
+                    if "message is not modified" in str(e):
+                        self._remember(key, request.digest)
+                    else:
+                        logging.warning(f"[Sender] edit failed in chat {chat_id}: {e}")
+                        self._sent.pop(key, None)
+                    request.resolve(False)
+                    continue
+                except Exception as e:
+                    logging.warning(f"[Sender] edit failed in chat {chat_id}: {e}")
+                    self._sent.pop(key, None)
+                    request.resolve(False)
+                    continue
+
+                self._remember(key, request.digest)
+                request.resolve(True)
+        finally:
+            self._workers.pop(key, None)
+            if not any(worker_key[0] == chat_id for worker_key in self._workers):
+                self._chat_locks.pop(chat_id, None)
+                if self._chat_next.get(chat_id, 0.0) <= time.monotonic():
+                    self._chat_next.pop(chat_id, None)
+
+    def _remember(self, key: tuple[int, int], digest: str):
+        # Новая отправленная правка заменяет прежнюю: тот же текст после другого снова уйдёт
+        self._sent[key] = digest
+        self._sent.move_to_end(key)
+        while len(self._sent) > self.remember:
+            self._sent.popitem(last=False)
+
+
+sender = EditSender()
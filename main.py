@@ -8,10 +8,23 @@ from aiohttp import web
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.fsm.storage.memory import SimpleEventIsolation
 from aiogram.webhook.aiohttp_server import SimpleRequestHandler
 
-from config import TOKEN, PROXY_RU
+from config import TOKEN, PROXY_RU, CRAWL_ENABLED
 from app.handlers.card import router
+from app.handlers.admin import router as admin_router, warn_if_no_admins
+from app.handlers.offers import router as offers_router
+from app.parser.browser import browser_pool
+from app.parser.http import http_client
+from app.parser.pdf_extract import pdf_extractor
+from app.llm.client import llm_client
+from app.jobs.queue import job_worker
+from app.db.model import async_engine
+from app.db.migrations import upgrade_async
+from app.db.catalog import catalog
+from app.db.fsm_storage import make_fsm_storage
+from app.jobs.scheduler import catalog_scheduler
 
 logging.basicConfig(level=logging.INFO)
 
@@ -47,6 +60,12 @@ async def health(request):
 async def on_startup(app: web.Application):
     bot: Bot = app["bot"]
 
+    applied = await upgrade_async()
+    if applied:
+        logging.info(f"✅ DB migrations applied: {applied}")
+    await catalog.load()
+    warn_if_no_admins()
+
     hostname = os.getenv("RENDER_EXTERNAL_HOSTNAME")
 
     if hostname:
@@ -58,6 +77,21 @@ async def on_startup(app: web.Application):
 
     app["keep_alive_task"] = asyncio.create_task(keep_alive())
 
+    if CRAWL_ENABLED:
+        catalog_scheduler.start()
+
+    app["http_client"] = http_client
+    await http_client.start()
+
+    app["browser_pool"] = browser_pool
+    try:
+        await browser_pool.start()
+    except Exception as e:
+        logging.error(f"-! BrowserPool start failed: {e}")
+
+    app["job_worker"] = job_worker
+    await job_worker.start(bot)
+
 
 async def on_shutdown(app: web.Application):
     bot: Bot = app["bot"]
@@ -71,6 +105,15 @@ async def on_shutdown(app: web.Application):
     if task:
         task.cancel()
 
+    await catalog_scheduler.stop()
+    await app["job_worker"].stop()
+
+    await app["browser_pool"].close()
+    await app["http_client"].close()
+    pdf_extractor.close()
+    await llm_client.close()
+    await async_engine.dispose()
+
     logging.info("!!! Shutdown completed")
 
 
@@ -81,8 +124,10 @@ async def main():
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
 
-    dp = Dispatcher()
+    dp = Dispatcher(storage=make_fsm_storage(), events_isolation=SimpleEventIsolation())
     dp.include_router(router)
+    dp.include_router(admin_router)
+    dp.include_router(offers_router)
 
     app = web.Application()
     app["bot"] = bot
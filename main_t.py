@@ -5,22 +5,48 @@ import logging
 from aiogram import Dispatcher, Bot, html
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.fsm.storage.memory import SimpleEventIsolation
 
 from config import TOKEN
 from app.handlers.card import router
+from app.handlers.admin import router as admin_router, warn_if_no_admins
+from app.handlers.offers import router as offers_router
+from app.parser.browser import browser_pool
+from app.parser.http import http_client
+from app.parser.pdf_extract import pdf_extractor
+from app.llm.client import llm_client
+from app.jobs.queue import job_worker
+from app.db.model import async_engine
+from app.db.migrations import upgrade_async
+from app.db.catalog import catalog
+from app.db.fsm_storage import make_fsm_storage
 
 logging.basicConfig(level=logging.INFO)
 
-dp = Dispatcher()
+dp = Dispatcher(storage=make_fsm_storage(), events_isolation=SimpleEventIsolation())
 
 
 
 async def main() -> None:
     bot = Bot(token = TOKEN, default = DefaultBotProperties(parse_mode = ParseMode.HTML))
     dp.include_router(router)
+    dp.include_router(admin_router)
+    dp.include_router(offers_router)
 
+    await upgrade_async()
+    await catalog.load()
+    warn_if_no_admins()
     await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+    await job_worker.start(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await job_worker.stop()
+        await browser_pool.close()
+        await http_client.close()
+        pdf_extractor.close()
+        await llm_client.close()
+        await async_engine.dispose()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,17 @@
+import os
+import tempfile
+
+import pytest
+
+# Своя SQLite-база на прогон: config читает DATABASE_URL при импорте, .env его не перекрывает
+_DB_DIR = tempfile.mkdtemp(prefix="tests_")
+os.environ["DB_PATH"] = os.path.join(_DB_DIR, "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.environ['DB_PATH']}"
+
+
+@pytest.fixture(scope="session")
+def migrated():
+    """База со всеми миграциями и справочниками"""
+    from app.db.migrations import upgrade
+    upgrade()
+    return os.environ["DB_PATH"]
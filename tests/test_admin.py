@@ -0,0 +1,17 @@
+import logging
+
+from app.handlers import admin
+
+
+def test_no_admins_means_nobody(monkeypatch, caplog):
+    monkeypatch.setattr(admin, "ADMIN_IDS", set())
+    assert not admin.is_admin(12345)
+    with caplog.at_level(logging.WARNING):
+        admin.warn_if_no_admins()
+    assert "ADMIN_IDS is empty" in caplog.text
+
+
+def test_configured_admins(monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_IDS", {1})
+    assert admin.is_admin(1)
+    assert not admin.is_admin(2)
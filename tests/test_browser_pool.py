@@ -0,0 +1,64 @@
+import asyncio
+
+from app.parser.browser import BrowserPool
+
+
+class _Context:
+    async def new_page(self):
+        return object()
+
+    async def close(self):
+        pass
+
+
+class _Browser:
+    def __init__(self):
+        self.closed = False
+
+    def is_connected(self):
+        return not self.closed
+
+    async def new_context(self, **options):
+        return _Context()
+
+    async def close(self):
+        self.closed = True
+
+
+class _Playwright:
+    def __init__(self):
+        self.launched = []
+        self.chromium = self
+
+    async def launch(self, **options):
+        self.launched.append(_Browser())
+        return self.launched[-1]
+
+
+def test_recycled_browser_is_closed():
+    async def run():
+        pool = BrowserPool(max_pages=2, recycle_after=1)
+        pool._playwright = playwright = _Playwright()
+        async with pool.page():
+            pass
+        # следующая страница пересоздаёт браузер; старый без страниц закрыт сразу, не фоновой задачей
+        async with pool.page():
+            first_closed = playwright.launched[0].closed
+        return playwright, first_closed
+
+    playwright, first_closed = asyncio.run(run())
+    assert len(playwright.launched) == 2
+    assert first_closed
+
+
+def test_retired_browser_closes_after_last_page():
+    async def run():
+        pool = BrowserPool(max_pages=2, recycle_after=1)
+        pool._playwright = playwright = _Playwright()
+        async with pool.page():
+            async with pool.page():
+                # первый браузер ещё занят страницей — только помечен к закрытию
+                assert not playwright.launched[0].closed
+        return playwright
+
+    assert asyncio.run(run()).launched[0].closed
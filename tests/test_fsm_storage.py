@@ -0,0 +1,39 @@
+import asyncio
+import json
+
+from aiogram.fsm.storage.base import StorageKey
+
+from app.db.fsm_storage import DbStorage, decode_data, encode_data
+
+
+def test_selected_ids_are_packed():
+    data = {"set_id": 3, "selected_products": [40, 2, 17], "selected_characteristics": []}
+    raw = encode_data(data)
+    assert json.loads(raw)["selected_products"] == format((1 << 40) | (1 << 17) | (1 << 2), "x")
+    decoded = decode_data(raw)
+    assert sorted(decoded["selected_products"]) == [2, 17, 40]
+    assert decoded["selected_characteristics"] == []
+    assert decoded["set_id"] == 3
+
+
+def test_unpackable_ids_stay_lists():
+    for ids in ([1, -1], [1, 10 ** 6], ["a"], [True]):
+        assert decode_data(encode_data({"selected_products": ids}))["selected_products"] == ids
+
+
+def test_db_storage_roundtrip(migrated):
+    key = StorageKey(bot_id=1, chat_id=100, user_id=200)
+
+    async def run():
+        storage = DbStorage()
+        await storage.set_state(key, "BankState:choose")
+        await storage.set_data(key, {"selected_products": [5, 1]})
+        state, data = await storage.get_state(key), await storage.get_data(key)
+        await storage.set_state(key, None)
+        return state, data, await storage.get_state(key), await storage.get_data(key)
+
+    state, data, cleared_state, kept_data = asyncio.run(run())
+    assert state == "BankState:choose"
+    assert sorted(data["selected_products"]) == [1, 5]
+    assert cleared_state is None
+    assert sorted(kept_data["selected_products"]) == [1, 5]
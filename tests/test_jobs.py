@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+from app.db.model import SessionLocal, Job
+from app.jobs.queue import _claim_jobs, _renew_leases, _release_jobs, _set_job_status
+
+
+def _job(**fields) -> int:
+    db = SessionLocal()
+    try:
+        job = Job(user_id=1, chat_id=1, product_ids=[], characteristics=[], **fields)
+        db.add(job)
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+
+def _get(job_id: int) -> Job:
+    db = SessionLocal()
+    try:
+        return db.get(Job, job_id)
+    finally:
+        db.close()
+
+
+def _claim(worker_id: str) -> list[int]:
+    return _claim_jobs(1000, worker_id)
+
+
+def test_running_job_with_live_lease_is_not_taken(migrated):
+    job_id = _job()
+    assert job_id in _claim("a")
+    job = _get(job_id)
+    assert (job.status, job.worker_id, job.attempts) == ("running", "a", 1)
+    assert job.locked_until > datetime.utcnow()
+
+    # второй процесс стартует, пока первый жив: чужую задачу не трогает
+    assert job_id not in _claim("b")
+    assert _renew_leases([job_id], "a") == {job_id}
+
+
+def test_expired_lease_is_taken_over(migrated):
+    job_id = _job(status="running", worker_id="dead", attempts=1,
+                  locked_until=datetime.utcnow() - timedelta(seconds=1))
+    assert job_id in _claim("b")
+    job = _get(job_id)
+    assert (job.worker_id, job.attempts) == ("b", 2)
+
+    # прежний владелец узнаёт о потере аренды и не продлевает её
+    assert _renew_leases([job_id], "dead") == set()
+    assert _get(job_id).worker_id == "b"
+
+
+def test_release_and_finish(migrated):
+    job_id = _job()
+    _claim("a")
+    assert _release_jobs([job_id], "b") == 0
+    assert _release_jobs([job_id], "a") == 1
+    job = _get(job_id)
+    assert (job.status, job.worker_id, job.locked_until) == ("queued", None, None)
+
+    _claim("a")
+    _set_job_status(job_id, "done")
+    assert _get(job_id).locked_until is None
+    assert job_id not in _claim("b")
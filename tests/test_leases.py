@@ -0,0 +1,80 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app.db.leases import acquire_lease, release_lease
+from app.db.model import SessionLocal, Lease
+from app.jobs import scheduler
+
+
+def test_lease_has_one_owner(migrated):
+    assert acquire_lease("test", 60, "a")
+    assert not acquire_lease("test", 60, "b")
+    assert acquire_lease("test", 60, "a")  # продление своей
+
+    release_lease("test", "b")  # чужую не снять
+    assert not acquire_lease("test", 60, "b")
+    release_lease("test", "a")
+    assert acquire_lease("test", 60, "b")
+    release_lease("test", "b")
+
+
+def test_expired_lease_is_taken_over(migrated):
+    assert acquire_lease("expired", 60, "dead")
+    db = SessionLocal()
+    db.query(Lease).filter_by(name="expired").update({Lease.locked_until: datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+    db.close()
+    assert acquire_lease("expired", 60, "b")
+    release_lease("expired", "b")
+
+
+def test_crawl_runs_in_one_process(migrated, monkeypatch):
+    crawls = []
+
+    async def crawl(self):
+        crawls.append(self)
+        return 1
+
+    monkeypatch.setattr(scheduler.CatalogScheduler, "_crawl", crawl)
+
+    assert acquire_lease(scheduler.LEASE_NAME, 60, "other-process")
+    assert asyncio.run(scheduler.CatalogScheduler().run_once()) == 0
+    assert crawls == []
+
+    release_lease(scheduler.LEASE_NAME, "other-process")
+    assert asyncio.run(scheduler.CatalogScheduler().run_once()) == 1
+    # после обхода аренда снята — следующий запуск может взять любой процесс
+    assert acquire_lease(scheduler.LEASE_NAME, 60, "other-process")
+    release_lease(scheduler.LEASE_NAME, "other-process")
+
+
+def test_crawl_stops_when_lease_is_lost(migrated, monkeypatch):
+    cancelled = asyncio.Event()
+
+    async def crawl(self):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return 1
+
+    monkeypatch.setattr(scheduler.CatalogScheduler, "_crawl", crawl)
+
+    async def run():
+        crawler = scheduler.CatalogScheduler(lease_seconds=0.3)
+        running = asyncio.create_task(crawler.run_once())
+        await asyncio.sleep(0.05)
+        # аренду перехватил другой процесс (например, наша истекла во время паузы)
+        db = SessionLocal()
+        db.query(Lease).filter_by(name=scheduler.LEASE_NAME).update(
+            {Lease.owner: "other-process", Lease.locked_until: datetime.utcnow() + timedelta(seconds=60)})
+        db.commit()
+        db.close()
+        return await asyncio.wait_for(running, 2)
+
+    assert asyncio.run(run()) == 0
+    assert cancelled.is_set()
+    # чужую аренду при выходе не снимаем
+    assert not acquire_lease(scheduler.LEASE_NAME, 60, "third-process")
+    release_lease(scheduler.LEASE_NAME, "other-process")
@@ -0,0 +1,29 @@
+import asyncio
+
+from app.db.model import SessionLocal, LlmCache
+from app.llm.cache import ExtractionCache
+
+
+def test_empty_answer_is_not_cached(migrated):
+    cache = ExtractionCache()
+    key = cache.make_key("Банк", "страница без условий", "")
+
+    asyncio.run(cache.put(key, {"rate": None, "sum": "null", "term": None}))
+    assert asyncio.run(cache.get(key)) is None
+
+    asyncio.run(cache.put(key, {"rate": "9,9%", "sum": None}))
+    assert asyncio.run(cache.get(key)) == {"rate": "9,9%", "sum": None}
+
+
+def test_cached_empty_answer_is_a_miss(migrated):
+    cache = ExtractionCache()
+    key = cache.make_key("Банк", "старая пустая запись", "")
+    db = SessionLocal()
+    db.add(LlmCache(key=key, model="test", result={"rate": None, "term": "null"}))
+    db.commit()
+    db.close()
+
+    assert asyncio.run(cache.get(key)) is None
+    db = SessionLocal()
+    assert db.query(LlmCache).filter_by(key=key).first() is None
+    db.close()
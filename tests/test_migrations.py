@@ -0,0 +1,47 @@
+from sqlalchemy import create_engine, inspect, select
+
+from app.db import migrations
+from app.db.model import Base, SchemaVersion
+
+# Колонки, которые миграции добавляют в уже существующие таблицы
+LATER_COLUMNS = [("data", "payload_archive"), ("jobs", "worker_id"), ("jobs", "locked_until")]
+
+
+def _upgrade(engine) -> list[int]:
+    with engine.begin() as conn:
+        return migrations._upgrade(conn)
+
+
+def _columns(engine) -> dict[str, set[str]]:
+    inspector = inspect(engine)
+    return {name: {column["name"] for column in inspector.get_columns(name)} for name in inspector.get_table_names()}
+
+
+def test_upgrade_applies_all_once(migrated):
+    versions = [version for version, _, _ in migrations.MIGRATIONS]
+    assert versions == sorted(set(versions))
+    assert migrations.upgrade() == []
+
+    from app.db.model import engine
+    with engine.connect() as conn:
+        assert sorted(conn.scalars(select(SchemaVersion.version))) == versions
+
+
+def test_old_database_reaches_model_schema(tmp_path, monkeypatch):
+    """База, остановившаяся на ранней версии, догоняет схему моделей"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    all_migrations = migrations.MIGRATIONS
+    monkeypatch.setattr(migrations, "MIGRATIONS", all_migrations[:6])
+    assert _upgrade(engine) == [1, 2, 3, 4, 5, 6]
+    # таблицы тогда создавались без колонок, которые добавили поздние миграции
+    with engine.begin() as conn:
+        for table, column in LATER_COLUMNS:
+            conn.exec_driver_sql(f"ALTER TABLE {table} DROP COLUMN {column}")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", all_migrations)
+    assert _upgrade(engine) == [version for version, _, _ in all_migrations[6:]]
+
+    columns = _columns(engine)
+    for table in Base.metadata.sorted_tables:
+        assert {column.name for column in table.columns} <= columns.get(table.name, set()), table.name
+    engine.dispose()
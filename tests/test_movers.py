@@ -0,0 +1,24 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app.db.model import SessionLocal, Observation, Product
+from app.db.offers import biggest_movers
+from app.jobs.snapshots import save_snapshot
+
+
+def test_movers_see_crawl_snapshots(migrated):
+    db = SessionLocal()
+    product = db.query(Product).order_by(Product.id.desc()).first()
+    db.close()
+
+    save_snapshot(product.id, {"name": product.name, "rate": "12%"}, source="schedule", observe=True)
+    db = SessionLocal()
+    db.execute(update(Observation).where(Observation.product_id == product.id)
+               .values(fetched_at=datetime.utcnow() - timedelta(days=10)))
+    db.commit()
+    db.close()
+    save_snapshot(product.id, {"name": product.name, "rate": "15%"}, source="schedule", observe=True)
+
+    movers = {row["product"]: row for row in biggest_movers("rate", 7)}
+    assert (movers[product.name]["was"], movers[product.name]["now"]) == (12.0, 15.0)
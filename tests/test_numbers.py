@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+
+from app.parser.numbers import normalize_results, parse_range
+
+
+@pytest.fixture(params=["python", "pyarrow"])
+def string_storage(request):
+    """Строки pandas без pyarrow и со pyarrow (RE2 в str.replace/contains)"""
+    if request.param == "pyarrow":
+        pytest.importorskip("pyarrow")
+    with pd.option_context("mode.string_storage", request.param):
+        yield request.param
+
+
+def _ranges(**fields) -> dict:
+    result = normalize_results([dict(fields)])[0]
+    return {key: value for key, value in result.items() if key not in fields}
+
+
+def test_parse_range():
+    assert parse_range("от 500 до 50 000") == (500.0, 50000.0)
+    assert parse_range(None) == (None, None)
+
+
+def test_rate_range(string_storage):
+    parsed = _ranges(rate="от 9,9% до 24% годовых на 60 мес.")
+    assert (parsed["rate_min"], parsed["rate_max"], parsed["rate_unit"]) == (9.9, 24.0, "%")
+
+
+def test_date_is_not_a_number(string_storage):
+    parsed = _ranges(rate="9,9% до 31.12.2025", term="до 60 мес. (акция с 1 марта 2025 г.)")
+    assert (parsed["rate_min"], parsed["rate_max"]) == (9.9, 9.9)
+    assert (parsed["term_min"], parsed["term_max"]) == (None, 60.0)
+
+
+def test_unit_carries_only_within_range(string_storage):
+    parsed = _ranges(term="от 6 мес. до 5 лет", rate="10–12%")
+    assert (parsed["term_min"], parsed["term_max"]) == (6.0, 60.0)
+    assert (parsed["rate_min"], parsed["rate_max"]) == (10.0, 12.0)
+
+    # Число без единицы рядом с числом с единицей — не ставка
+    parsed = _ranges(rate="9,9% при сумме 5000")
+    assert (parsed["rate_min"], parsed["rate_max"]) == (9.9, 9.9)
+
+
+def test_sum_scale_and_currency(string_storage):
+    parsed = _ranges(sum="от 5 до 50 тыс. BYN")
+    assert (parsed["sum_min"], parsed["sum_max"], parsed["sum_unit"]) == (5000.0, 50000.0, "BYN")
+
+    # Начало со своей единицей или ставшее бы больше конца — без множителя конца
+    for raw in ("от 500 до 50 тыс. BYN", "от 500 BYN до 50 тыс. BYN"):
+        parsed = _ranges(sum=raw)
+        assert (parsed["sum_min"], parsed["sum_max"], parsed["sum_unit"]) == (500.0, 50000.0, "BYN")
+
+    parsed = _ranges(sum="до 90% стоимости, не более 200 000", currency="USD")
+    assert (parsed["sum_min"], parsed["sum_max"], parsed["sum_unit"]) == (None, 200000.0, "USD")
+
+
+def test_open_bounds_and_defaults(string_storage):
+    parsed = _ranges(rate="22,5", term="до 5 лет")
+    assert (parsed["rate_min"], parsed["rate_max"], parsed["rate_unit"]) == (22.5, 22.5, "%")
+    assert (parsed["term_min"], parsed["term_max"]) == (None, 60.0)
+    assert _ranges(rate="от 9,9%")["rate_max"] is None
+
+
+def test_empty_values(string_storage):
+    parsed = _ranges(rate=None, sum="null", term=["1 год"])
+    assert parsed["rate_min"] is None and parsed["sum_unit"] is None
+    assert parsed["term_min"] == 12.0
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+from aiogram.filters import CommandObject
+
+from app.handlers import offers
+
+
+class _Message:
+    def __init__(self):
+        self.answers = []
+
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+
+
+@pytest.mark.parametrize("args, expected", [("-1", 1), ("0", 1), ("3", 3), ("100000", offers.TOP_MAX), (None, 10)])
+def test_top_limit_is_clamped(migrated, monkeypatch, args, expected):
+    limits = []
+
+    def top_offers(field, set_name, highest, limit):
+        limits.append(limit)
+        return []
+
+    monkeypatch.setattr(offers, "top_offers", top_offers)
+    asyncio.run(offers.top_offers_handler(_Message(), CommandObject(prefix="/", command="top", args=args)))
+    assert limits == [expected]
+
+
+@pytest.mark.parametrize("args", ["inf", "nan", "abc"])
+def test_top_rejects_bad_number(migrated, monkeypatch, args):
+    monkeypatch.setattr(offers, "top_offers", lambda *a: pytest.fail("query with bad N"))
+    message = _Message()
+    asyncio.run(offers.top_offers_handler(message, CommandObject(prefix="/", command="top", args=args)))
+    assert message.answers[0].startswith("Формат: /top")
+
+
+def test_movers_days_are_clamped(migrated, monkeypatch):
+    calls = []
+    monkeypatch.setattr(offers, "biggest_movers", lambda field, days, set_name: calls.append(days) or [])
+    asyncio.run(offers.movers_handler(_Message(), CommandObject(prefix="/", command="movers", args="-5")))
+    asyncio.run(offers.movers_handler(_Message(), CommandObject(prefix="/", command="movers", args="99999")))
+    assert calls == [1, offers.MOVERS_MAX_DAYS]
@@ -0,0 +1,49 @@
+import asyncio
+
+from app.parser import scraper
+from app.parser.http import HttpResponse
+from app.parser.page_cache import _load
+
+PAGE = "<html>" + "условия кредита " * 50 + "</html>"
+
+
+def _serve(monkeypatch, status: int, rendered: str | None = None):
+    requests = []
+
+    async def get(url, headers=None, timeout=10):
+        requests.append(dict(headers or {}))
+        body = PAGE.encode() if status == 200 else b""
+        return HttpResponse(url, status, {"ETag": '"v1"', "Last-Modified": "Mon, 01 Sep 2025 00:00:00 GMT"},
+                            body, "utf-8")
+
+    async def playwright(url, timeout=30000):
+        return rendered
+
+    monkeypatch.setattr(scraper.http_client, "get", get)
+    monkeypatch.setattr(scraper, "get_page_content_playwright", playwright)
+    return requests
+
+
+def test_http_page_revalidated(migrated, monkeypatch):
+    url = "https://bank.example/http"
+    _serve(monkeypatch, 200)
+    assert asyncio.run(scraper.fetch_page(url)) == PAGE
+
+    requests = _serve(monkeypatch, 304)
+    assert asyncio.run(scraper.fetch_page(url)) == PAGE
+    assert requests[0]["If-None-Match"] == '"v1"'
+
+
+def test_playwright_body_stored_without_validators(migrated, monkeypatch):
+    url = "https://bank.example/rendered"
+    rendered = "<html>" + "отрисовано " * 100 + "</html>"
+    # aiohttp вернул короткую заглушку с валидаторами — тело берём из Playwright
+    _serve(monkeypatch, 403, rendered)
+    assert asyncio.run(scraper.fetch_page(url)) == rendered
+    cached = _load(url)
+    assert (cached.source, cached.etag, cached.last_modified) == ("playwright", None, None)
+
+    # следующая загрузка — безусловный GET, 304 не подменит страницу старым DOM
+    requests = _serve(monkeypatch, 200)
+    assert asyncio.run(scraper.fetch_page(url)) == PAGE
+    assert requests[0] == {}
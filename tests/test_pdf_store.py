@@ -0,0 +1,48 @@
+import asyncio
+
+from app.parser import pdf_store as store_module
+from app.parser.http import HttpResponse
+from app.parser.pdf_store import PdfStore, _load_entry
+
+
+def _serve(monkeypatch, texts: list[str]):
+    """PDF с ETag отдаётся всегда целиком; разбор возвращает тексты по очереди"""
+    requests, extracted = [], iter(texts)
+
+    async def get(url, headers=None, timeout=10):
+        requests.append(dict(headers or {}))
+        return HttpResponse(url, 200, {"ETag": '"v1"'}, b"%PDF-1.4 " + url.encode(), None)
+
+    async def extract(data):
+        return next(extracted)
+
+    monkeypatch.setattr(store_module.http_client, "get", get)
+    monkeypatch.setattr(store_module, "extract_pdf_text", extract)
+    return requests
+
+
+def test_empty_extraction_is_not_stored(migrated, monkeypatch, tmp_path):
+    url = "https://bank.example/empty.pdf"
+    requests = _serve(monkeypatch, ["", "Ставка 12%"])
+    store = PdfStore(str(tmp_path))
+
+    assert asyncio.run(store.get(url)).text == ""
+    assert _load_entry(url) is None
+    assert list(tmp_path.iterdir()) == []
+
+    # без сохранённых валидаторов — обычный GET и повторный разбор
+    doc = asyncio.run(store.get(url))
+    assert "If-None-Match" not in requests[1]
+    assert doc.text == "Ставка 12%"
+    assert _load_entry(url).content_hash == doc.content_hash
+
+
+def test_parsed_text_is_reused(migrated, monkeypatch, tmp_path):
+    url = "https://bank.example/tariffs.pdf"
+    requests = _serve(monkeypatch, ["Тарифы"])
+    store = PdfStore(str(tmp_path))
+
+    first = asyncio.run(store.get(url))
+    second = asyncio.run(store.get(url))
+    assert requests[1]["If-None-Match"] == '"v1"'
+    assert second.text == first.text == "Тарифы"
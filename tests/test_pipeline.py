@@ -0,0 +1,103 @@
+import asyncio
+import random
+
+from app.parser.condense import CHARS_PER_TOKEN
+from app.parser.pipeline import Pipeline, Stage
+from app.parser.product import ProductTask, pack_tasks
+
+
+class _Item:
+    def __init__(self, value: int):
+        self.value = value
+        self.done = False
+        self.stages: list[str] = []
+
+
+def _stage(name: str, delay: bool = True):
+    async def func(item: _Item):
+        if delay:
+            await asyncio.sleep(random.random() / 100)
+        item.stages.append(name)
+    return func
+
+
+def test_results_keep_input_order():
+    items = [_Item(value) for value in range(30)]
+    progress = []
+
+    async def on_done(done, total, item):
+        progress.append((done, total))
+
+    pipeline = Pipeline([Stage("a", _stage("a"), 4), Stage("b", _stage("b"), 3)], concurrency=5, on_done=on_done)
+    results = asyncio.run(pipeline.run(items))
+    assert [item.value for item in results] == list(range(30))
+    assert all(item.stages == ["a", "b"] for item in results)
+    assert progress == [(done, 30) for done in range(1, 31)]
+
+
+def test_done_and_errors_skip_remaining_stages():
+    async def first(item: _Item):
+        if item.value == 1:
+            item.done = True
+        if item.value == 2:
+            raise RuntimeError("boom")
+        item.stages.append("first")
+
+    errors = []
+    pipeline = Pipeline([Stage("first", first), Stage("second", _stage("second", delay=False))],
+                        on_error=lambda item, stage, e: errors.append((item.value, stage, str(e))))
+    results = asyncio.run(pipeline.run([_Item(value) for value in range(4)]))
+    assert [item.stages for item in results] == [["first", "second"], ["first"], [], ["first", "second"]]
+    assert errors == [(2, "first", "boom")]
+
+
+def test_concurrency_limit():
+    inside = peak = 0
+
+    async def slow(item: _Item):
+        nonlocal inside, peak
+        inside += 1
+        peak = max(peak, inside)
+        await asyncio.sleep(0.01)
+        inside -= 1
+
+    asyncio.run(Pipeline([Stage("slow", slow, workers=10)], concurrency=3).run([_Item(v) for v in range(12)]))
+    assert peak == 3
+
+
+def test_batched_stage_collects_items():
+    batches = []
+
+    async def batched(items: list[_Item]):
+        batches.append([item.value for item in items])
+
+    pipeline = Pipeline([Stage("llm", batched, batch_size=4, linger=0.2)], concurrency=10)
+    results = asyncio.run(pipeline.run([_Item(v) for v in range(6)]))
+    assert [item.value for item in results] == list(range(6))
+    assert sorted(value for batch in batches for value in batch) == list(range(6))
+    assert max(len(batch) for batch in batches) == 4
+
+
+def _task(product_id: int, tokens: int) -> ProductTask:
+    task = ProductTask(product_id, f"Продукт {product_id}", "https://bank.example", "Банк")
+    task.condensed = "x" * tokens * CHARS_PER_TOKEN
+    return task
+
+
+def test_pack_tasks_respects_budget():
+    tasks = [_task(1, 400), _task(2, 400), _task(3, 400), _task(4, 5000), _task(5, 100)]
+    groups, singles = pack_tasks(tasks, budget=1000, item_limit=3000)
+    # третий не влез в первый пакет и открыл второй; крупный — отдельным запросом
+    assert [[task.product_id for task in group] for group in groups] == [[1, 2], [3, 5]]
+    assert [task.product_id for task in singles] == [4]
+
+
+def test_pack_tasks_groups_and_singles():
+    groups, singles = pack_tasks([_task(1, 300), _task(2, 300), _task(3, 300)], budget=700, item_limit=500)
+    assert [[task.product_id for task in group] for group in groups] == [[1, 2]]
+    # оставшийся без пары пакет — тоже одиночный запрос
+    assert [task.product_id for task in singles] == [3]
+
+    groups, singles = pack_tasks([_task(1, 600), _task(2, 100)], budget=10000, item_limit=500)
+    assert [[task.product_id for task in group] for group in groups] == []
+    assert [task.product_id for task in singles] == [1, 2]
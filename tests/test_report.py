@@ -0,0 +1,68 @@
+import io
+from datetime import datetime
+
+from openpyxl import load_workbook
+
+from app.db.model import SessionLocal, Job, JobItem, Observation, Offer, Product
+from app.excel.py_xlsx import create_bank_excel_report
+from app.jobs.queue import _finish_job
+from app.jobs.snapshots import save_snapshot
+
+
+def _finished_job(results: dict[int, dict]) -> int:
+    db = SessionLocal()
+    try:
+        job = Job(user_id=1, chat_id=1, status="running", product_ids=list(results), characteristics=["rate"])
+        db.add(job)
+        db.flush()
+        for position, (product_id, result) in enumerate(results.items()):
+            db.add(JobItem(job_id=job.id, position=position, product_id=product_id, status="done",
+                           result=result, finished_at=datetime.utcnow()))
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+
+def test_finish_job_and_excel(migrated):
+    db = SessionLocal()
+    products = db.query(Product).limit(2).all()
+    db.close()
+    results = {
+        products[0].id: {"bank": "Сбер", "product": products[0].name, "rate": "от 9,9% до 24% до 31.12.2025",
+                         "sum": "до 50 000 BYN", "term": "от 6 мес. до 5 лет"},
+        products[1].id: {"bank": "Альфа Банк", "product": products[1].name, "rate": "12%"},
+    }
+    job_id = _finished_job(results)
+
+    saved, _, _ = _finish_job(job_id, 1, ["rate", "sum", "term"], [p.name for p in products])
+    assert (saved[0]["rate_min"], saved[0]["rate_max"]) == (9.9, 24.0)
+    assert (saved[0]["term_min"], saved[0]["term_max"]) == (6.0, 60.0)
+
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        rate = db.query(Observation).filter_by(data_id=job.data_id, product_id=products[0].id, field="rate").one()
+        assert (rate.value_min, rate.value_max, rate.unit) == (9.9, 24.0, "%")
+    finally:
+        db.close()
+
+    _, content = create_bank_excel_report(saved, ["rate", "sum", "term"])
+    rows = {row[0]: row[1:] for row in load_workbook(io.BytesIO(content)).active.iter_rows(values_only=True)}
+    assert rows["% Ставка, мин (%)"] == (9.9, 12)
+    assert rows["Сумма, валюта"] == ("BYN", None)
+
+
+def test_snapshot_updates_offer(migrated):
+    db = SessionLocal()
+    product = db.query(Product).first()
+    db.close()
+
+    save_snapshot(product.id, {"rate": "от 15%", "term": "до 3 лет"})
+
+    db = SessionLocal()
+    try:
+        offer = db.get(Offer, product.id)
+        assert (offer.rate_min, offer.rate_max, offer.term_max) == (15.0, None, 36.0)
+    finally:
+        db.close()
@@ -0,0 +1,67 @@
+import asyncio
+
+from aiogram.exceptions import TelegramBadRequest
+
+from app.telegram.sender import EditSender
+
+
+class _Bot:
+    """Показанный текст и отправленные правки одного сообщения"""
+
+    def __init__(self):
+        self.shown = None
+        self.sent = []
+
+    async def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        if text == self.shown:
+            raise TelegramBadRequest(None, "Bad Request: message is not modified")
+        self.shown = text
+        self.sent.append(text)
+
+
+def test_pending_edits_coalesce():
+    async def run():
+        bot, sender = _Bot(), EditSender(chat_interval=0, global_rate=1000)
+        await sender.edit(bot, 1, 10, "1/3")
+        await sender.edit(bot, 1, 10, "2/3")
+        return bot, await sender.edit(bot, 1, 10, "3/3", wait=True)
+
+    bot, sent = asyncio.run(run())
+    assert sent is True
+    assert bot.sent == ["3/3"]
+
+
+def test_same_text_is_skipped_without_request():
+    async def run():
+        bot, sender = _Bot(), EditSender(chat_interval=0, global_rate=1000)
+        first = await sender.edit(bot, 1, 10, "Меню", wait=True)
+        return bot, first, await sender.edit(bot, 1, 10, "Меню", wait=True)
+
+    bot, first, repeated = asyncio.run(run())
+    assert (first, repeated) == (True, False)
+    assert bot.sent == ["Меню"]
+
+
+def test_same_text_is_sent_again_after_other_edit():
+    async def run():
+        bot, sender = _Bot(), EditSender(chat_interval=0, global_rate=1000)
+        await sender.edit(bot, 1, 10, "Меню", wait=True)
+        await sender.edit(bot, 1, 10, "Отчёт готов", wait=True)
+        resent = await sender.edit(bot, 1, 10, "Меню", wait=True)
+        repeated = await sender.edit(bot, 1, 10, "Меню", wait=True)
+        return bot, resent, repeated
+
+    bot, resent, repeated = asyncio.run(run())
+    assert bot.sent == ["Меню", "Отчёт готов", "Меню"]
+    assert (resent, repeated) == (True, False)
+
+
+def test_not_modified_is_a_no_op():
+    async def run():
+        bot, sender = _Bot(), EditSender(chat_interval=0, global_rate=1000)
+        bot.shown = "Меню"  # текст уже стоит в сообщении (например, отправлен при создании)
+        return bot, await sender.edit(bot, 1, 10, "Меню", wait=True)
+
+    bot, sent = asyncio.run(run())
+    assert sent is False
+    assert bot.sent == []
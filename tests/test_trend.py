@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from app.db.model import SessionLocal, Bank, Data, Observation, Product
+from app.excel.trend import load_history, mark_changes, summarize
+
+
+def _history(values: list[str | None]) -> pd.DataFrame:
+    start = datetime(2025, 9, 1)
+    return pd.DataFrame({
+        "run_at": [start + timedelta(days=day) for day in range(len(values))],
+        "data_id": range(len(values)),
+        "bank": "Сбер",
+        "product": "Кредит",
+        "field": "rate",
+        "value": pd.Series(values, dtype="string"),
+    })
+
+
+def test_was_is_value_before_last_change():
+    summary = summarize(mark_changes(_history(["10%", "12%", None, "12%", "15%", "15%"])))
+    row = summary.iloc[0]
+    assert (row["was"], row["last"], row["changes"]) == ("12%", "15%", 2)
+    assert row["last_change"] == datetime(2025, 9, 5)
+
+
+def test_unchanged_fields_are_skipped():
+    assert summarize(mark_changes(_history(["10%", None, "10%"]))).empty
+
+
+def test_history_from_observations_and_unobserved_runs(migrated):
+    db = SessionLocal()
+    product = db.query(Product).order_by(Product.id).offset(2).first()
+    bank = db.get(Bank, product.bank_id)
+    product_name, bank_name = product.name, bank.name
+    day = datetime(2024, 5, 1)
+    # запуск с наблюдениями: payload не читается (в нём другое значение)
+    observed = Data(created_at=day, card_set=product.name,
+                    payload=[{"bank": bank.name, "product": product.name, "rate": "не то"}])
+    db.add(observed)
+    db.flush()
+    db.add(Observation(data_id=observed.id, product_id=product.id, bank_id=bank.id, field="rate",
+                       raw_value="10%", fetched_at=day))
+    # запуск без наблюдений — из payload
+    db.add(Data(created_at=day + timedelta(days=1), card_set=product.name,
+                payload=[{"bank": bank.name, "product": product.name, "rate": "12%", "files": "a.pdf"}]))
+    db.commit()
+    db.close()
+
+    history = load_history([product_name], day - timedelta(days=1), day + timedelta(days=2))
+    assert history["value"].tolist() == ["10%", "12%"]
+    assert set(history["field"]) == {"rate"}
+    assert set(history["bank"]) == {bank_name}